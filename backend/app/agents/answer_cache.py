@@ -0,0 +1,296 @@
+# app/agents/answer_cache.py
+"""Semantic cache of coach answers to general (non-personal) fitness questions.
+
+"How much protein per day?" or "what is zone 2?" do not depend on who asks, yet each one
+costs a supervisor turn. Turns that pass `ineligible_reason` are embedded and matched by
+cosine similarity against recently stored answers (an in-memory NumPy matrix); a match
+above the threshold is returned without running the graph.
+
+Exclusion of user data is explicit on both sides:
+- questions that mention the user ("my", "I"), their goals/tasks/plans, dates, or refer
+  back to earlier turns ("that", "it", "instead", a leading "and") are never looked up
+  or stored, and neither are short or subjectless ones ("Why?", "How long?") - an
+  eligible turn runs without the conversation, so it must be a self-contained question;
+- eligible turns run on the question alone, without the conversation history, running
+  summary, checkpointed thread, prefetched profile/goals context or long-term
+  memories, and an answer is only stored when the turn called no tool other than web
+  search and its text does not address the user's own data.
+
+Entries expire after a TTL and the least recently used one is evicted when full.
+"""
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from loguru import logger
+
+from app.agents.long_term_memory import MEMORY_EMBEDDER, Embedder, make_embedder
+from app.agents.router import ROUTER_MAX_FAST_CHARS
+from app.agents.trajectory import is_handoff
+from app.agents.utils.stats import LatencyWindow
+
+ANSWER_CACHE_ENABLED = os.getenv("COACH_ANSWER_CACHE", "1").strip().lower() not in ("0", "false", "no", "off")
+ANSWER_CACHE_EMBEDDER = os.getenv("COACH_ANSWER_CACHE_EMBEDDER", MEMORY_EMBEDDER).strip().lower()
+# Cosine similarity a stored question needs to count as the same question
+ANSWER_CACHE_THRESHOLD = float(os.getenv("COACH_ANSWER_CACHE_THRESHOLD", "0.92"))
+ANSWER_CACHE_TTL_S = float(os.getenv("COACH_ANSWER_CACHE_TTL_S", str(24 * 3600)))
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("COACH_ANSWER_CACHE_MAX_ENTRIES", "2000"))
+# A self-contained question has at least this many words, two of them topic words
+ANSWER_CACHE_MIN_WORDS = int(os.getenv("COACH_ANSWER_CACHE_MIN_WORDS", "4"))
+
+# Tools whose use still leaves the answer general
+SHAREABLE_TOOLS = ("tavily_search",)
+
+# (reason, pattern) pairs that make a question personal or context-dependent
+_PERSONAL_PATTERNS = [
+    ("first_person", r"\b(i|i'm|im|i've|i'd|i'll|me|my|mine|myself|we|our|us)\b"),
+    ("user_data", r"\b(goals?|tasks?|plan|program|schedule|progress|profile|workouts? (today|tomorrow))\b"),
+    ("time_bound", r"\b(today|tonight|tomorrow|yesterday|this week|next week|latest|news|current)\b"),
+    ("follow_up", r"\b(this|that|these|those|it|its|they|them|their|more|else|also|too|above|previous|earlier|again|instead|same|what about|how about)\b"),
+    ("action", r"\b(create|add|generate|make|update|change|delete|remove|reschedule|mark)\b"),
+]
+_PERSONAL_RE = [(reason, re.compile(p, re.IGNORECASE)) for reason, p in _PERSONAL_PATTERNS]
+# Openers that continue the previous turn ("And for cardio?", "So how long?")
+_CONTINUATION_RE = re.compile(r"^\W*(and|or|but|so|then|plus|also|it|it's|they|they're|more)\b", re.IGNORECASE)
+_WORD_RE = re.compile(r"[a-z0-9][a-z0-9'-]*", re.IGNORECASE)
+# Question scaffolding and vague qualifiers; what is left names the topic
+_FILLER_WORDS = frozenset(
+    "what what's whats why how is are was were does do did can could would should which when where who whom "
+    "explain define tell the a an of for to in on at by with from about you be there ok okay really "
+    "long much many often good bad best better safe fine normal".split()
+)
+_QUESTION_RE = re.compile(
+    r"\?\s*$|^(what|what's|whats|why|how|is|are|does|do|can|should|which|when|explain|define)\b", re.IGNORECASE
+)
+# Answers that address the user's own data are not shareable
+_PERSONAL_ANSWER_RE = re.compile(
+    r"\b(your (goals?|tasks?|plan|profile|schedule|progress|injur(y|ies))|you (mentioned|said|told me)|earlier you|last time)\b",
+    re.IGNORECASE,
+)
+
+
+def ineligible_reason(message: str) -> Optional[str]:
+    """None when the message is a general question whose answer can be shared across users."""
+    text = (message or "").strip()
+    if not text:
+        return "empty"
+    if len(text) > ROUTER_MAX_FAST_CHARS:
+        return "long_message"
+    if not _QUESTION_RE.search(text):
+        return "not_a_question"
+    if _CONTINUATION_RE.search(text):
+        return "follow_up"
+    for reason, rx in _PERSONAL_RE:
+        if rx.search(text):
+            return reason
+    words = _WORD_RE.findall(text.lower())
+    if len(words) < ANSWER_CACHE_MIN_WORDS:
+        return "too_short"
+    if sum(1 for w in words if w not in _FILLER_WORDS) < 2:
+        return "no_subject"
+    return None
+
+
+def _normalize_question(text: str) -> str:
+    return re.sub(r"\s+", " ", text.strip().lower())
+
+
+class _Entry:
+    __slots__ = ("question", "answer", "created", "hits")
+
+    def __init__(self, question: str, answer: str, created: float) -> None:
+        self.question = question
+        self.answer = answer
+        self.created = created
+        self.hits = 0
+
+
+class AnswerCacheStats:
+    """Lookups, hits and the latency of answered-from-cache vs model-answered eligible turns.
+
+    Latency saved per hit is estimated from the p50 gap between eligible turns the model
+    answered and turns served from the cache.
+    """
+
+    def __init__(self) -> None:
+        self.lookups = 0
+        self.hits = 0
+        self.misses = 0
+        self.stored = 0
+        self.expired = 0
+        self.evictions = 0
+        self.errors = 0
+        self.ineligible: Dict[str, int] = {}
+        self.rejected: Dict[str, int] = {}
+        self.hit_latency = LatencyWindow()
+        self.miss_latency = LatencyWindow()
+        self.hit_similarity = LatencyWindow()
+
+    def record_ineligible(self, reason: str) -> None:
+        self.ineligible[reason] = self.ineligible.get(reason, 0) + 1
+
+    def record_rejected(self, reason: str) -> None:
+        self.rejected[reason] = self.rejected.get(reason, 0) + 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        hit_p50 = self.hit_latency.percentile(0.5)
+        miss_p50 = self.miss_latency.percentile(0.5)
+        saved = round(miss_p50 - hit_p50, 4) if hit_p50 is not None and miss_p50 is not None else None
+        turns = self.lookups + sum(self.ineligible.values())
+        return {
+            "turns": turns,
+            "eligible_share": round(self.lookups / turns, 4) if turns else 0.0,
+            "lookups": self.lookups,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / self.lookups, 4) if self.lookups else 0.0,
+            "stored": self.stored,
+            "expired": self.expired,
+            "evictions": self.evictions,
+            "errors": self.errors,
+            "ineligible": dict(self.ineligible),
+            "rejected": dict(self.rejected),
+            "est_latency_saved_per_hit_s": saved,
+            "est_latency_saved_total_s": round(saved * self.hits, 2) if saved is not None else None,
+            "hit_latency_s": self.hit_latency.snapshot(),
+            "miss_latency_s": self.miss_latency.snapshot(),
+            "hit_similarity": self.hit_similarity.snapshot(),
+        }
+
+
+class SemanticAnswerCache:
+    """Fixed-capacity matrix of question embeddings with an LRU of live slots."""
+
+    def __init__(
+        self,
+        *,
+        embedder: Optional[Embedder] = None,
+        enabled: bool = ANSWER_CACHE_ENABLED,
+        threshold: float = ANSWER_CACHE_THRESHOLD,
+        ttl_s: float = ANSWER_CACHE_TTL_S,
+        max_entries: int = ANSWER_CACHE_MAX_ENTRIES,
+    ) -> None:
+        self.enabled = enabled and max_entries > 0
+        self.threshold = threshold
+        self.ttl_s = ttl_s
+        self.max_entries = max_entries
+        self._embedder = embedder
+        self._vectors: Optional[np.ndarray] = None  # (max_entries, dim), allocated on first store
+        self._live = np.zeros(max_entries, dtype=bool)
+        self._entries: "OrderedDict[int, _Entry]" = OrderedDict()  # slot -> entry, LRU first
+        self._free: List[int] = list(range(max_entries - 1, -1, -1))
+        self._lock = threading.Lock()
+        self.stats = AnswerCacheStats()
+
+    @property
+    def embedder(self) -> Embedder:
+        if self._embedder is None:
+            self._embedder = make_embedder(ANSWER_CACHE_EMBEDDER)
+        return self._embedder
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def eligible(self, message: str) -> bool:
+        if not self.enabled:
+            return False
+        reason = ineligible_reason(message)
+        if reason is not None:
+            self.stats.record_ineligible(reason)
+            return False
+        return True
+
+    async def embed(self, message: str) -> Optional[np.ndarray]:
+        try:
+            return (await self.embedder.embed([_normalize_question(message)]))[0]
+        except Exception as e:
+            self.stats.errors += 1
+            logger.warning("embedding failed, skipping cache: {}", e)
+            return None
+
+    def lookup(self, vector: np.ndarray) -> Optional[Tuple[str, float, str]]:
+        """(answer, similarity, cached question) for the best live match above the threshold."""
+        self.stats.lookups += 1
+        with self._lock:
+            if self._vectors is None or not self._entries:
+                self.stats.misses += 1
+                return None
+            scores = self._vectors @ np.asarray(vector, dtype=np.float32)
+            scores[~self._live] = -np.inf
+            slot = int(np.argmax(scores))
+            score = float(scores[slot])
+            entry = self._entries.get(slot)
+            if entry is None or score < self.threshold:
+                self.stats.misses += 1
+                return None
+            if time.monotonic() - entry.created > self.ttl_s:
+                self._drop(slot)
+                self.stats.expired += 1
+                self.stats.misses += 1
+                return None
+            self._entries.move_to_end(slot)
+            entry.hits += 1
+            self.stats.hits += 1
+            self.stats.hit_similarity.observe(score)
+            return entry.answer, score, entry.question
+
+    def store(self, message: str, vector: np.ndarray, answer: str, tool_names: Iterable[Optional[str]]) -> bool:
+        """Cache a model answer to an eligible question unless it touched or mentions user data."""
+        used = {n for n in tool_names if n and not is_handoff(n)}
+        if used - set(SHAREABLE_TOOLS):
+            self.stats.record_rejected("user_tools")
+            return False
+        if not answer.strip():
+            self.stats.record_rejected("empty")
+            return False
+        if _PERSONAL_ANSWER_RE.search(answer):
+            self.stats.record_rejected("personal_answer")
+            return False
+        vector = np.asarray(vector, dtype=np.float32)
+        with self._lock:
+            if self._vectors is None:
+                self._vectors = np.zeros((self.max_entries, vector.shape[0]), dtype=np.float32)
+            self._expire()
+            if not self._free:
+                self._drop(next(iter(self._entries)))
+                self.stats.evictions += 1
+            slot = self._free.pop()
+            self._vectors[slot] = vector
+            self._live[slot] = True
+            self._entries[slot] = _Entry(message.strip(), answer, time.monotonic())
+        self.stats.stored += 1
+        return True
+
+    def _expire(self) -> None:
+        now = time.monotonic()
+        for slot in [s for s, e in self._entries.items() if now - e.created > self.ttl_s]:
+            self._drop(slot)
+            self.stats.expired += 1
+
+    def _drop(self, slot: int) -> None:
+        if self._entries.pop(slot, None) is not None:
+            self._live[slot] = False
+            self._free.append(slot)
+
+    def clear(self) -> None:
+        with self._lock:
+            for slot in list(self._entries):
+                self._drop(slot)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            top = sorted(self._entries.values(), key=lambda e: e.hits, reverse=True)[:5]
+            entries = len(self._entries)
+        return {
+            "enabled": self.enabled,
+            "entries": entries,
+            "max_entries": self.max_entries,
+            "threshold": self.threshold,
+            "ttl_s": self.ttl_s,
+            "top_questions": [{"question": e.question[:120], "hits": e.hits} for e in top],
+            **self.stats.snapshot(),
+        }
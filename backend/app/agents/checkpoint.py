@@ -0,0 +1,191 @@
+# app/agents/checkpoint.py
+"""Optional LangGraph checkpointer for coach chat state (thread_id = conversation id).
+
+With a checkpointer the chat graph keeps its own message state per conversation, so a
+turn resumes from the checkpoint instead of re-reading and re-converting DB rows. The
+`messages` table stays the source of truth: every assistant row stores the LangChain
+message id (content["lc_id"]), and a turn only resumes when the newest DB row is the
+checkpoint's last AI message. Otherwise the thread is rebuilt from the DB history.
+
+Backends (COACH_CHECKPOINTER):
+- off (default): stateless turns, history rebuilt from the DB every time
+- memory: InMemorySaver, single process, dev only; keeps the COACH_CHECKPOINT_MEMORY_MAX_THREADS
+  most recently used threads (older ones are rebuilt from the DB on their next turn)
+- sqlite: AsyncSqliteSaver at COACH_CHECKPOINT_SQLITE_PATH (needs langgraph-checkpoint-sqlite)
+- postgres: AsyncPostgresSaver at COACH_CHECKPOINT_POSTGRES_URI (needs langgraph-checkpoint-postgres)
+Other backends can be added with register_checkpointer().
+"""
+import contextlib
+import os
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from langchain_core.messages import AIMessage, BaseMessage
+from langgraph.checkpoint.memory import InMemorySaver
+from loguru import logger
+
+from app.agents.tokens import message_tokens
+
+COACH_CHECKPOINTER = os.getenv("COACH_CHECKPOINTER", "off").strip().lower()
+CHECKPOINT_SQLITE_PATH = os.getenv("COACH_CHECKPOINT_SQLITE_PATH", "coach_checkpoints.sqlite")
+CHECKPOINT_POSTGRES_URI = os.getenv("COACH_CHECKPOINT_POSTGRES_URI", "")
+CHECKPOINT_MEMORY_MAX_THREADS = max(1, int(os.getenv("COACH_CHECKPOINT_MEMORY_MAX_THREADS", "500")))
+
+# A factory enters any resources it needs on the exit stack and returns the saver
+CheckpointerFactory = Callable[[contextlib.AsyncExitStack], Awaitable[Any]]
+
+
+class BoundedInMemorySaver(InMemorySaver):
+    """InMemorySaver that forgets the least recently used threads beyond `max_threads`.
+
+    A plain InMemorySaver keeps every checkpoint of every conversation for the life of the
+    process. Dropping a whole thread is safe here: its next turn finds no checkpoint and
+    is rebuilt from the messages table.
+    """
+
+    def __init__(self, max_threads: int = CHECKPOINT_MEMORY_MAX_THREADS) -> None:
+        super().__init__()
+        self.max_threads = max_threads
+        self.evicted = 0
+        self._recent: "OrderedDict[str, None]" = OrderedDict()
+
+    def _touch(self, config: Dict[str, Any]) -> None:
+        thread_id = config["configurable"]["thread_id"]
+        self._recent[thread_id] = None
+        self._recent.move_to_end(thread_id)
+        while len(self._recent) > self.max_threads:
+            oldest, _ = self._recent.popitem(last=False)
+            self.delete_thread(oldest)
+            self.evicted += 1
+
+    def get_tuple(self, config: Dict[str, Any]) -> Any:
+        found = super().get_tuple(config)
+        if found is not None:
+            self._touch(config)
+        elif config["configurable"]["thread_id"] not in self._recent:
+            # The lookup left an empty defaultdict entry behind for the unknown thread
+            self.storage.pop(config["configurable"]["thread_id"], None)
+        return found
+
+    def put(self, config: Dict[str, Any], checkpoint: Any, metadata: Any, new_versions: Any) -> Dict[str, Any]:
+        saved = super().put(config, checkpoint, metadata, new_versions)
+        self._touch(config)
+        return saved
+
+    def delete_thread(self, thread_id: str) -> None:
+        super().delete_thread(thread_id)
+        self._recent.pop(thread_id, None)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {"threads": len(self._recent), "max_threads": self.max_threads, "evicted": self.evicted}
+
+
+async def _memory(stack: contextlib.AsyncExitStack) -> Any:
+    logger.warning(
+        "COACH_CHECKPOINTER=memory is for development only: state is per process and lost on restart "
+        "(keeping the {} most recent threads); use sqlite or postgres in production",
+        CHECKPOINT_MEMORY_MAX_THREADS,
+    )
+    return BoundedInMemorySaver()
+
+
+async def _sqlite(stack: contextlib.AsyncExitStack) -> Any:
+    try:
+        from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+    except ImportError as e:
+        raise RuntimeError("COACH_CHECKPOINTER=sqlite requires langgraph-checkpoint-sqlite") from e
+    saver = await stack.enter_async_context(AsyncSqliteSaver.from_conn_string(CHECKPOINT_SQLITE_PATH))
+    await saver.setup()
+    return saver
+
+
+async def _postgres(stack: contextlib.AsyncExitStack) -> Any:
+    try:
+        from langgraph.checkpoint.postgres.aio import AsyncPostgresSaver
+    except ImportError as e:
+        raise RuntimeError("COACH_CHECKPOINTER=postgres requires langgraph-checkpoint-postgres") from e
+    if not CHECKPOINT_POSTGRES_URI:
+        raise RuntimeError("COACH_CHECKPOINTER=postgres requires COACH_CHECKPOINT_POSTGRES_URI")
+    saver = await stack.enter_async_context(AsyncPostgresSaver.from_conn_string(CHECKPOINT_POSTGRES_URI))
+    await saver.setup()
+    return saver
+
+
+_FACTORIES: Dict[str, CheckpointerFactory] = {
+    "memory": _memory,
+    "sqlite": _sqlite,
+    "postgres": _postgres,
+}
+
+
+def register_checkpointer(kind: str, factory: CheckpointerFactory) -> None:
+    """Make another saver backend selectable via COACH_CHECKPOINTER=<kind>."""
+    _FACTORIES[kind] = factory
+
+
+class CheckpointStats:
+    def __init__(self) -> None:
+        self.resumed = 0
+        self.rebuilt: Dict[str, int] = {}
+
+    def record_rebuild(self, reason: str) -> None:
+        self.rebuilt[reason] = self.rebuilt.get(reason, 0) + 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        total = self.resumed + sum(self.rebuilt.values())
+        return {
+            "resumed": self.resumed,
+            "rebuilt": dict(self.rebuilt),
+            "resume_rate": round(self.resumed / total, 4) if total else 0.0,
+        }
+
+
+class CoachCheckpointer:
+    """Owns the saver's lifetime and decides per turn whether a thread can resume."""
+
+    def __init__(self, kind: str = COACH_CHECKPOINTER) -> None:
+        self.kind = kind
+        self.saver: Any = None
+        self.stats = CheckpointStats()
+        self._stack = contextlib.AsyncExitStack()
+
+    @property
+    def enabled(self) -> bool:
+        return self.saver is not None
+
+    async def open(self) -> Any:
+        """Create the saver (None when disabled). Call once before compiling the chat graph."""
+        if self.kind in ("", "off", "none", "0"):
+            return None
+        factory = _FACTORIES.get(self.kind)
+        if factory is None:
+            raise RuntimeError(f"Unknown COACH_CHECKPOINTER={self.kind!r}; expected one of {sorted(_FACTORIES)} or off")
+        self.saver = await factory(self._stack)
+        logger.info("using {} checkpointer", self.kind)
+        return self.saver
+
+    async def close(self) -> None:
+        await self._stack.aclose()
+        self.saver = None
+
+    @staticmethod
+    def thread_config(conversation_id: str) -> Dict[str, Any]:
+        return {"configurable": {"thread_id": conversation_id}}
+
+    def resume_check(
+        self, state_messages: List[BaseMessage], last_row: Optional[Dict[str, Any]], *, token_budget: int
+    ) -> Optional[str]:
+        """None when the checkpoint can be resumed, else the reason it must be rebuilt."""
+        if not state_messages:
+            return "no_checkpoint"
+        last_ai = next((m for m in reversed(state_messages) if isinstance(m, AIMessage)), None)
+        content = (last_row or {}).get("content")
+        row_lc_id = content.get("lc_id") if isinstance(content, dict) else None
+        if last_ai is None or not last_ai.id or (last_row or {}).get("role") != "assistant" or row_lc_id != last_ai.id:
+            # A turn was answered outside the graph (fast path/tier, another node) or rows changed
+            return "diverged"
+        tokens = sum(message_tokens(m) for m in state_messages)
+        if tokens > token_budget:
+            # Let the DB path apply the summary and token window again
+            return "over_budget"
+        return None
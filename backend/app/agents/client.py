@@ -5,22 +5,32 @@ from langgraph_supervisor import create_supervisor
 from langchain_core.messages import HumanMessage, AIMessage
 from langchain_core.tools import tool
 from langchain_core.prompts import ChatPromptTemplate
-from typing import Any, Dict, List
+from typing import Any, Callable, Dict, List, Optional
 from dotenv import load_dotenv
 import os
+from loguru import logger
 from app.agents.prompts import (
     GOALS_AGENT_PROMPT,
     SUPERVISOR_PROMPT,
     DIET_AGENT_PROMPT,
     STRENGTH_AGENT_PROMPT,
     CARDIO_AGENT_PROMPT,
+    FLAT_COACH_PROMPT,
 )
 from app.agents.context import CURRENT_JWT, CURRENT_GOAL_ID
 from app.tools.goals_mcp import make_goals_mcp_tools
 from app.tools.generators import make_generators
 from app.tools.search_tavily import get_tavily_tool
 from app.agents.utils.tracing import TracingCallbackHandler
-from app.agents.schemas import ItemsModel
+from app.agents.utils.accounting import AccountingCallbackHandler, agent_scope
+from app.observability.metrics import GENERATION_ITEMS
+from app.observability.timing import phase, timed_phase
+from app.agents.utils.hedging import HedgedCaller
+from app.dependencies.deadline import DeadlineCallbackHandler, budget
+from app.agents.schemas import ItemsModel, RouteDecision
+from app.agents.router import ChatRouter
+from app.agents.checkpoint import CoachCheckpointer
+from app.agents.context_encoder import encode_context
 
 # Load environment variables from .env file
 load_dotenv()
@@ -34,9 +44,58 @@ SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_ANON_KEY = os.getenv("SUPABASE_ANON_KEY")
 TAVILY_API_KEY = os.getenv("TAVILY_API_KEY")
 
+# Chat model tiers: the full tier backs the supervisor graph, the fast tier answers
+# easy turns directly, and the router model classifies ambiguous turns.
+COACH_FULL_MODEL = os.getenv("COACH_FULL_MODEL", "gpt-4o")
+COACH_FAST_MODEL = os.getenv("COACH_FAST_MODEL", "gpt-4o-mini")
+COACH_ROUTER_MODEL = os.getenv("COACH_ROUTER_MODEL", "gpt-4o-mini")
+COACH_SUMMARY_MODEL = os.getenv("COACH_SUMMARY_MODEL", COACH_FAST_MODEL)
+
+# Chat graph topology: "supervisor" (supervisor -> goals_agent -> generators) or
+# "flat" (one ReAct agent holding the read tools, Tavily and the generators directly)
+COACH_TOPOLOGY = os.getenv("COACH_TOPOLOGY", "supervisor").strip().lower()
+
+
+def openai_chat_model(role: str, model: str, **kwargs: Any) -> ChatOpenAI:
+    """Default model factory: every role (full, fast, router, summary, goals_agent,
+    structured, diet_agent, strength_agent, cardio_agent) is a ChatOpenAI model."""
+    return ChatOpenAI(model=model, **kwargs)
+
+
+def build_supervisor_graph(model, goals_model, read_tools: list, generator_tools: list, checkpointer=None):
+    """Supervisor with MCP reads/search, delegating generation to a goals_agent.
+
+    Returns (compiled supervisor, goals_agent). With a checkpointer, state persists per thread_id.
+    """
+    goals_agent = create_react_agent(
+        model=goals_model,
+        tools=generator_tools,
+        name="goals_agent",
+        prompt=GOALS_AGENT_PROMPT,
+    )
+    # Supervisor doesn't need domain tools; keep only MCP reads here
+    supervisor = create_supervisor(
+        agents=[goals_agent],
+        tools=read_tools,
+        model=model,
+        prompt=SUPERVISOR_PROMPT,
+    )
+    return supervisor.compile(checkpointer=checkpointer), goals_agent
+
+
+def build_flat_graph(model, read_tools: list, generator_tools: list, checkpointer=None):
+    """Single ReAct agent: no supervisor->goals_agent handoff, so generation starts on the first LLM turn."""
+    return create_react_agent(
+        model=model,
+        tools=[*read_tools, *generator_tools],
+        name="coach",
+        prompt=FLAT_COACH_PROMPT,
+        checkpointer=checkpointer,
+    )
+
 ## context variables are imported from app.agents.context
 class FitnessCoach:
-    def __init__(self):
+    def __init__(self, model_factory: Optional[Callable[..., Any]] = None):
         # Initialize MCP client to run your servers locally
         self.mcp_client = MultiServerMCPClient({
             "supabase": {
@@ -68,9 +127,23 @@ class FitnessCoach:
         })
         # Shared tracer across the whole graph so we can see cross-agent flow
         self.tracer = TracingCallbackHandler()
+        # Tokens/cost/LLM time per request, user, route, agent and model (attached to every chat model)
+        self.accounting = AccountingCallbackHandler()
+        # Deadlines + hedging for direct domain agent calls (generate_tasks_direct)
+        self.hedger = HedgedCaller()
+        # Stops LLM/tool steps once the request deadline (CURRENT_DEADLINE) is spent
+        self.deadline_guard = DeadlineCallbackHandler()
         self.supervisor = None  # This will hold the compiled, runnable agent
         self.goals_agent = None  # expose for direct invocation
         self.graph = None # This will hold the uncompiled graph for plotting 
+        self.fast_chat = None  # fast-tier chat model for easy turns
+        self.summary_chat = None  # folds older chat turns into the running summary
+        self.router = ChatRouter()  # classifier attached in setup_agents
+        self.topology = COACH_TOPOLOGY
+        # Optional per-conversation graph state (COACH_CHECKPOINTER); off by default
+        self.checkpointer = CoachCheckpointer()
+        # Builds every chat model as factory(role, model_name, **kwargs); benchmarks pass fakes
+        self.model_factory = model_factory or openai_chat_model
 
     async def setup_agents(self):
         # Retrieve MCP tools from the "goals" server (no explicit client start needed)
@@ -83,23 +156,23 @@ class FitnessCoach:
             for t in goals_tools
         }
         # MCP Goals server tool wrappers (injects JWT/goal_id)
-        mcp_get_goals, mcp_get_goal_tasks = make_goals_mcp_tools(goals_tool_map)
+        mcp_get_goals, mcp_get_goal_tasks = make_goals_mcp_tools(goals_tool_map, tracer=self.tracer)
         
         # Domain sub-agents as ReAct agents (no tools initially). You can add per-agent tools later.
         diet_agent = create_react_agent(
-            model=ChatOpenAI(model="gpt-5-mini", temperature=0, callbacks=[self.tracer]),
+            model=self.model_factory("diet_agent", "gpt-5-mini", temperature=0, callbacks=[self.tracer, self.accounting]),
             tools=[],
             name="diet_agent",
             prompt=DIET_AGENT_PROMPT,
         )
         strength_agent = create_react_agent(
-            model=ChatOpenAI(model="gpt-5-mini", temperature=0, callbacks=[self.tracer]),
+            model=self.model_factory("strength_agent", "gpt-5-mini", temperature=0, callbacks=[self.tracer, self.accounting]),
             tools=[],
             name="strength_agent",
             prompt=STRENGTH_AGENT_PROMPT,
         )
         cardio_agent = create_react_agent(
-            model=ChatOpenAI(model="gpt-5-mini", temperature=0, callbacks=[self.tracer]),
+            model=self.model_factory("cardio_agent", "gpt-5-mini", temperature=0, callbacks=[self.tracer, self.accounting]),
             tools=[],
             name="cardio_agent",
             prompt=CARDIO_AGENT_PROMPT,
@@ -121,7 +194,7 @@ class FitnessCoach:
 
         # Parallel structured-output runnables for deterministic server path
         # Use a small, reliable model for structured outputs
-        base_struct = ChatOpenAI(model="gpt-4o-mini", temperature=0, callbacks=[self.tracer])
+        base_struct = self.model_factory("structured", "gpt-4o-mini", temperature=0, callbacks=[self.tracer, self.accounting])
         diet_model = base_struct.with_structured_output(ItemsModel)
         strength_model = base_struct.with_structured_output(ItemsModel)
         cardio_model = base_struct.with_structured_output(ItemsModel)
@@ -151,26 +224,32 @@ class FitnessCoach:
             diet_agent, strength_agent, cardio_agent, self.tracer
         )
 
-        # NOW create the goals coordinator agent with domain tools attached
-        goals_agent = create_react_agent(
-            model=ChatOpenAI(model="gpt-5-mini", temperature=0, callbacks=[self.tracer]),
-            tools=[diet_generate, strength_generate, cardio_generate],
-            name="goals_agent",
-            prompt=GOALS_AGENT_PROMPT,
-        )
-
-        # Supervisor doesn't need domain tools; keep only MCP reads here
+        # Read tools (MCP goals reads + Tavily) and domain generators, wired per topology
         adapted_goals_tools = [mcp_get_goals, mcp_get_goal_tasks, tavily_tool]
+        generator_tools = [diet_generate, strength_generate, cardio_generate]
+        chat_model = self.model_factory("full", COACH_FULL_MODEL, callbacks=[self.tracer, self.accounting])
 
-        supervisor = create_supervisor(
-            agents=[goals_agent],
-            tools=adapted_goals_tools,
-            model=ChatOpenAI(model="gpt-4o", callbacks=[self.tracer]),
-            prompt=SUPERVISOR_PROMPT,
-        )
+        # Model tiers for coach chat: fast model for easy turns, small classifier in front
+        self.fast_chat = self.model_factory("fast", COACH_FAST_MODEL, temperature=0.3, callbacks=[self.tracer, self.accounting])
+        self.router.classifier = self.model_factory(
+            "router", COACH_ROUTER_MODEL, temperature=0, callbacks=[self.accounting]
+        ).with_structured_output(RouteDecision)
+        self.summary_chat = self.model_factory("summary", COACH_SUMMARY_MODEL, temperature=0, callbacks=[self.accounting])
+
+        saver = await self.checkpointer.open()
+        if self.topology == "flat":
+            self.supervisor = build_flat_graph(chat_model, adapted_goals_tools, generator_tools, checkpointer=saver)
+            self.goals_agent = None
+            return
 
-        # compile the supervisor into a runnable
-        compiled = supervisor.compile()
+        # Default: supervisor wrapping the goals coordinator agent
+        compiled, goals_agent = build_supervisor_graph(
+            chat_model,
+            self.model_factory("goals_agent", "gpt-5-mini", temperature=0, callbacks=[self.tracer, self.accounting]),
+            adapted_goals_tools,
+            generator_tools,
+            checkpointer=saver,
+        )
         self.supervisor = compiled
         # Store goals agent runnable for direct calls
         try:
@@ -178,33 +257,28 @@ class FitnessCoach:
         except Exception:
             self.goals_agent = goals_agent
 
+    @timed_phase("generate")
     async def generate_tasks_direct(self, user_profile: dict, goal: dict, existing_tasks_summary: dict | None = None) -> dict:
         """Deterministically call domain sub-agents based on goal.type and merge outputs.
 
-        Returns a dict: {"items": [ ... ]}
+        Each domain call is bounded by its deadline and may be hedged (see HedgedCaller).
+        Returns a dict: {"items": [ ... ], "partial": bool, "missing_domains": [ ... ]}
+        where missing_domains lists domains that timed out or failed.
         """
-        payload = {"user_profile": user_profile, "goal": goal, "existing_tasks_summary": existing_tasks_summary or None}
-
         # Map goal types to which domain sub-agents to call (primary) with structured fallback
         goal_type = (goal.get("type") or "").lower()
-        agents_to_call = []
-        fallback_struct = []
+        agents_to_call: list[tuple[str, Any]] = []
         if goal_type in {"fat_loss"}:
-            agents_to_call = [self.diet_agent, self.cardio_agent]
-            # fallback_struct = [self.diet_struct, self.cardio_struct]
+            agents_to_call = [("diet", self.diet_agent), ("cardio", self.cardio_agent)]
         elif goal_type in {"build_muscle"}:
-            agents_to_call = [self.strength_agent, self.diet_agent, self.cardio_agent]
-            # fallback_struct = [self.strength_struct, self.diet_struct, self.cardio_struct]
+            agents_to_call = [("strength", self.strength_agent), ("diet", self.diet_agent), ("cardio", self.cardio_agent)]
         elif goal_type in {"healthy_lifestyle"}:
-            agents_to_call = [self.diet_agent]
-            # fallback_struct = [self.diet_struct]
+            agents_to_call = [("diet", self.diet_agent)]
         elif goal_type in {"sculpt_flow"}:
-            agents_to_call = [self.strength_agent, self.cardio_agent, self.diet_agent]
-            # fallback_struct = [self.strength_struct, self.cardio_struct, self.diet_struct]
+            agents_to_call = [("strength", self.strength_agent), ("cardio", self.cardio_agent), ("diet", self.diet_agent)]
         else:
             # default: try all three
-            agents_to_call = [self.diet_agent, self.strength_agent, self.cardio_agent]
-            # fallback_struct = [self.diet_struct, self.strength_struct, self.cardio_struct]
+            agents_to_call = [("diet", self.diet_agent), ("strength", self.strength_agent), ("cardio", self.cardio_agent)]
 
         # Run calls in parallel for speed
         merged: list[dict] = []
@@ -265,27 +339,54 @@ class FitnessCoach:
                 return _extract_json_dict(res)
             return {"items": []}
 
-        async def _call_agent(idx: int, ag):
-            ctx = _json.dumps(payload, default=str)
-            ag_name = getattr(ag, 'name', None) or getattr(getattr(ag, 'config', None), 'name', None) or f"agent_{idx}"
-            print(f"[DEBUG] direct_generate calling subagent={ag_name} goal_type={goal_type}")
+        callbacks = [self.tracer, self.deadline_guard]
+
+        async def _invoke(ag, ctx: str):
             try:
-                res = await ag.ainvoke({"messages": [HumanMessage(content=f"CONTEXT:\n{ctx}")]}, config={"callbacks": [self.tracer]})
+                return await ag.ainvoke({"messages": [HumanMessage(content=f"CONTEXT:\n{ctx}")]}, config={"callbacks": callbacks})
+            except _asyncio.TimeoutError:
+                raise
             except Exception:
-                res = await ag.ainvoke({"context_json": ctx}, config={"callbacks": [self.tracer]})
+                return await ag.ainvoke({"context_json": ctx}, config={"callbacks": callbacks})
+
+        async def _call_agent(domain: str, ag):
+            # Only the profile/goal fields this domain's prompt uses
+            ctx = encode_context(domain, user_profile, goal, existing_tasks_summary)
+            ag_name = getattr(ag, 'name', None) or getattr(getattr(ag, 'config', None), 'name', None) or f"{domain}_agent"
+            logger.debug("direct_generate calling subagent={} goal_type={}", ag_name, goal_type)
+            # Deadline-bound, hedged call; a miss leaves this domain out of the merged result.
+            # The agent deadline is further capped by what is left of the request budget.
+            try:
+                with agent_scope(domain), phase(f"gen-{domain}"):
+                    res = await self.hedger.call(
+                        domain,
+                        lambda: _invoke(ag, ctx),
+                        deadline=budget(self.hedger.deadline_for(domain), f"{domain} agent"),
+                    )
+            except _asyncio.TimeoutError:
+                logger.warning("subagent={} missed its deadline; returning partial results", ag_name)
+                return None
+            except Exception as e:
+                logger.warning("subagent={} failed: {}", ag_name, e)
+                return None
             out = _norm(res)
             items = out.get("items", []) if isinstance(out, dict) else []
             count = len(items) if isinstance(items, list) else 0
+            GENERATION_ITEMS.labels(domain).observe(count)
             if count == 0:
                 raw = getattr(res, "content", None) if isinstance(res, AIMessage) else (res if isinstance(res, str) else None)
                 snippet = (raw[:300] + "…") if isinstance(raw, str) and len(raw) > 300 else (raw or "<non-text>")
-                print(f"[DEBUG] subagent={ag_name} returned 0 items; raw= {snippet}")
+                logger.warning("subagent={} returned 0 items; raw= {}", ag_name, snippet)
             else:
-                print(f"[DEBUG] subagent={ag_name} produced {count} items")
+                logger.debug("subagent={} produced {} items", ag_name, count)
             return items
 
-        results = await _asyncio.gather(*(_call_agent(i, ag) for i, ag in enumerate(agents_to_call)))
-        for items in results:
+        results = await _asyncio.gather(*(_call_agent(d, ag) for d, ag in agents_to_call))
+        missing_domains: list[str] = []
+        for (domain, _ag), items in zip(agents_to_call, results):
+            if items is None:
+                missing_domains.append(domain)
+                continue
             merged.extend(items or [])
 
         # Optional: light dedupe by (title, due_at)
@@ -298,4 +399,5 @@ class FitnessCoach:
             seen.add(key)
             deduped.append(it)
 
-        return {"items": deduped}
\ No newline at end of file
+        GENERATION_ITEMS.labels("merged").observe(len(deduped))
+        return {"items": deduped, "partial": bool(missing_domains), "missing_domains": missing_domains}
\ No newline at end of file
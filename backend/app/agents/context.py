@@ -4,3 +4,11 @@ import contextvars
 # Per-request context for auth and goal routing
 CURRENT_JWT: contextvars.ContextVar[str | None] = contextvars.ContextVar("current_jwt", default=None)
 CURRENT_GOAL_ID: contextvars.ContextVar[str | None] = contextvars.ContextVar("current_goal_id", default=None)
+# Absolute time.monotonic() deadline for the current request (None = unbounded)
+CURRENT_DEADLINE: contextvars.ContextVar[float | None] = contextvars.ContextVar("current_deadline", default=None)
+# Token/latency accounting for the current request (app.agents.utils.accounting.RequestUsage)
+CURRENT_USAGE: contextvars.ContextVar[object | None] = contextvars.ContextVar("current_usage", default=None)
+# Agent that LLM calls in this context are attributed to (diet/strength/cardio/router/...)
+CURRENT_AGENT: contextvars.ContextVar[str | None] = contextvars.ContextVar("current_agent", default=None)
+# Phase durations for the Server-Timing header (app.observability.timing.ServerTiming)
+CURRENT_TIMING: contextvars.ContextVar[object | None] = contextvars.ContextVar("current_timing", default=None)
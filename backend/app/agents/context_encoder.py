@@ -0,0 +1,151 @@
+# app/agents/context_encoder.py
+"""Compact CONTEXT payloads for the domain agents.
+
+The task generators used to receive `json.dumps(payload, default=str)` of the raw
+profile and goal rows: ids, timestamps, nulls and columns no domain prompt reads, sent
+identically to every agent. `encode_context` projects each domain onto the fields its
+prompt uses, derives age from dob, drops empty values and trims the existing-task
+summary, then serializes with sorted keys and no whitespace so equal inputs give
+byte-identical prompts (which also keeps provider prompt caching effective).
+
+The payload also carries `today`, the user's local date. Goal rows are projected without
+created_at, so it is the agents' only anchor for "the next 14 days".
+"""
+import json
+import os
+from datetime import date, datetime, timezone
+from decimal import Decimal
+from typing import Any, Dict, Optional, Tuple
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+COMPACT_CONTEXT_ENABLED = os.getenv("COACH_COMPACT_CONTEXT", "1").strip().lower() not in ("0", "false", "no", "off")
+# Existing tasks listed per agent call (day_load still covers all of them)
+CONTEXT_MAX_EXISTING_TASKS = int(os.getenv("COACH_CONTEXT_MAX_EXISTING_TASKS", "20"))
+_TITLE_CHARS = 70
+
+# Profile fields every domain prompt uses (safety, scheduling, units, difficulty)
+_COMMON_PROFILE_FIELDS = (
+    "fitness_level", "activity_level", "unit_pref", "timezone", "availability_days", "injuries", "medical_conditions",
+)
+PROFILE_FIELDS: Dict[str, Tuple[str, ...]] = {
+    "diet": _COMMON_PROFILE_FIELDS + ("sex", "age", "height_cm", "weight_kg", "body_fat_pct"),
+    "strength": _COMMON_PROFILE_FIELDS + ("sex", "age", "weight_kg"),
+    "cardio": _COMMON_PROFILE_FIELDS + ("age", "resting_hr", "max_hr"),
+    # Unknown domain (e.g. the goals coordinator): everything except bookkeeping columns
+    "all": _COMMON_PROFILE_FIELDS + ("sex", "age", "height_cm", "weight_kg", "body_fat_pct", "resting_hr", "max_hr"),
+}
+GOAL_FIELDS = ("type", "target_value", "target_date")
+
+
+def _age(dob: Any, today: Optional[date] = None) -> Optional[int]:
+    if not dob:
+        return None
+    try:
+        born = dob if isinstance(dob, date) else date.fromisoformat(str(dob)[:10])
+    except ValueError:
+        return None
+    today = today or date.today()
+    return today.year - born.year - ((today.month, today.day) < (born.month, born.day))
+
+
+def _local_today(tz_name: Any) -> date:
+    """Today's date in the user's timezone (UTC when unset or unknown)."""
+    try:
+        tz = ZoneInfo(str(tz_name).strip()) if tz_name and str(tz_name).strip() else timezone.utc
+    except (ZoneInfoNotFoundError, ValueError):
+        tz = timezone.utc
+    return datetime.now(tz).date()
+
+
+def _compact_value(value: Any) -> Any:
+    """Normalize a scalar/list for the payload; None means drop it."""
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = value.strip()
+        return value if value and value.lower() not in ("none", "null", "n/a") else None
+    if isinstance(value, Decimal):
+        value = float(value)
+    if isinstance(value, float):
+        return int(value) if value.is_integer() else round(value, 2)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, (list, tuple)):
+        items = [v for v in (_compact_value(v) for v in value) if v is not None]
+        return items or None
+    return value
+
+
+def _project(row: Optional[Dict[str, Any]], fields: Tuple[str, ...]) -> Dict[str, Any]:
+    out: Dict[str, Any] = {}
+    for f in fields:
+        v = _compact_value((row or {}).get(f))
+        if v is not None:
+            out[f] = v
+    return out
+
+
+def compact_profile(profile: Optional[Dict[str, Any]], domain: str = "all", *, today: Optional[date] = None) -> Dict[str, Any]:
+    row = dict(profile or {})
+    if "age" not in row:
+        row["age"] = _age(row.get("dob"), today)
+    return _project(row, PROFILE_FIELDS.get(domain, PROFILE_FIELDS["all"]))
+
+
+def compact_goal(goal: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    return _project(goal, GOAL_FIELDS)
+
+
+def compact_tasks_summary(summary: Optional[Dict[str, Any]], *, max_items: int = CONTEXT_MAX_EXISTING_TASKS) -> Optional[Dict[str, Any]]:
+    """day_load without empty days plus the soonest `max_items` tasks as {title, due_at}."""
+    if not summary:
+        return None
+    out: Dict[str, Any] = {}
+    day_load = {str(d): n for d, n in (summary.get("day_load") or {}).items() if n}
+    if day_load:
+        out["day_load"] = day_load
+    items = []
+    for it in summary.get("items") or []:
+        title = _compact_value(it.get("title"))
+        if not title:
+            continue
+        item = {"title": title[:_TITLE_CHARS]}
+        due = _compact_value(it.get("due_at"))
+        if due:
+            item["due_at"] = str(due).replace("+00:00", "Z")
+        items.append(item)
+    items.sort(key=lambda it: it.get("due_at") or "~")
+    if items:
+        out["items"] = items[:max_items]
+    return out or None
+
+
+def encode_context(
+    domain: str,
+    user_profile: Optional[Dict[str, Any]],
+    goal: Optional[Dict[str, Any]],
+    existing_tasks_summary: Optional[Dict[str, Any]] = None,
+    *,
+    today: Optional[date] = None,
+) -> str:
+    """CONTEXT string for one domain agent (the raw JSON dump when COACH_COMPACT_CONTEXT=0)."""
+    if not COMPACT_CONTEXT_ENABLED:
+        return encode_context_raw(user_profile, goal, existing_tasks_summary)
+    today = today or _local_today((user_profile or {}).get("timezone"))
+    payload: Dict[str, Any] = {
+        "today": today.isoformat(),
+        "user_profile": compact_profile(user_profile, domain, today=today),
+        "goal": compact_goal(goal),
+    }
+    summary = compact_tasks_summary(existing_tasks_summary)
+    if summary:
+        payload["existing_tasks_summary"] = summary
+    return json.dumps(payload, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+
+
+def encode_context_raw(
+    user_profile: Optional[Dict[str, Any]], goal: Optional[Dict[str, Any]], existing_tasks_summary: Optional[Dict[str, Any]] = None
+) -> str:
+    """The previous encoding: the full rows as-is."""
+    payload = {"user_profile": user_profile, "goal": goal, "existing_tasks_summary": existing_tasks_summary or None}
+    return json.dumps(payload, default=str)
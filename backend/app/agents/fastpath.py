@@ -0,0 +1,246 @@
+# app/agents/fastpath.py
+"""Direct answers for common read-only data questions ("what are my tasks this week?").
+
+These turns would otherwise cost a supervisor LLM turn, an MCP tool call and a second
+LLM turn to phrase the result. Here they are one or two PostgREST reads plus a template.
+"""
+import asyncio
+import os
+import re
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+from zoneinfo import ZoneInfo
+
+from loguru import logger
+
+from app.agents.utils.stats import LatencyWindow
+from app.dependencies.supabase_rest import sb_select, supabase_configured
+
+FASTPATH_ENABLED = os.getenv("COACH_FASTPATH", "1").strip().lower() not in ("0", "false", "no", "off")
+FASTPATH_MAX_ITEMS = int(os.getenv("COACH_FASTPATH_MAX_ITEMS", "10"))
+
+# Anything that asks to change data, or asks for advice/explanation, goes to the agents
+_EXCLUDE_RE = re.compile(
+    r"\b(create|add|make|generate|plan|change|update|move|reschedule|delete|remove|cancel|mark|complete|"
+    r"swap|replace|adjust|why|how (should|do|can)|how much|how many|should|help me|instead|"
+    r"tips?|advice|best|good|better|ideal|realistic|recommend\w*|suggest\w*|explain)\b",
+    re.IGNORECASE,
+)
+_TASKS_RE = re.compile(r"\b(tasks?|to-?dos?|workouts?|sessions?|schedule|planned)\b", re.IGNORECASE)
+# Only requests to list the goals ("what are my goals?", "show goals"), not "goal weight" etc.
+_GOALS_RE = re.compile(
+    r"\b((my|current|active) goals?|what goals?|goals? (do|have) i|(show|list|see)\b.*\bgoals?)\b"
+    r"(?!\s*(weight|pace|time|date|distance|heart))",
+    re.IGNORECASE,
+)
+_QUESTION_RE = re.compile(r"^(what|what's|whats|which|show|list|do i have|any|when|tell me|give me)\b|\?\s*$", re.IGNORECASE)
+_NEXT_RE = re.compile(r"\b(next|upcoming|coming up)\b", re.IGNORECASE)
+_PERIODS: List[Tuple[str, re.Pattern]] = [
+    ("today", re.compile(r"\b(today|tonight)\b", re.IGNORECASE)),
+    ("tomorrow", re.compile(r"\btomorrow\b", re.IGNORECASE)),
+    ("this_week", re.compile(r"\b(this week|the week|for the week|week)\b", re.IGNORECASE)),
+    ("next_week", re.compile(r"\bnext week\b", re.IGNORECASE)),
+]
+
+_PERIOD_LABELS = {
+    "today": "today",
+    "tomorrow": "tomorrow",
+    "this_week": "this week",
+    "next_week": "next week",
+    "upcoming": "coming up",
+}
+
+
+def match_intent(message: str) -> Optional[Dict[str, str]]:
+    """Return {"intent": "tasks"|"next_task"|"goals", "period": ...} for read-only data questions."""
+    text = (message or "").strip()
+    if not text or len(text) > 160 or _EXCLUDE_RE.search(text) or not _QUESTION_RE.search(text):
+        return None
+    if _TASKS_RE.search(text):
+        if re.search(r"\bnext (task|workout|session)\b", text, re.IGNORECASE):
+            return {"intent": "next_task", "period": "upcoming"}
+        # "next week" must win over the generic "week"
+        for period, rx in sorted(_PERIODS, key=lambda p: p[0] != "next_week"):
+            if rx.search(text):
+                return {"intent": "tasks", "period": period}
+        if _NEXT_RE.search(text):
+            return {"intent": "tasks", "period": "upcoming"}
+        return None
+    if _GOALS_RE.search(text):
+        return {"intent": "goals", "period": "all"}
+    return None
+
+
+def _period_bounds(period: str, tz: ZoneInfo, now: Optional[datetime] = None) -> Tuple[datetime, Optional[datetime]]:
+    """UTC [start, end) for a period in the user's timezone; end None means open-ended."""
+    now_local = (now or datetime.now(timezone.utc)).astimezone(tz)
+    day0 = now_local.replace(hour=0, minute=0, second=0, microsecond=0)
+    if period == "today":
+        start, end = day0, day0 + timedelta(days=1)
+    elif period == "tomorrow":
+        start, end = day0 + timedelta(days=1), day0 + timedelta(days=2)
+    elif period == "this_week":
+        # Remaining days of the current Mon–Sun week
+        start, end = day0, day0 + timedelta(days=7 - day0.weekday())
+    elif period == "next_week":
+        start = day0 + timedelta(days=7 - day0.weekday())
+        end = start + timedelta(days=7)
+    else:
+        start, end = now_local, None
+    return start.astimezone(timezone.utc), (end.astimezone(timezone.utc) if end else None)
+
+
+def _iso(dt: datetime) -> str:
+    return dt.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def _tz(profile: Optional[Dict[str, Any]]) -> ZoneInfo:
+    name = (profile or {}).get("timezone") or "UTC"
+    try:
+        return ZoneInfo(name)
+    except Exception:
+        return ZoneInfo("UTC")
+
+
+def _fmt_due(due_at: Optional[str], tz: ZoneInfo) -> str:
+    if not due_at:
+        return "no due date"
+    try:
+        dt = datetime.fromisoformat(due_at.replace("Z", "+00:00")).astimezone(tz)
+    except ValueError:
+        return due_at
+    # No %-d/%-I: those flags are glibc-only
+    return f"{dt.strftime('%a %b')} {dt.day}, {dt.strftime('%I').lstrip('0')}:{dt.strftime('%M %p')}"
+
+
+def format_tasks(
+    rows: List[Dict[str, Any]], period: str, tz: ZoneInfo, *, next_only: bool = False, truncated: bool = False
+) -> str:
+    """Task list reply; `truncated` means the read hit its row limit, so len(rows) is a lower bound."""
+    label = _PERIOD_LABELS.get(period, period)
+    if not rows:
+        return "You don't have any upcoming tasks." if next_only else f"You have no tasks {label}."
+    if next_only:
+        r = rows[0]
+        return f"Your next task is **{r.get('title')}** — {_fmt_due(r.get('due_at'), tz)}."
+    shown = rows[:FASTPATH_MAX_ITEMS]
+    noun = "task" if len(rows) == 1 else "tasks"
+    count = f"at least {len(rows)}" if truncated else str(len(rows))
+    lines = [f"You have {count} {noun} {label}:"]
+    for r in shown:
+        status = r.get("status") or "pending"
+        suffix = "" if status == "pending" else f" ({status})"
+        lines.append(f"• {_fmt_due(r.get('due_at'), tz)} — {r.get('title')}{suffix}")
+    if len(rows) > len(shown):
+        lines.append(f"…and {'at least ' if truncated else ''}{len(rows) - len(shown)} more.")
+    return "\n".join(lines)
+
+
+def format_goals(rows: List[Dict[str, Any]]) -> str:
+    active = [g for g in rows if (g.get("status") or "active") == "active"]
+    if not active:
+        return "You don't have any active goals yet."
+    noun = "goal" if len(active) == 1 else "goals"
+    lines = [f"You have {len(active)} active {noun}:"]
+    for g in active:
+        label = str(g.get("type") or "goal").replace("_", " ")
+        extra = []
+        if g.get("target_value") is not None:
+            extra.append(f"target {g['target_value']}")
+        if g.get("target_date"):
+            extra.append(f"by {g['target_date']}")
+        lines.append(f"• {label}" + (f" ({', '.join(extra)})" if extra else ""))
+    return "\n".join(lines)
+
+
+class FastPathStats:
+    def __init__(self) -> None:
+        self.hits: Dict[str, int] = {}
+        self.misses = 0
+        self.errors = 0
+        self.latency = LatencyWindow()
+
+    def snapshot(self) -> Dict[str, Any]:
+        total_hits = sum(self.hits.values())
+        total = total_hits + self.misses
+        return {
+            "hits": dict(self.hits),
+            "misses": self.misses,
+            "errors": self.errors,
+            "hit_rate": round(total_hits / total, 4) if total else 0.0,
+            "latency_s": self.latency.snapshot(),
+        }
+
+
+class DataFastPath:
+    """Answer read-only task/goal questions straight from Supabase (RLS via the user's JWT)."""
+
+    def __init__(self, *, enabled: bool = FASTPATH_ENABLED) -> None:
+        self.enabled = enabled
+        self.stats = FastPathStats()
+
+    async def try_answer(
+        self, message: str, *, user_id: str, user_jwt: str, goal_id: Optional[str] = None
+    ) -> Optional[str]:
+        """Return the templated answer text, or None to fall through to the agents."""
+        intent = match_intent(message) if self.enabled and supabase_configured() else None
+        if intent is None:
+            self.stats.misses += 1
+            return None
+        t0 = time.monotonic()
+        try:
+            text = await self._answer(intent, user_id=user_id, user_jwt=user_jwt, goal_id=goal_id)
+        except Exception as e:
+            # Never fail the chat turn here; let the supervisor handle it
+            self.stats.errors += 1
+            logger.warning("{} failed, falling back to agents: {}", intent["intent"], e)
+            return None
+        self.stats.hits[intent["intent"]] = self.stats.hits.get(intent["intent"], 0) + 1
+        self.stats.latency.observe(time.monotonic() - t0)
+        return text
+
+    async def _answer(self, intent: Dict[str, str], *, user_id: str, user_jwt: str, goal_id: Optional[str]) -> str:
+        if intent["intent"] == "goals":
+            rows = await sb_select(
+                "goals",
+                f"select=id,type,target_value,target_date,status&user_id=eq.{user_id}&order=created_at.desc&limit=20",
+                user_token=user_jwt,
+            )
+            return format_goals(rows)
+
+        # The period depends on the profile timezone; rather than waiting for the profile,
+        # read tasks for a window padded by the widest UTC offsets and trim once tz is known.
+        utc_start, utc_end = _period_bounds(intent["period"], ZoneInfo("UTC"))
+        pad = timedelta(hours=14)
+        q = f"select=id,title,due_at,status,goal_id&user_id=eq.{user_id}&due_at=gte.{_iso(utc_start - pad)}"
+        if utc_end is not None:
+            q += f"&due_at=lt.{_iso(utc_end + pad)}"
+        if goal_id:
+            q += f"&goal_id=eq.{goal_id}"
+        next_only = intent["intent"] == "next_task"
+        if next_only or intent["period"] == "upcoming":
+            q += "&status=eq.pending"
+        limit = FASTPATH_MAX_ITEMS + 40
+        q += f"&order=due_at.asc&limit={limit}"
+        profile_rows, task_rows = await asyncio.gather(
+            sb_select("profiles", f"select=timezone&id=eq.{user_id}", user_token=user_jwt),
+            sb_select("tasks", q, user_token=user_jwt),
+        )
+        tz = _tz(profile_rows[0] if profile_rows else None)
+        start, end = _period_bounds(intent["period"], tz)
+        rows = [r for r in task_rows if _in_window(r.get("due_at"), start, end)]
+        # A full page may have cut off later tasks in the period
+        return format_tasks(rows, intent["period"], tz, next_only=next_only, truncated=len(task_rows) >= limit)
+
+
+def _in_window(due_at: Optional[str], start: datetime, end: Optional[datetime]) -> bool:
+    if not due_at:
+        return False
+    try:
+        dt = datetime.fromisoformat(due_at.replace("Z", "+00:00"))
+    except ValueError:
+        return False
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt >= start and (end is None or dt < end)
@@ -1,22 +1,99 @@
 import asyncio
-from typing import Any, Dict, Optional, List
+import time
+import uuid
+from typing import Any, Dict, Optional, List, Tuple
 
-from langchain_core.messages import HumanMessage, AIMessage, BaseMessage
+from langchain_core.messages import HumanMessage, AIMessage, BaseMessage, RemoveMessage, SystemMessage, ToolMessage
+from langgraph.graph.message import REMOVE_ALL_MESSAGES
+from loguru import logger
 
+from app.agents.answer_cache import SemanticAnswerCache
 from app.agents.client import FitnessCoach
 from app.agents.context import CURRENT_JWT, CURRENT_GOAL_ID
+from app.agents.fastpath import DataFastPath
+from app.agents.history_cache import HistoryCache
+from app.agents.long_term_memory import LongTermMemory, format_memories
+from app.agents.prefetch import ContextPrefetcher, PrefetchedContext, count_read_tool_calls
+from app.agents.prompts import FAST_COACH_PROMPT
+from app.agents.router import ESCALATE_TOKEN
+from app.agents.trajectory import trajectory_to_persist
+from app.agents.utils.accounting import agent_scope, current_usage
+from app.agents.utils.tracing import sampled
+from app.agents.tokens import HISTORY_FETCH_LIMIT, history_budget, window_messages
+from app.agents.summary import ConversationSummarizer, summary_message, unsummarized
 from app.dependencies.chat_store import ChatStore
+from app.dependencies.deadline import with_deadline
+from app.observability.log import LOG_TRANSCRIPT_SAMPLE_RATE
+from app.observability.timing import phase
+
+
+def _sender(m: BaseMessage) -> str:
+    # Try several places where LangChain/LangGraph may stash the agent name
+    for key in ("name",):
+        val = getattr(m, key, None)
+        if isinstance(val, str) and val:
+            return val
+    ak = getattr(m, "additional_kwargs", None) or {}
+    for key in ("name", "sender", "agent", "from"):
+        val = ak.get(key)
+        if isinstance(val, str) and val:
+            return val
+    rm = getattr(m, "response_metadata", None) or {}
+    val = rm.get("agent") if isinstance(rm, dict) else None
+    if isinstance(val, str) and val:
+        return val
+    return "supervisor"
+
+
+def _role(m: BaseMessage) -> str:
+    # Common message classes: HumanMessage/AIMessage/ToolMessage/SystemMessage
+    r = getattr(m, "type", None) or m.__class__.__name__.replace("Message", "").lower()
+    return f"{r}[{_sender(m)}]"
+
+
+def _transcript_lines(msgs: List[BaseMessage]) -> List[str]:
+    lines = []
+    for i, m in enumerate(msgs):
+        content = getattr(m, "content", "")
+        if not isinstance(content, str):
+            try:
+                content = str(content)
+            except Exception:
+                content = "<non-text>"
+        content = content.replace("\n", " ")
+        if len(content) > 300:
+            content = content[:300] + "…"
+        lines.append(f"{i:02d} {_role(m)}: {content}")
+    return lines
+
+
+def _transcript_sampled() -> bool:
+    """Whether this turn's transcript is logged (LOG_TRANSCRIPT_SAMPLE_RATE, by request id)."""
+    if LOG_TRANSCRIPT_SAMPLE_RATE <= 0.0:
+        return False
+    usage = current_usage()
+    return sampled(usage.request_id if usage is not None else uuid.uuid4().hex, LOG_TRANSCRIPT_SAMPLE_RATE)
 
 
 class CoachService:
-    def __init__(self) -> None:
-        self._coach = FitnessCoach()
+    def __init__(self, model_factory: Optional[Any] = None) -> None:
+        self._coach = FitnessCoach(model_factory=model_factory)
         self._ready = False
         self._ready_lock = asyncio.Lock()
-        # In-memory per-user histories to preserve context (kept temporarily as fallback/cache)
-        self._histories: Dict[str, List[BaseMessage]] = {}
+        # Hot history rows per conversation (write-through, validated by conversations.version)
+        self._history_cache = HistoryCache()
         # DB-backed transcript store (avoid shared store for RLS; use per-request store in ainvoke_chat)
         self._store = ChatStore()
+        # Direct Supabase answers for read-only task/goal questions
+        self._fastpath = DataFastPath()
+        # Profile/goals/upcoming tasks injected into supervisor turns
+        self._prefetch = ContextPrefetcher()
+        # Running summary of turns older than the recent window
+        self._summarizer = ConversationSummarizer(on_update=self._history_cache.apply_summary)
+        # Per-user vector index over older user messages (facts beyond the history window)
+        self._memory = LongTermMemory()
+        # Shared answers to general fitness questions (non-personal turns only)
+        self._answer_cache = SemanticAnswerCache()
 
     async def _ensure_ready(self) -> None:
         if self._ready:
@@ -36,11 +113,11 @@ class CoachService:
         message: str,
         goal_id: Optional[str] = None,
     ) -> AIMessage:
-        """Send a message to the supervisor agent and return the final AIMessage.
+        """Send a message to the coach and return the final AIMessage.
 
-        The supervisor graph expects a list of LC messages under the `messages` key.
-        We include user_id/goal_id inline to guide routing, but the Supervisor prompt
-        determines the actual tool calls.
+        The ChatRouter picks a tier per turn: easy turns are answered by the fast model,
+        everything else by the supervisor graph, which expects a list of LC messages under
+        the `messages` key. The Supervisor prompt determines the actual tool calls.
         """
         await self._ensure_ready()
 
@@ -56,29 +133,284 @@ class CoachService:
         store = ChatStore(user_token=user_jwt)
 
         # Resolve conversation for (user_id, goal_id); Home uses goal_id=None
-        conversation_id = store.get_or_create_conversation(user_id, goal_id)
+        conversation_id = await asyncio.to_thread(store.get_or_create_conversation, user_id, goal_id)
 
-        # Load recent messages from DB and convert to LangChain messages
-        recent_rows = store.fetch_recent_messages(conversation_id, limit_n=30)
-        history: List[BaseMessage] = store.to_lc_messages(recent_rows)
+        # Read-only data questions ("what are my tasks this week?") are answered straight
+        # from Supabase; the exchange is persisted like any other turn.
+        with phase("fastpath"):
+            fast_answer = await self._fastpath.try_answer(user_content, user_id=user_id, user_jwt=user_jwt, goal_id=goal_id)
+        if fast_answer is not None:
+            user_row = await asyncio.to_thread(store.insert_message, conversation_id, role="user", content={"text": user_content})
+            final_ai = AIMessage(content=fast_answer)
+            ai_row = await asyncio.to_thread(store.insert_lc_message, conversation_id, final_ai)
+            self._history_cache.append(conversation_id, [user_row, ai_row])
+            self._memory.index_in_background(user_id, [user_row])
+            return final_ai
 
-        # Append and persist the new human message before invoking the model
-        new_human = HumanMessage(content=user_content)
-        input_messages: List[BaseMessage] = [*history, new_human]
-        store.insert_message(conversation_id, role="user", content={"text": user_content})
+        # General questions ("what is zone 2?") may be answered from the semantic cache; on a
+        # miss they run without the user's context so the answer can be shared
+        t_turn = time.monotonic()
+        with phase("answer-cache"):
+            cache_vec = await self._answer_cache.embed(user_content) if self._answer_cache.eligible(user_content) else None
+            hit = self._answer_cache.lookup(cache_vec) if cache_vec is not None else None
+        if hit is not None:
+            answer, score, question = hit
+            user_row = await asyncio.to_thread(store.insert_message, conversation_id, role="user", content={"text": user_content})
+            final_ai = AIMessage(content=answer)
+            ai_row = await asyncio.to_thread(store.insert_lc_message, conversation_id, final_ai)
+            self._history_cache.append(conversation_id, [user_row, ai_row])
+            self._memory.index_in_background(user_id, [user_row])
+            self._answer_cache.stats.hit_latency.observe(time.monotonic() - t_turn)
+            logger.info("answer-cache hit score={:.3f} cached_question={!r}", score, question[:80])
+            return final_ai
+
+        # Start reading the user's profile/goals/tasks now so it overlaps history loading
+        prefetch_task = None if cache_vec is not None else self._prefetch.start(user_id=user_id, user_jwt=user_jwt, goal_id=goal_id)
+        memory_task: Optional[asyncio.Task] = None
+        try:
+            # With a checkpointer, resume the conversation's graph state when it is in sync with
+            # the messages table; otherwise rebuild the history from the DB rows
+            # Shareable (answer-cache eligible) turns skip the thread so nothing from it reaches the model
+            checkpointer = self._coach.checkpointer
+            thread_id = conversation_id if checkpointer.enabled and cache_vec is None else None
+            with phase("checkpoint"):
+                resumed = await self._resume_checkpoint(store, conversation_id) if thread_id else None
+            new_human = HumanMessage(content=user_content)
+            summary: Optional[str] = None
+            pending_rows: List[Dict[str, Any]] = []
+            if resumed is not None:
+                # The checkpoint already holds the history (and the last summary/context messages)
+                history: List[BaseMessage] = [m for m in resumed if isinstance(m, (HumanMessage, AIMessage))]
+                fast_history = window_messages(history, history_budget("fast"))
+                input_messages: List[BaseMessage] = [new_human]
+            else:
+                # Recent messages and the running summary come from the hot cache when its version
+                # matches the conversation row; otherwise they are loaded off the event loop (so the
+                # prefetch makes progress meanwhile). Only messages after the summary cursor are replayed.
+                version = store.conversation_version(conversation_id)
+                cached = self._history_cache.get(conversation_id, version)
+                if cached is not None:
+                    summary_row, recent_rows = cached
+                else:
+                    summary_row, recent_rows = await asyncio.gather(
+                        asyncio.to_thread(store.get_summary, conversation_id),
+                        asyncio.to_thread(store.fetch_recent_messages, conversation_id, HISTORY_FETCH_LIMIT),
+                    )
+                    self._history_cache.put(
+                        conversation_id, user_id=user_id, version=version, summary_row=summary_row, rows=recent_rows
+                    )
+                summary = summary_row.get("summary") if self._summarizer.enabled else None
+                pending_rows = unsummarized(recent_rows, summary_row.get("summary_through")) if summary else recent_rows
+                # Each tier gets the newest messages that fit its token budget (counts stored per row)
+                history = store.to_lc_messages(pending_rows, token_budget=history_budget("full"))
+                fast_history = store.to_lc_messages(pending_rows, token_budget=history_budget("fast"))
+                input_messages = [*history, new_human]
+                if cache_vec is not None:
+                    # The answer may be cached for every user: the model sees the question alone,
+                    # without this user's history or running summary (still loaded for the summarizer)
+                    history, fast_history, input_messages = [], [], [new_human]
+                elif summary:
+                    input_messages.insert(0, summary_message(summary))
+                    self._summarizer.stats.turns_with_summary += 1
 
-        print(
-            f"[DEBUG] invoking supervisor: user={user_id} history_len={len(history)} last_user={user_content[:120]}"
+            # Append and persist the new human message before invoking the model
+            user_row = await asyncio.to_thread(store.insert_message, conversation_id, role="user", content={"text": user_content})
+
+            # Recall older messages relevant to this one while routing runs (only the full tier uses them)
+            in_window = {r.get("id") for r in pending_rows if r.get("id")}
+            memory_task = (
+                None if cache_vec is not None
+                else asyncio.create_task(self._recall(user_id, user_content, history, exclude_ids=in_window))
+            )
+
+            # Route the turn: easy turns go to the fast tier, everything else to the supervisor graph
+            with agent_scope("router"), phase("router"):
+                route = await self._coach.router.route(user_content, history)
+            tier = route["tier"]
+            t0 = time.monotonic()
+            final_ai: Optional[AIMessage] = None
+            trajectory: List[BaseMessage] = []
+            if tier == "fast" and self._coach.fast_chat is not None:
+                with agent_scope("fast"), phase("llm-fast"):
+                    final_ai = await self._ainvoke_fast(fast_history, new_human)
+                if final_ai is None:
+                    # Fast tier asked for the full graph
+                    self._coach.router.stats.escalations += 1
+                    tier = "full"
+            if final_ai is None:
+                with phase("prefetch-wait"):
+                    prefetched, exposed_s = await self._await_prefetch(prefetch_task)
+                with phase("memory-wait"):
+                    memories = await memory_task if memory_task is not None else None
+                full_input = list(input_messages)
+                if memories is not None:
+                    full_input.insert(0, memories)
+                if prefetched is not None:
+                    full_input.insert(0, prefetched.as_message())
+                if thread_id and resumed is None:
+                    # Replace whatever the thread held with the history rebuilt from the DB
+                    full_input.insert(0, RemoveMessage(id=REMOVE_ALL_MESSAGES))
+                logger.debug("invoking supervisor: user={} history_len={} last_user={}", user_id, len(history), user_content[:120])
+                t_full = time.monotonic()
+                with phase("graph"):
+                    final_ai, turn_msgs = await self._ainvoke_full(full_input, user_jwt=user_jwt, goal_id=goal_id, thread_id=thread_id)
+                read_calls = count_read_tool_calls(turn_msgs)
+                # Tool calls/results are persisted with the reply so later turns can reuse them
+                trajectory = trajectory_to_persist(turn_msgs, final_ai)
+                self._prefetch.stats.record_turn(
+                    injected=prefetched is not None,
+                    read_calls=read_calls,
+                    turn_s=time.monotonic() - t_full,
+                    exposed_s=exposed_s,
+                )
+                logger.debug(
+                    "prefetch injected={} read_tool_calls={} fetch={:.3f}s exposed={:.3f}s",
+                    prefetched is not None, read_calls, prefetched.elapsed_s if prefetched else 0, exposed_s,
+                )
+            else:
+                # Answered by the fast tier; the context was not needed
+                if prefetch_task is not None:
+                    prefetch_task.cancel()
+                    self._prefetch.stats.cancelled += 1
+            self._coach.router.stats.record_latency(tier, time.monotonic() - t0)
+            logger.info("router tier={} source={} reason={} elapsed={:.2f}s", tier, route["source"], route["reason"], time.monotonic() - t0)
+
+            if cache_vec is not None:
+                self._answer_cache.stats.miss_latency.observe(time.monotonic() - t_turn)
+                text = final_ai.content if isinstance(final_ai.content, str) else ""
+                tools_used = [m.name for m in trajectory if isinstance(m, ToolMessage)]
+                if self._answer_cache.store(user_content, cache_vec, text, tools_used):
+                    logger.debug("answer-cache stored answer for {!r}", user_content[:80])
+
+            # Persist the turn's tool traffic and the assistant reply (one insert), then return it
+            ai_rows = await asyncio.to_thread(
+                store.insert_lc_messages, conversation_id, [*trajectory, final_ai], after=user_row.get("created_at")
+            )
+            self._history_cache.append(conversation_id, [user_row, *ai_rows])
+            self._memory.index_in_background(user_id, [user_row])
+
+            # Fold older turns into the summary in the background once the backlog is long enough
+            self._summarizer.maybe_schedule(
+                self._coach.summary_chat,
+                store=store,
+                conversation_id=conversation_id,
+                summary=summary,
+                pending_rows=pending_rows,
+                new_messages=1 + len(ai_rows),
+            )
+            return final_ai
+        finally:
+            # The prefetch and memory lookup start before routing; neither may outlive a turn
+            # that failed or was answered by the fast tier (Supabase reads would keep running
+            # with the user's JWT and their errors would never be retrieved)
+            for task in (prefetch_task, memory_task):
+                if task is None:
+                    continue
+                if not task.done():
+                    task.cancel()
+                elif not task.cancelled():
+                    task.exception()
+
+    async def _resume_checkpoint(self, store: ChatStore, conversation_id: str) -> Optional[List[BaseMessage]]:
+        """Checkpointed messages for the conversation, or None when the thread must be rebuilt."""
+        checkpointer = self._coach.checkpointer
+        try:
+            snapshot, last_rows = await asyncio.gather(
+                self._coach.supervisor.aget_state(checkpointer.thread_config(conversation_id)),
+                asyncio.to_thread(store.fetch_recent_messages, conversation_id, 1),
+            )
+        except Exception as e:
+            checkpointer.stats.record_rebuild("error")
+            logger.warning("checkpoint state read failed conv={}: {}", conversation_id, e)
+            return None
+        messages = list((snapshot.values or {}).get("messages", []))
+        # The checkpoint also carries tool traffic, so allow it more room than the DB window
+        reason = checkpointer.resume_check(
+            messages, last_rows[-1] if last_rows else None, token_budget=2 * history_budget("full")
+        )
+        if reason is not None:
+            checkpointer.stats.record_rebuild(reason)
+            logger.info("checkpoint rebuilding conv={} reason={}", conversation_id, reason)
+            return None
+        checkpointer.stats.resumed += 1
+        return messages
+
+    async def _recall(
+        self, user_id: str, query: str, history: List[BaseMessage], *, exclude_ids: set
+    ) -> Optional[SystemMessage]:
+        """Long-term memories relevant to `query` as a system message (None if nothing useful)."""
+        try:
+            hits = await self._memory.retrieve(user_id, query, exclude_ids=exclude_ids)
+        except Exception as e:
+            self._memory.stats.errors += 1
+            logger.warning("memory retrieval failed, continuing without: {}", e)
+            return None
+        # Skip anything already visible in the replayed history (e.g. checkpointed turns)
+        visible = {m.content.strip() for m in history if isinstance(m, HumanMessage) and isinstance(m.content, str)}
+        visible.add(query.strip())
+        hits = [h for h in hits if (h.get("text") or "").strip() not in visible]
+        if not hits:
+            return None
+        self._memory.stats.injected += 1
+        # Fixed id: in a checkpointed thread each turn's memories replace the previous ones
+        return SystemMessage(content=format_memories(hits), id="coach-memory")
+
+    async def _await_prefetch(self, task: Optional[asyncio.Task]) -> Tuple[Optional[PrefetchedContext], float]:
+        """Wait for the prefetch; returns (context or None, seconds spent waiting on it)."""
+        if task is None:
+            return None, 0.0
+        t0 = time.monotonic()
+        try:
+            ctx = await task
+        except Exception as e:
+            # Missing context only means the supervisor falls back to its read tools
+            self._prefetch.stats.errors += 1
+            logger.warning("prefetch failed, continuing without context: {}", e)
+            ctx = None
+        return ctx, time.monotonic() - t0
+
+    async def _ainvoke_fast(self, history: List[BaseMessage], new_human: HumanMessage) -> Optional[AIMessage]:
+        """Answer an easy turn with the fast-tier model. Returns None when it asks to escalate."""
+        # Only plain conversational turns; the fast model has no tools
+        convo = [
+            m for m in history
+            if isinstance(m, (HumanMessage, AIMessage)) and not getattr(m, "tool_calls", None)
+        ]
+        reply = await with_deadline(
+            self._coach.fast_chat.ainvoke(
+                [SystemMessage(content=FAST_COACH_PROMPT), *convo, new_human],
+                config={"callbacks": [self._coach.tracer, self._coach.deadline_guard]},
+            ),
+            "fast tier",
         )
+        text = reply.content if isinstance(reply.content, str) else str(reply.content)
+        if not text.strip() or text.strip().upper().startswith(ESCALATE_TOKEN):
+            return None
+        return AIMessage(content=text)
 
+    async def _ainvoke_full(
+        self, input_messages: List[BaseMessage], *, user_jwt: str, goal_id: Optional[str], thread_id: Optional[str] = None
+    ) -> Tuple[AIMessage, List[BaseMessage]]:
+        """Run the supervisor graph over the full input (appended to the thread's state when
+        checkpointing).
+
+        Returns its final AIMessage and all messages the graph produced this turn.
+        """
         # Set per-request auth/goal context via contextvars so tools can read them safely
         jwt_token = CURRENT_JWT.set(user_jwt)
         gid_token = CURRENT_GOAL_ID.set(goal_id)
+        config: Dict[str, Any] = {"callbacks": [self._coach.tracer, self._coach.deadline_guard]}
+        if thread_id:
+            config.update(self._coach.checkpointer.thread_config(thread_id))
         try:
-            # Invoke the compiled supervisor with full history and our tracer callbacks
-            result: Dict[str, Any] = await self._coach.supervisor.ainvoke(
-                {"messages": input_messages},
-                config={"callbacks": [self._coach.tracer]},
+            # Invoke the compiled supervisor with full history and our tracer callbacks,
+            # bounded by the request deadline (the guard also stops new LLM/tool steps)
+            result: Dict[str, Any] = await with_deadline(
+                self._coach.supervisor.ainvoke(
+                    {"messages": input_messages},
+                    config=config,
+                ),
+                "supervisor",
             )
         finally:
             # Restore context variables to previous values
@@ -89,54 +421,23 @@ class CoachService:
         # should be the AI's final message.
         msgs: list[BaseMessage] = result.get("messages", [])  # type: ignore
 
-        # Print a concise transcript of agent conversation
-        def _sender(m: BaseMessage) -> str:
-            # Try several places where LangChain/LangGraph may stash the agent name
-            for key in ("name",):
-                val = getattr(m, key, None)
-                if isinstance(val, str) and val:
-                    return val
-            ak = getattr(m, "additional_kwargs", None) or {}
-            for key in ("name", "sender", "agent", "from"):
-                val = ak.get(key)
-                if isinstance(val, str) and val:
-                    return val
-            rm = getattr(m, "response_metadata", None) or {}
-            val = rm.get("agent") if isinstance(rm, dict) else None
-            if isinstance(val, str) and val:
-                return val
-            return "supervisor"
-
-        def _role(m: BaseMessage) -> str:
-            # Common message classes: HumanMessage/AIMessage/ToolMessage/SystemMessage
-            r = getattr(m, "type", None) or m.__class__.__name__.replace("Message", "").lower()
-            s = _sender(m)
-            return f"{r}[{s}]"
-
-        print("[TRANSCRIPT] ---- agent conversation start ----")
-        for i, m in enumerate(msgs[-20:]):  # last 20 turns to keep it short
-            content = getattr(m, "content", "")
-            if not isinstance(content, str):
-                try:
-                    content = str(content)
-                except Exception:
-                    content = "<non-text>"
-            content = content.replace("\n", " ")
-            if len(content) > 300:
-                content = content[:300] + "…"
-            print(f"[TRANSCRIPT] {i:02d} { _role(m) }: {content}")
-        print("[TRANSCRIPT] ---- agent conversation end ------")
+        # A concise transcript of the agent conversation for a sample of turns
+        if _transcript_sampled():
+            logger.info("agent transcript (last {} messages)\n{}", min(len(msgs), 20), "\n".join(_transcript_lines(msgs[-20:])))
 
         if not msgs:
             # Fall back: wrap an empty response
-            return AIMessage(content="")
+            return AIMessage(content=""), []
+        # Only this turn's messages: everything after the last human message
+        last_human = max((i for i, m in enumerate(msgs) if isinstance(m, HumanMessage)), default=-1)
+        turn_msgs = msgs[last_human + 1:]
         # Find the last AI message
         last_ai = next((m for m in reversed(msgs) if isinstance(m, AIMessage)), None)
+        return last_ai or AIMessage(content=str(msgs[-1].content)), turn_msgs
 
-        # Persist assistant turn and return final message
-        final_ai = last_ai or AIMessage(content=str(msgs[-1].content))
-        store.insert_lc_message(conversation_id, final_ai)
-        return final_ai
+    async def forget_user(self, user_id: str) -> None:
+        """Erase the user's long-term memory index (kept on local disk, outside RLS)."""
+        await self._memory.reset_user(user_id)
 
     def progress(self, goal_id: str) -> Dict[str, Any]:
         # Placeholder; you can wire this into Supabase via the sql_agent later
@@ -146,6 +447,19 @@ class CoachService:
 # Singleton accessor used by FastAPI routes
 _coach_singleton: Optional[CoachService] = None
 _singleton_lock = asyncio.Lock()
+# Chat model factory for the singleton (None = ChatOpenAI); see set_model_factory
+_model_factory: Optional[Any] = None
+
+
+def set_model_factory(factory: Optional[Any]) -> None:
+    """Build the coach singleton's chat models with factory(role, model, **kwargs).
+
+    For offline runs (benchmarks.loadtest); must be called before the first get_coach().
+    """
+    global _model_factory
+    if _coach_singleton is not None:
+        raise RuntimeError("coach already initialized; set the model factory before first use")
+    _model_factory = factory
 
 
 async def get_coach() -> CoachService:
@@ -154,6 +468,12 @@ async def get_coach() -> CoachService:
         return _coach_singleton
     async with _singleton_lock:
         if _coach_singleton is None:
-            _coach_singleton = CoachService()
+            _coach_singleton = CoachService(model_factory=_model_factory)
             await _coach_singleton._ensure_ready()
         return _coach_singleton
+
+
+async def shutdown_coach() -> None:
+    """Release resources held by the coach singleton (no-op if it was never created)."""
+    if _coach_singleton is not None:
+        await _coach_singleton._coach.checkpointer.close()
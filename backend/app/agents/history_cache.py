@@ -0,0 +1,157 @@
+# app/agents/history_cache.py
+"""Bounded in-process cache of recent chat history rows, keyed by conversation id.
+
+Entries hold the rows a turn would otherwise re-read from Supabase (recent messages plus
+the summary columns) and are validated against `conversations.version`, which a DB trigger
+bumps on every message insert and summary update. This worker writes through: rows it
+persists are appended and the expected version advanced by the same amount, so a version
+mismatch means another worker (or a manual edit) touched the conversation and the entry
+is refetched.
+"""
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.agents.tokens import HISTORY_FETCH_LIMIT
+
+HISTORY_CACHE_MAX_USERS = int(os.getenv("HISTORY_CACHE_MAX_USERS", "1000"))
+HISTORY_CACHE_MAX_BYTES = int(os.getenv("HISTORY_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+
+
+def _row_bytes(row: Dict[str, Any]) -> int:
+    try:
+        return len(json.dumps(row, default=str))
+    except Exception:
+        return 1024
+
+
+class _Entry:
+    __slots__ = ("user_id", "version", "summary_row", "rows", "bytes")
+
+    def __init__(self, user_id: str, version: int, summary_row: Dict[str, Any], rows: List[Dict[str, Any]]) -> None:
+        self.user_id = user_id
+        self.version = version
+        self.summary_row = summary_row
+        self.rows = rows
+        self.bytes = _row_bytes(summary_row) + sum(_row_bytes(r) for r in rows)
+
+
+class HistoryCache:
+    """LRU over conversations, bounded by distinct users and by approximate JSON bytes."""
+
+    def __init__(
+        self,
+        *,
+        max_users: int = HISTORY_CACHE_MAX_USERS,
+        max_bytes: int = HISTORY_CACHE_MAX_BYTES,
+        max_rows: int = HISTORY_FETCH_LIMIT,
+    ) -> None:
+        self.max_users = max_users
+        self.max_bytes = max_bytes
+        self.max_rows = max_rows
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._users: Dict[str, int] = {}  # user_id -> number of cached conversations
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.evictions = 0
+
+    def get(self, conversation_id: str, version: Optional[int]) -> Optional[Tuple[Dict[str, Any], List[Dict[str, Any]]]]:
+        """(summary_row, rows) when cached at exactly `version`; stale entries are dropped."""
+        with self._lock:
+            entry = self._entries.get(conversation_id)
+            if entry is None or version is None:
+                self.misses += 1
+                return None
+            if entry.version != version:
+                self.stale += 1
+                self.misses += 1
+                self._drop(conversation_id)
+                return None
+            self._entries.move_to_end(conversation_id)
+            self.hits += 1
+            return dict(entry.summary_row), list(entry.rows)
+
+    def put(
+        self, conversation_id: str, *, user_id: str, version: Optional[int], summary_row: Dict[str, Any], rows: List[Dict[str, Any]]
+    ) -> None:
+        if version is None:
+            return
+        with self._lock:
+            self._drop(conversation_id)
+            entry = _Entry(user_id, version, dict(summary_row), list(rows[-self.max_rows:]))
+            self._entries[conversation_id] = entry
+            self._users[user_id] = self._users.get(user_id, 0) + 1
+            self._bytes += entry.bytes
+            self._evict()
+
+    def append(self, conversation_id: str, rows: List[Dict[str, Any]]) -> None:
+        """Write-through for rows this worker inserted (each insert bumps the DB version by one)."""
+        rows = [r for r in rows if r]
+        if not rows:
+            return
+        with self._lock:
+            entry = self._entries.get(conversation_id)
+            if entry is None:
+                return
+            entry.version += len(rows)
+            entry.rows.extend(rows)
+            added = sum(_row_bytes(r) for r in rows)
+            overflow = entry.rows[: max(len(entry.rows) - self.max_rows, 0)]
+            if overflow:
+                del entry.rows[: len(overflow)]
+                added -= sum(_row_bytes(r) for r in overflow)
+            entry.bytes += added
+            self._bytes += added
+            self._entries.move_to_end(conversation_id)
+            self._evict()
+
+    def apply_summary(self, conversation_id: str, summary: str, summary_through: str) -> None:
+        """Write-through for a summary update (the DB trigger bumps the version once)."""
+        with self._lock:
+            entry = self._entries.get(conversation_id)
+            if entry is None:
+                return
+            entry.version += 1
+            entry.summary_row = {**entry.summary_row, "summary": summary, "summary_through": summary_through}
+
+    def invalidate(self, conversation_id: str) -> None:
+        with self._lock:
+            self._drop(conversation_id)
+
+    def _drop(self, conversation_id: str) -> None:
+        entry = self._entries.pop(conversation_id, None)
+        if entry is None:
+            return
+        self._bytes -= entry.bytes
+        left = self._users.get(entry.user_id, 1) - 1
+        if left <= 0:
+            self._users.pop(entry.user_id, None)
+        else:
+            self._users[entry.user_id] = left
+
+    def _evict(self) -> None:
+        while self._entries and (len(self._users) > self.max_users or self._bytes > self.max_bytes):
+            oldest = next(iter(self._entries))
+            self._drop(oldest)
+            self.evictions += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "conversations": len(self._entries),
+                "users": len(self._users),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "max_users": self.max_users,
+                "hits": self.hits,
+                "misses": self.misses,
+                "stale": self.stale,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            }
@@ -0,0 +1,381 @@
+# app/agents/long_term_memory.py
+"""Long-term conversation memory: per-user vector index over persisted chat messages.
+
+Facts users mention once (injuries, equipment, schedule changes) fall out of the recent
+history window. User messages are embedded after they are persisted, appended to a
+per-user NumPy index on local disk, and the top-k relevant ones are retrieved for each
+supervisor turn.
+
+On-disk layout per user (MEMORY_DIR/<user_id>/):
+- vectors.f32: row-major float32 matrix (n x dim), appended in place, read via np.memmap
+- meta.jsonl: one JSON object per row (message id, conversation id, role, created_at, text)
+- index.json: embedder name and dimension; a mismatch resets the index
+
+The files hold users' own words (injuries, medical details) outside Supabase RLS. They
+are kept until the user's index is purged with reset_user (DELETE /coach/memory, to be
+called on account deletion) or MEMORY_DIR is removed.
+
+Embedders are pluggable: OpenAIEmbedder for production, HashingEmbedder as a
+deterministic local stand-in (tests, benchmarks, offline development).
+"""
+import asyncio
+import hashlib
+import json
+import os
+import re
+import shutil
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Protocol, Sequence
+
+import numpy as np
+from loguru import logger
+
+from app.agents.utils.stats import LatencyWindow
+
+MEMORY_ENABLED = os.getenv("COACH_MEMORY", "1").strip().lower() not in ("0", "false", "no", "off")
+MEMORY_DIR = os.getenv("COACH_MEMORY_DIR", ".coach_memory")
+MEMORY_EMBEDDER = os.getenv("COACH_MEMORY_EMBEDDER", "openai").strip().lower()
+MEMORY_EMBEDDING_MODEL = os.getenv("COACH_MEMORY_EMBEDDING_MODEL", "text-embedding-3-small")
+MEMORY_TOP_K = int(os.getenv("COACH_MEMORY_TOP_K", "4"))
+MEMORY_MIN_SCORE = float(os.getenv("COACH_MEMORY_MIN_SCORE", "0.35"))
+# Shorter messages ("ok", "thanks") are not worth remembering
+MEMORY_MIN_CHARS = int(os.getenv("COACH_MEMORY_MIN_CHARS", "24"))
+MEMORY_MAX_OPEN_INDEXES = int(os.getenv("COACH_MEMORY_MAX_OPEN_INDEXES", "256"))
+_SNIPPET_CHARS = 300
+
+
+class Embedder(Protocol):
+    name: str
+    dim: int
+
+    async def embed(self, texts: Sequence[str]) -> np.ndarray:
+        """Return an (n, dim) float32 array of L2-normalized vectors."""
+        ...
+
+
+def _normalize(mat: np.ndarray) -> np.ndarray:
+    mat = np.asarray(mat, dtype=np.float32)
+    norms = np.linalg.norm(mat, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return mat / norms
+
+
+_WORD_RE = re.compile(r"[a-z0-9']+")
+
+
+class HashingEmbedder:
+    """Deterministic feature-hashing embedder (unigrams + bigrams, signed buckets).
+
+    No model or network; similar wording gives similar vectors, which is enough for tests,
+    benchmarks and offline development.
+    """
+
+    def __init__(self, dim: int = 256) -> None:
+        self.dim = dim
+        self.name = f"hashing-{dim}"
+
+    def _vector(self, text: str) -> np.ndarray:
+        vec = np.zeros(self.dim, dtype=np.float32)
+        words = _WORD_RE.findall(text.lower())
+        for feat in words + [f"{a} {b}" for a, b in zip(words, words[1:])]:
+            h = int.from_bytes(hashlib.blake2b(feat.encode(), digest_size=8).digest(), "little")
+            vec[h % self.dim] += 1.0 if (h >> 63) & 1 else -1.0
+        return vec
+
+    async def embed(self, texts: Sequence[str]) -> np.ndarray:
+        if not texts:
+            return np.zeros((0, self.dim), dtype=np.float32)
+        return _normalize(np.stack([self._vector(t) for t in texts]))
+
+
+class OpenAIEmbedder:
+    """OpenAI embeddings via langchain_openai (text-embedding-3-small by default)."""
+
+    _DIMS = {"text-embedding-3-small": 1536, "text-embedding-3-large": 3072, "text-embedding-ada-002": 1536}
+
+    def __init__(self, model: str = MEMORY_EMBEDDING_MODEL) -> None:
+        from langchain_openai import OpenAIEmbeddings
+
+        self._client = OpenAIEmbeddings(model=model)
+        self.dim = self._DIMS.get(model, 1536)
+        self.name = f"openai-{model}"
+
+    async def embed(self, texts: Sequence[str]) -> np.ndarray:
+        if not texts:
+            return np.zeros((0, self.dim), dtype=np.float32)
+        return _normalize(np.asarray(await self._client.aembed_documents(list(texts)), dtype=np.float32))
+
+
+def make_embedder(kind: str = MEMORY_EMBEDDER) -> Embedder:
+    if kind == "hashing":
+        return HashingEmbedder()
+    if kind == "openai":
+        return OpenAIEmbedder()
+    raise RuntimeError(f"Unknown COACH_MEMORY_EMBEDDER={kind!r}; expected openai or hashing")
+
+
+class VectorIndex:
+    """Append-only float32 matrix on disk with row metadata; searched by cosine similarity."""
+
+    def __init__(self, path: str, *, dim: int, embedder_name: str) -> None:
+        self.path = path
+        self.dim = dim
+        self.embedder_name = embedder_name
+        self._vec_path = os.path.join(path, "vectors.f32")
+        self._meta_path = os.path.join(path, "meta.jsonl")
+        self._header_path = os.path.join(path, "index.json")
+        self.meta: List[Dict[str, Any]] = []
+        self._ids: set = set()
+        self._matrix: Optional[np.ndarray] = None
+        self._lock = threading.Lock()
+        self._open()
+
+    def __len__(self) -> int:
+        return len(self.meta)
+
+    def _open(self) -> None:
+        os.makedirs(self.path, exist_ok=True)
+        header = {}
+        if os.path.exists(self._header_path):
+            try:
+                with open(self._header_path) as f:
+                    header = json.load(f)
+            except Exception:
+                header = {}
+        if header.get("dim") != self.dim or header.get("embedder") != self.embedder_name:
+            # Different embedder: old vectors are not comparable, start over
+            for p in (self._vec_path, self._meta_path):
+                if os.path.exists(p):
+                    os.remove(p)
+            with open(self._header_path, "w") as f:
+                json.dump({"dim": self.dim, "embedder": self.embedder_name}, f)
+        if os.path.exists(self._meta_path):
+            with open(self._meta_path) as f:
+                self.meta = [json.loads(line) for line in f if line.strip()]
+        # A crash between the two appends can leave them out of step; keep the common prefix
+        n_vec = os.path.getsize(self._vec_path) // (4 * self.dim) if os.path.exists(self._vec_path) else 0
+        n = min(n_vec, len(self.meta))
+        if n != n_vec or n != len(self.meta):
+            self.meta = self.meta[:n]
+            with open(self._vec_path, "r+b" if os.path.exists(self._vec_path) else "wb") as f:
+                f.truncate(n * 4 * self.dim)
+            with open(self._meta_path, "w") as f:
+                f.writelines(json.dumps(m) + "\n" for m in self.meta)
+        self._ids = {m.get("id") for m in self.meta if m.get("id")}
+        self._matrix = None
+
+    def _mapped(self) -> Optional[np.ndarray]:
+        n = len(self.meta)
+        if n == 0:
+            return None
+        if self._matrix is None or self._matrix.shape[0] != n:
+            self._matrix = np.memmap(self._vec_path, dtype=np.float32, mode="r", shape=(n, self.dim))
+        return self._matrix
+
+    def append(self, vectors: np.ndarray, metas: List[Dict[str, Any]]) -> int:
+        """Append rows whose ids are not indexed yet; returns how many were added."""
+        with self._lock:
+            keep = [i for i, m in enumerate(metas) if not m.get("id") or m["id"] not in self._ids]
+            if not keep:
+                return 0
+            block = np.ascontiguousarray(vectors[keep], dtype=np.float32)
+            with open(self._vec_path, "ab") as f:
+                f.write(block.tobytes())
+            with open(self._meta_path, "a") as f:
+                for i in keep:
+                    f.write(json.dumps(metas[i]) + "\n")
+            for i in keep:
+                self.meta.append(metas[i])
+                if metas[i].get("id"):
+                    self._ids.add(metas[i]["id"])
+            return len(keep)
+
+    def search(self, query: np.ndarray, k: int, *, min_score: float = -1.0, exclude_ids: Optional[set] = None) -> List[Dict[str, Any]]:
+        with self._lock:
+            mat = self._mapped()
+            if mat is None:
+                return []
+            scores = mat @ np.asarray(query, dtype=np.float32).reshape(-1)
+            n_exclude = len(exclude_ids or ())
+            take = min(len(scores), k + n_exclude)
+            top = np.argpartition(-scores, take - 1)[:take] if take < len(scores) else np.arange(len(scores))
+            top = top[np.argsort(-scores[top])]
+            out = []
+            for i in top:
+                meta = self.meta[int(i)]
+                if exclude_ids and meta.get("id") in exclude_ids:
+                    continue
+                if scores[i] < min_score:
+                    break
+                out.append({**meta, "score": float(scores[i])})
+                if len(out) >= k:
+                    break
+            return out
+
+
+class MemoryStats:
+    def __init__(self) -> None:
+        self.retrievals = 0
+        self.injected = 0
+        self.snippets = 0
+        self.indexed = 0
+        self.errors = 0
+        self.purged = 0
+        self.retrieval_latency = LatencyWindow()
+        self.index_latency = LatencyWindow()
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "retrievals": self.retrievals,
+            "injected": self.injected,
+            "snippets": self.snippets,
+            "indexed": self.indexed,
+            "errors": self.errors,
+            "purged": self.purged,
+            "retrieval_latency_s": self.retrieval_latency.snapshot(),
+            "index_latency_s": self.index_latency.snapshot(),
+        }
+
+
+def _index_task_name(user_id: str) -> str:
+    return f"memory-index:{user_id}"
+
+
+def _safe_dirname(user_id: str) -> str:
+    name = re.sub(r"[^A-Za-z0-9_-]", "_", user_id)
+    return name or hashlib.sha256(user_id.encode()).hexdigest()[:24]
+
+
+class LongTermMemory:
+    """Per-user indexes (LRU of open ones) plus background indexing and per-turn retrieval."""
+
+    def __init__(
+        self,
+        *,
+        embedder: Optional[Embedder] = None,
+        root: str = MEMORY_DIR,
+        enabled: bool = MEMORY_ENABLED,
+        top_k: int = MEMORY_TOP_K,
+        min_score: float = MEMORY_MIN_SCORE,
+        max_open: int = MEMORY_MAX_OPEN_INDEXES,
+    ) -> None:
+        self.enabled = enabled
+        self.root = root
+        self.top_k = top_k
+        self.min_score = min_score
+        self.max_open = max_open
+        self._embedder = embedder
+        self._indexes: "OrderedDict[str, VectorIndex]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._tasks: set = set()
+        self.stats = MemoryStats()
+
+    @property
+    def embedder(self) -> Embedder:
+        if self._embedder is None:
+            self._embedder = make_embedder()
+        return self._embedder
+
+    def index_for(self, user_id: str) -> VectorIndex:
+        with self._lock:
+            idx = self._indexes.get(user_id)
+            if idx is None:
+                emb = self.embedder
+                idx = VectorIndex(os.path.join(self.root, _safe_dirname(user_id)), dim=emb.dim, embedder_name=emb.name)
+                self._indexes[user_id] = idx
+                while len(self._indexes) > self.max_open:
+                    self._indexes.popitem(last=False)
+            else:
+                self._indexes.move_to_end(user_id)
+            return idx
+
+    async def add_rows(self, user_id: str, rows: List[Dict[str, Any]]) -> int:
+        """Embed and index persisted user messages (short ones are skipped)."""
+        items = []
+        for r in rows:
+            content = r.get("content")
+            text = content.get("text") if isinstance(content, dict) else None
+            if r.get("role") != "user" or not isinstance(text, str) or len(text.strip()) < MEMORY_MIN_CHARS:
+                continue
+            items.append({
+                "id": r.get("id"),
+                "conversation_id": r.get("conversation_id"),
+                "role": r.get("role"),
+                "created_at": r.get("created_at"),
+                "text": text.strip()[:2000],
+            })
+        if not items:
+            return 0
+        t0 = time.monotonic()
+        vectors = await self.embedder.embed([i["text"] for i in items])
+        # Opening reads meta.jsonl and maps the vectors: off the event loop
+        idx = await asyncio.to_thread(self.index_for, user_id)
+        added = await asyncio.to_thread(idx.append, vectors, items)
+        self.stats.indexed += added
+        self.stats.index_latency.observe(time.monotonic() - t0)
+        return added
+
+    def index_in_background(self, user_id: str, rows: List[Dict[str, Any]]) -> None:
+        if not self.enabled:
+            return
+
+        async def _run() -> None:
+            try:
+                await self.add_rows(user_id, rows)
+            except Exception as e:
+                self.stats.errors += 1
+                logger.warning("indexing failed user={}: {}", user_id, e)
+
+        task = asyncio.create_task(_run(), name=_index_task_name(user_id))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def retrieve(self, user_id: str, query: str, *, exclude_ids: Optional[set] = None) -> List[Dict[str, Any]]:
+        """Top-k remembered messages relevant to `query`, excluding ones already in the window."""
+        if not self.enabled or not query.strip():
+            return []
+        t0 = time.monotonic()
+        idx = await asyncio.to_thread(self.index_for, user_id)
+        if len(idx) == 0:
+            return []
+        qv = (await self.embedder.embed([query]))[0]
+        hits = await asyncio.to_thread(idx.search, qv, self.top_k, min_score=self.min_score, exclude_ids=exclude_ids)
+        self.stats.retrievals += 1
+        self.stats.snippets += len(hits)
+        self.stats.retrieval_latency.observe(time.monotonic() - t0)
+        return hits
+
+    async def reset_user(self, user_id: str) -> None:
+        """Forget a user's index (e.g. account deletion)."""
+        # Indexing still in flight would re-create the directory after the purge
+        pending = [t for t in self._tasks if t.get_name() == _index_task_name(user_id) and not t.done()]
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        await asyncio.to_thread(self._purge, user_id)
+
+    def _purge(self, user_id: str) -> None:
+        with self._lock:
+            idx = self._indexes.pop(user_id, None)
+        path = os.path.join(self.root, _safe_dirname(user_id))
+        if idx is not None:
+            # Wait out an append/search running on the open index
+            with idx._lock:
+                shutil.rmtree(path, ignore_errors=True)
+        else:
+            shutil.rmtree(path, ignore_errors=True)
+        self.stats.purged += 1
+        logger.info("long-term memory purged user={}", user_id)
+
+
+def format_memories(hits: List[Dict[str, Any]]) -> str:
+    lines = ["# Relevant earlier messages from this user (may be outdated; prefer newer information)"]
+    for h in hits:
+        when = str(h.get("created_at") or "")[:10]
+        text = h.get("text") or ""
+        if len(text) > _SNIPPET_CHARS:
+            text = text[:_SNIPPET_CHARS] + "…"
+        lines.append(f"- ({when}) {text}")
+    return "\n".join(lines)
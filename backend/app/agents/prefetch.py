@@ -0,0 +1,188 @@
+# app/agents/prefetch.py
+"""Prefetch the user's profile, active goals and upcoming tasks for a supervisor turn.
+
+Most full-tier turns start with the supervisor calling get_goals/get_goal_tasks, which
+costs an LLM round plus an MCP round-trip before any real work happens. The reads here
+run concurrently with history loading and are injected as one compact system message.
+"""
+import asyncio
+import os
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from langchain_core.messages import BaseMessage, SystemMessage, ToolMessage
+from loguru import logger
+
+from app.agents.utils.stats import LatencyWindow
+from app.dependencies.supabase_rest import sb_select, supabase_configured
+
+PREFETCH_ENABLED = os.getenv("COACH_PREFETCH", "1").strip().lower() not in ("0", "false", "no", "off")
+PREFETCH_TASKS = int(os.getenv("COACH_PREFETCH_TASKS", "8"))
+PREFETCH_GOALS = int(os.getenv("COACH_PREFETCH_GOALS", "5"))
+
+# Read tools the injected context is meant to make unnecessary
+READ_TOOLS = ("get_goals", "get_goal_tasks")
+
+_PROFILE_FIELDS = ("fitness_level", "activity_level", "unit_pref", "timezone", "availability_days", "injuries", "medical_conditions")
+
+
+class PrefetchedContext:
+    def __init__(
+        self,
+        *,
+        profile: Optional[Dict[str, Any]],
+        goals: List[Dict[str, Any]],
+        tasks: List[Dict[str, Any]],
+        elapsed_s: float,
+        errors: List[str],
+    ) -> None:
+        self.profile = profile
+        self.goals = goals
+        self.tasks = tasks
+        self.elapsed_s = elapsed_s
+        self.errors = errors
+        self.as_of = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+    def render(self) -> str:
+        """Compact plain-text block; ids are kept so the agents can still drill down with tools."""
+        lines = [f"# User context (prefetched {self.as_of}; use it instead of get_goals/get_goal_tasks when it covers the question)"]
+        if self.profile:
+            fields = [f"{k}={self.profile[k]}" for k in _PROFILE_FIELDS if self.profile.get(k) not in (None, "", [])]
+            lines.append("Profile: " + (", ".join(fields) if fields else "(no details)"))
+        lines.append(f"Active goals ({len(self.goals)}):" if self.goals else "Active goals: none")
+        for g in self.goals:
+            extra = []
+            if g.get("target_value") is not None:
+                extra.append(f"target {g['target_value']}")
+            if g.get("target_date"):
+                extra.append(f"by {g['target_date']}")
+            lines.append(f"- {g.get('type')} id={g.get('id')}" + (f" ({', '.join(extra)})" if extra else ""))
+        lines.append(f"Upcoming pending tasks (next {len(self.tasks)}):" if self.tasks else "Upcoming pending tasks: none")
+        for t in self.tasks:
+            lines.append(f"- {t.get('due_at') or 'no due date'} | {t.get('title')} | goal={t.get('goal_id')}")
+        if self.errors:
+            lines.append("(Some data could not be loaded: " + ", ".join(self.errors) + "; use tools if needed.)")
+        return "\n".join(lines)
+
+    def as_message(self) -> SystemMessage:
+        # Fixed id: in a checkpointed thread each turn's context replaces the previous one
+        return SystemMessage(content=self.render(), id="coach-context")
+
+
+def count_read_tool_calls(messages: List[BaseMessage]) -> int:
+    return sum(1 for m in messages if isinstance(m, ToolMessage) and m.name in READ_TOOLS)
+
+
+class PrefetchStats:
+    """Per-turn outcomes of prefetched supervisor turns.
+
+    A turn counts as having avoided a read when context was injected and the graph made no
+    get_goals/get_goal_tasks call. Latency saved is estimated from the p50 gap between
+    full-tier turns that still read and those that did not, less the prefetch wait that
+    was not hidden behind history loading.
+    """
+
+    def __init__(self) -> None:
+        self.turns = 0
+        self.injected = 0
+        self.cancelled = 0
+        self.errors = 0
+        self.read_tool_calls = 0
+        self.turns_without_reads = 0
+        self.fetch_latency = LatencyWindow()
+        self.exposed_latency = LatencyWindow()
+        self.turn_latency_with_reads = LatencyWindow()
+        self.turn_latency_without_reads = LatencyWindow()
+
+    def record_turn(self, *, injected: bool, read_calls: int, turn_s: float, exposed_s: float) -> None:
+        self.turns += 1
+        self.read_tool_calls += read_calls
+        self.exposed_latency.observe(exposed_s)
+        if injected:
+            self.injected += 1
+        if read_calls:
+            self.turn_latency_with_reads.observe(turn_s)
+        else:
+            self.turn_latency_without_reads.observe(turn_s)
+            if injected:
+                self.turns_without_reads += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        with_p50 = self.turn_latency_with_reads.percentile(0.5)
+        without_p50 = self.turn_latency_without_reads.percentile(0.5)
+        exposed_p50 = self.exposed_latency.percentile(0.5) or 0.0
+        saved = None
+        if with_p50 is not None and without_p50 is not None:
+            saved = round(with_p50 - without_p50 - exposed_p50, 4)
+        return {
+            "turns": self.turns,
+            "injected": self.injected,
+            "cancelled": self.cancelled,
+            "errors": self.errors,
+            "read_tool_calls": self.read_tool_calls,
+            "tool_calls_avoided_est": self.turns_without_reads,
+            "avg_read_calls_per_turn": round(self.read_tool_calls / self.turns, 3) if self.turns else 0.0,
+            "est_latency_saved_per_turn_s": saved,
+            "fetch_latency_s": self.fetch_latency.snapshot(),
+            "exposed_latency_s": self.exposed_latency.snapshot(),
+            "turn_latency_with_reads_s": self.turn_latency_with_reads.snapshot(),
+            "turn_latency_without_reads_s": self.turn_latency_without_reads.snapshot(),
+        }
+
+
+class ContextPrefetcher:
+    """Loads the context block with three concurrent PostgREST reads (RLS via the user's JWT)."""
+
+    def __init__(self, *, enabled: bool = PREFETCH_ENABLED, max_tasks: int = PREFETCH_TASKS, max_goals: int = PREFETCH_GOALS) -> None:
+        self.enabled = enabled
+        self.max_tasks = max_tasks
+        self.max_goals = max_goals
+        self.stats = PrefetchStats()
+
+    def start(self, *, user_id: str, user_jwt: str, goal_id: Optional[str] = None) -> Optional["asyncio.Task[Optional[PrefetchedContext]]"]:
+        """Kick off the prefetch in the background; None when disabled or Supabase is not configured."""
+        if not self.enabled or not supabase_configured():
+            return None
+        return asyncio.create_task(self.fetch(user_id=user_id, user_jwt=user_jwt, goal_id=goal_id))
+
+    async def fetch(self, *, user_id: str, user_jwt: str, goal_id: Optional[str] = None) -> Optional[PrefetchedContext]:
+        t0 = time.monotonic()
+        now = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+        task_q = f"select=id,title,due_at,status,goal_id&user_id=eq.{user_id}&status=eq.pending&due_at=gte.{now}"
+        if goal_id:
+            task_q += f"&goal_id=eq.{goal_id}"
+        task_q += f"&order=due_at.asc&limit={self.max_tasks}"
+        results = await asyncio.gather(
+            sb_select("profiles", f"select={','.join(_PROFILE_FIELDS)}&id=eq.{user_id}", user_token=user_jwt),
+            sb_select(
+                "goals",
+                f"select=id,type,target_value,target_date,status&user_id=eq.{user_id}&status=eq.active"
+                f"&order=created_at.desc&limit={self.max_goals}",
+                user_token=user_jwt,
+            ),
+            sb_select("tasks", task_q, user_token=user_jwt),
+            return_exceptions=True,
+        )
+        errors: List[str] = []
+        data: List[List[Dict[str, Any]]] = []
+        for name, res in zip(("profile", "goals", "tasks"), results):
+            if isinstance(res, BaseException):
+                errors.append(name)
+                logger.warning("{} read failed: {}", name, res)
+                data.append([])
+            else:
+                data.append(res)
+        elapsed = time.monotonic() - t0
+        self.stats.fetch_latency.observe(elapsed)
+        if len(errors) == 3:
+            self.stats.errors += 1
+            return None
+        # An empty result is still useful: "no active goals" saves a read as well
+        return PrefetchedContext(
+            profile=data[0][0] if data[0] else None,
+            goals=data[1],
+            tasks=data[2],
+            elapsed_s=elapsed,
+            errors=errors,
+        )
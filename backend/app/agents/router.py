@@ -0,0 +1,125 @@
+# app/agents/router.py
+import os
+import re
+import time
+from typing import Any, Dict, List, Optional
+
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage
+from loguru import logger
+
+from app.agents.prompts import ROUTER_PROMPT
+from app.agents.schemas import RouteDecision
+from app.agents.utils.stats import LatencyWindow
+
+COACH_ROUTING_ENABLED = os.getenv("COACH_ROUTING", "1").strip().lower() not in ("0", "false", "no", "off")
+# Messages longer than this always go to the full supervisor graph
+ROUTER_MAX_FAST_CHARS = int(os.getenv("COACH_ROUTER_MAX_FAST_CHARS", "280"))
+# The fast tier replies with this token when it decides it needs the full graph
+ESCALATE_TOKEN = "ESCALATE"
+
+TIERS = ("fast", "full")
+
+_FAST_PATTERNS = [
+    r"^(hi|hey|hello|yo|sup|hiya|howdy|good (morning|afternoon|evening))\b",
+    r"^(thanks|thank you|thx|ty|cheers|appreciate it)\b",
+    r"^(ok|okay|k|cool|great|nice|awesome|got it|sounds good|perfect|sure|yes|yep|no|nope)[.! ]*$",
+    r"^(bye|goodbye|see you|later|good night)\b",
+    r"^(how are you|what can you do|who are you)\b",
+]
+# (reason, pattern) pairs that always need the full supervisor graph
+_FULL_PATTERNS = [
+    ("planning", r"\b(plan|program|schedule|generate|create|make me|build|design|adjust|reschedule|update|change)\b"),
+    ("user_data", r"\b(my|mine)\s+(goals?|tasks?|plan|progress|schedule|workouts?|profile)\b"),
+    ("user_data", r"\b(goals?|tasks?|progress|due|this week|today|tomorrow)\b"),
+    ("fresh_info", r"\b(search|latest|news|study|studies|research|look up)\b"),
+]
+_FAST_RE = [re.compile(p, re.IGNORECASE) for p in _FAST_PATTERNS]
+_FULL_RE = [(reason, re.compile(p, re.IGNORECASE)) for reason, p in _FULL_PATTERNS]
+
+
+class RoutingStats:
+    """Routing decisions by (tier, source) and end-to-end latency per tier."""
+
+    def __init__(self) -> None:
+        self.decisions: Dict[str, int] = {}
+        self.escalations = 0
+        self.classifier_errors = 0
+        self.classifier_latency = LatencyWindow()
+        self.tier_latency: Dict[str, LatencyWindow] = {t: LatencyWindow() for t in TIERS}
+
+    def record_decision(self, tier: str, source: str) -> None:
+        key = f"{tier}:{source}"
+        self.decisions[key] = self.decisions.get(key, 0) + 1
+
+    def record_latency(self, tier: str, seconds: float) -> None:
+        self.tier_latency.setdefault(tier, LatencyWindow()).observe(seconds)
+
+    def snapshot(self) -> Dict[str, Any]:
+        total = sum(self.decisions.values())
+        fast = sum(v for k, v in self.decisions.items() if k.startswith("fast:"))
+        return {
+            "decisions": dict(self.decisions),
+            "fast_share": round(fast / total, 4) if total else 0.0,
+            "escalations": self.escalations,
+            "classifier_errors": self.classifier_errors,
+            "classifier_latency_s": self.classifier_latency.snapshot(),
+            "tier_latency_s": {t: w.snapshot() for t, w in self.tier_latency.items()},
+        }
+
+
+class ChatRouter:
+    """Pick the model tier for a coach chat turn.
+
+    Rules handle the obvious cases (greetings/acks -> fast; planning, data or
+    search questions -> full). Anything else is classified by a small model
+    when one is configured, defaulting to the full supervisor graph.
+    """
+
+    def __init__(self, classifier: Any = None, *, enabled: bool = COACH_ROUTING_ENABLED) -> None:
+        # classifier: runnable returning RouteDecision (e.g. ChatOpenAI(...).with_structured_output(RouteDecision))
+        self.classifier = classifier
+        self.enabled = enabled
+        self.stats = RoutingStats()
+
+    def classify_rules(self, message: str) -> Optional[RouteDecision]:
+        text = (message or "").strip()
+        if not text:
+            return RouteDecision(tier="fast", reason="empty")
+        if len(text) > ROUTER_MAX_FAST_CHARS:
+            return RouteDecision(tier="full", reason="long_message")
+        for reason, rx in _FULL_RE:
+            if rx.search(text):
+                return RouteDecision(tier="full", reason=f"rule:{reason}")
+        for rx in _FAST_RE:
+            if rx.search(text):
+                return RouteDecision(tier="fast", reason="rule:smalltalk")
+        return None
+
+    async def route(self, message: str, history: Optional[List[BaseMessage]] = None) -> Dict[str, str]:
+        """Return {"tier", "reason", "source"}; source is one of disabled|rules|model|default."""
+        if not self.enabled:
+            decision, source = RouteDecision(tier="full", reason="routing_disabled"), "disabled"
+        else:
+            decision, source = self.classify_rules(message), "rules"
+            if decision is None and self.classifier is not None:
+                # Give the classifier the previous assistant turn so short follow-ups are judged in context
+                prev = next((m for m in reversed(history or []) if getattr(m, "type", None) == "ai"), None)
+                prompt: List[BaseMessage] = [SystemMessage(content=ROUTER_PROMPT)]
+                if prev is not None and isinstance(prev.content, str):
+                    prompt.append(SystemMessage(content=f"Previous coach reply: {prev.content[:500]}"))
+                prompt.append(HumanMessage(content=message))
+                t0 = time.monotonic()
+                try:
+                    out = await self.classifier.ainvoke(prompt)
+                    decision = out if isinstance(out, RouteDecision) else RouteDecision.model_validate(out)
+                    source = "model"
+                except Exception as e:
+                    self.stats.classifier_errors += 1
+                    logger.warning("classifier failed, defaulting to full: {}", e)
+                    decision = None
+                finally:
+                    self.stats.classifier_latency.observe(time.monotonic() - t0)
+            if decision is None:
+                decision, source = RouteDecision(tier="full", reason="default"), "default"
+        self.stats.record_decision(decision.tier, source)
+        return {"tier": decision.tier, "reason": decision.reason, "source": source}
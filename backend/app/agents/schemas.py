@@ -1,6 +1,6 @@
 # app/agents/schemas.py
 from pydantic import BaseModel
-from typing import List
+from typing import List, Literal
 
 class TaskModel(BaseModel):
     title: str
@@ -10,3 +10,8 @@ class TaskModel(BaseModel):
 
 class ItemsModel(BaseModel):
     items: List[TaskModel]
+
+
+class RouteDecision(BaseModel):
+    tier: Literal["fast", "full"]
+    reason: str
@@ -0,0 +1,198 @@
+# app/agents/summary.py
+"""Rolling conversation summary so chat prompts stay bounded as conversations grow.
+
+The conversations row carries `summary` plus `summary_through` (created_at of the last
+message folded in). A turn sends the summary and only the messages after that cursor;
+once enough unsummarized messages pile up, all but the most recent are folded into the
+summary by a background task after the reply has been persisted.
+"""
+import asyncio
+import os
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Set
+
+from langchain_core.messages import HumanMessage, SystemMessage
+from loguru import logger
+
+from app.agents.prompts import SUMMARY_PROMPT
+from app.agents.utils.accounting import agent_scope
+from app.agents.utils.stats import LatencyWindow
+from app.dependencies.chat_store import ChatStore
+from app.dependencies.deadline import detached_deadline_scope
+
+SUMMARY_ENABLED = os.getenv("COACH_SUMMARY", "1").strip().lower() not in ("0", "false", "no", "off")
+# Fold once this many messages are newer than the summary cursor...
+SUMMARY_TRIGGER_MESSAGES = int(os.getenv("COACH_SUMMARY_TRIGGER_MESSAGES", "20"))
+# ...keeping this many recent messages verbatim
+SUMMARY_KEEP_RECENT = int(os.getenv("COACH_SUMMARY_KEEP_RECENT", "8"))
+SUMMARY_MAX_CHARS = int(os.getenv("COACH_SUMMARY_MAX_CHARS", "2000"))
+# Budget of one background fold (model call plus the summary write), independent of the
+# request that scheduled it
+SUMMARY_FOLD_TIMEOUT_S = float(os.getenv("COACH_SUMMARY_FOLD_TIMEOUT_S", "60"))
+# Per-message cap when feeding turns to the summarizer
+_FOLD_MESSAGE_CHARS = 1500
+
+
+def _parse_ts(value: Optional[str]) -> Optional[datetime]:
+    if not value:
+        return None
+    try:
+        dt = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    return dt if dt.tzinfo else dt.replace(tzinfo=timezone.utc)
+
+
+def unsummarized(rows: List[Dict[str, Any]], summary_through: Optional[str]) -> List[Dict[str, Any]]:
+    """Rows (chronological) created after the summary cursor; all rows when there is none."""
+    cursor = _parse_ts(summary_through)
+    if cursor is None:
+        return rows
+    out = []
+    for r in rows:
+        ts = _parse_ts(r.get("created_at"))
+        if ts is None or ts > cursor:
+            out.append(r)
+    return out
+
+
+def summary_message(summary: str) -> SystemMessage:
+    # Fixed id: in a checkpointed thread the next summary replaces this one in place
+    return SystemMessage(content=f"# Conversation summary (earlier turns)\n{summary}", id="coach-summary")
+
+
+def _row_text(row: Dict[str, Any]) -> str:
+    content = row.get("content")
+    text = content.get("text") if isinstance(content, dict) else None
+    if not isinstance(text, str):
+        text = str(content)
+    text = text.strip()
+    if len(text) > _FOLD_MESSAGE_CHARS:
+        text = text[:_FOLD_MESSAGE_CHARS] + "…"
+    return text
+
+
+def _render_turns(rows: List[Dict[str, Any]]) -> str:
+    labels = {"user": "User", "assistant": "Coach"}
+    lines = []
+    for r in rows:
+        label = labels.get(r.get("role"))
+        if label is None:
+            continue  # tool/system rows carry no conversational content worth keeping
+        text = _row_text(r)
+        if text:
+            lines.append(f"{label}: {text}")
+    return "\n".join(lines)
+
+
+class SummaryStats:
+    def __init__(self) -> None:
+        self.turns_with_summary = 0
+        self.folds = 0
+        self.failures = 0
+        self.skipped_inflight = 0
+        self.messages_folded = 0
+        self.summary_chars = 0
+        self.fold_latency = LatencyWindow()
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "turns_with_summary": self.turns_with_summary,
+            "folds": self.folds,
+            "failures": self.failures,
+            "skipped_inflight": self.skipped_inflight,
+            "messages_folded": self.messages_folded,
+            "last_summary_chars": self.summary_chars,
+            "fold_latency_s": self.fold_latency.snapshot(),
+        }
+
+
+class ConversationSummarizer:
+    """Decides when to fold older turns and runs the fold off the request path."""
+
+    def __init__(
+        self,
+        *,
+        enabled: bool = SUMMARY_ENABLED,
+        trigger: int = SUMMARY_TRIGGER_MESSAGES,
+        keep_recent: int = SUMMARY_KEEP_RECENT,
+        max_chars: int = SUMMARY_MAX_CHARS,
+        on_update: Optional[Callable[[str, str, str], None]] = None,
+    ) -> None:
+        self.enabled = enabled
+        # Called with (conversation_id, summary, summary_through) after each persisted fold
+        self.on_update = on_update
+        self.trigger = trigger
+        self.keep_recent = keep_recent
+        self.max_chars = max_chars
+        self.stats = SummaryStats()
+        self._inflight: Set[str] = set()
+        # Strong refs so background folds are not garbage-collected mid-flight
+        self._tasks: Set[asyncio.Task] = set()
+
+    def maybe_schedule(
+        self,
+        model: Any,
+        *,
+        store: ChatStore,
+        conversation_id: str,
+        summary: Optional[str],
+        pending_rows: List[Dict[str, Any]],
+        new_messages: int,
+    ) -> bool:
+        """Schedule a background fold when the unsummarized backlog reached the trigger.
+
+        `pending_rows` are the unsummarized rows loaded for this turn; `new_messages` is how
+        many were persisted after them (they always stay in the recent window).
+        """
+        if not self.enabled or model is None:
+            return False
+        if len(pending_rows) + new_messages < self.trigger:
+            return False
+        keep_from_pending = max(self.keep_recent - new_messages, 0)
+        to_fold = pending_rows[: len(pending_rows) - keep_from_pending] if keep_from_pending else list(pending_rows)
+        to_fold = [r for r in to_fold if r.get("created_at")]
+        if not to_fold:
+            return False
+        if conversation_id in self._inflight:
+            self.stats.skipped_inflight += 1
+            return False
+        self._inflight.add(conversation_id)
+        task = asyncio.create_task(self._fold(model, store, conversation_id, summary, to_fold))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return True
+
+    async def _fold(
+        self, model: Any, store: ChatStore, conversation_id: str, summary: Optional[str], rows: List[Dict[str, Any]]
+    ) -> None:
+        t0 = time.monotonic()
+        try:
+            # The task copied the turn's context, whose request deadline has usually passed by
+            # the time the fold writes; it runs on its own budget instead
+            with detached_deadline_scope(SUMMARY_FOLD_TIMEOUT_S):
+                prompt = SUMMARY_PROMPT.format(max_chars=self.max_chars)
+                body = f"Existing summary:\n{summary or '(none)'}\n\nNew turns:\n{_render_turns(rows)}"
+                with agent_scope("summary"):
+                    reply = await asyncio.wait_for(
+                        model.ainvoke([SystemMessage(content=prompt), HumanMessage(content=body)]), SUMMARY_FOLD_TIMEOUT_S
+                    )
+                text = reply.content if isinstance(reply.content, str) else str(reply.content)
+                text = text.strip()[: self.max_chars]
+                if not text:
+                    raise RuntimeError("empty summary")
+                await asyncio.to_thread(store.update_summary, conversation_id, text, rows[-1]["created_at"])
+                if self.on_update is not None:
+                    self.on_update(conversation_id, text, rows[-1]["created_at"])
+                self.stats.folds += 1
+                self.stats.messages_folded += len(rows)
+                self.stats.summary_chars = len(text)
+                self.stats.fold_latency.observe(time.monotonic() - t0)
+                logger.info("folded {} messages conv={} chars={} in {:.2f}s", len(rows), conversation_id, len(text), time.monotonic() - t0)
+        except Exception as e:
+            # The raw turns stay unsummarized and are retried on a later turn
+            self.stats.failures += 1
+            logger.warning("fold failed conv={}: {}", conversation_id, e)
+        finally:
+            self._inflight.discard(conversation_id)
@@ -0,0 +1,111 @@
+# app/agents/tokens.py
+"""Local token counting and token-budgeted history windows.
+
+Counts use tiktoken when its encoding is available locally and fall back to a
+chars/4 estimate otherwise (e.g. no network to fetch the BPE file). Each message's
+count is computed once at insert time and stored as content["tokens"], so windowing
+a conversation only sums stored integers.
+"""
+import json
+import os
+from functools import lru_cache
+from typing import Any, Dict, List, Optional
+
+from langchain_core.messages import BaseMessage
+from loguru import logger
+
+TOKENIZER_ENCODING = os.getenv("COACH_TOKENIZER_ENCODING", "o200k_base")
+# History token budgets per model tier (the system prompt, summary and prefetched context come on top)
+HISTORY_TOKEN_BUDGETS = {
+    "full": int(os.getenv("COACH_HISTORY_TOKENS_FULL", "6000")),
+    "fast": int(os.getenv("COACH_HISTORY_TOKENS_FAST", "1500")),
+}
+# Rows loaded per turn before token windowing
+HISTORY_FETCH_LIMIT = int(os.getenv("COACH_HISTORY_FETCH_LIMIT", "50"))
+# Role/separator tokens the chat format adds per message
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+@lru_cache(maxsize=1)
+def _encoder():
+    try:
+        import tiktoken
+
+        return tiktoken.get_encoding(TOKENIZER_ENCODING)
+    except Exception as e:
+        logger.warning("tiktoken unavailable ({}); using chars/4 estimate", e)
+        return None
+
+
+@lru_cache(maxsize=4096)
+def count_tokens(text: str) -> int:
+    if not text:
+        return 0
+    enc = _encoder()
+    if enc is None:
+        return (len(text) + 3) // 4
+    return len(enc.encode(text, disallowed_special=()))
+
+
+def content_text(content: Any) -> str:
+    if isinstance(content, dict):
+        text = content.get("text")
+        return text if isinstance(text, str) else ""
+    if isinstance(content, str):
+        return content
+    return str(content or "")
+
+
+def with_token_count(content: Dict[str, Any]) -> Dict[str, Any]:
+    """Return content with content["tokens"] set (computed once, at insert time)."""
+    if not isinstance(content, dict) or isinstance(content.get("tokens"), int):
+        return content
+    n = count_tokens(content_text(content))
+    if content.get("tool_calls"):
+        n += count_tokens(json.dumps(content["tool_calls"], default=str))
+    return {**content, "tokens": n}
+
+
+def row_tokens(row: Dict[str, Any]) -> int:
+    """Stored token count of a messages row (legacy rows without one are counted here)."""
+    content = row.get("content")
+    stored = content.get("tokens") if isinstance(content, dict) else None
+    n = stored if isinstance(stored, int) else count_tokens(content_text(content))
+    return n + MESSAGE_OVERHEAD_TOKENS
+
+
+def history_budget(tier: str) -> int:
+    return HISTORY_TOKEN_BUDGETS.get(tier, HISTORY_TOKEN_BUDGETS["full"])
+
+
+def window_rows(rows: List[Dict[str, Any]], budget: Optional[int]) -> List[Dict[str, Any]]:
+    """Newest suffix of chronological `rows` whose stored token counts fit in `budget`."""
+    if budget is None:
+        return rows
+    total = 0
+    start = len(rows)
+    for i in range(len(rows) - 1, -1, -1):
+        total += row_tokens(rows[i])
+        if total > budget:
+            break
+        start = i
+    return rows[start:]
+
+
+def message_tokens(msg: BaseMessage) -> int:
+    content = msg.content if isinstance(msg.content, str) else str(msg.content)
+    return count_tokens(content) + MESSAGE_OVERHEAD_TOKENS
+
+
+def window_messages(messages: List[BaseMessage], budget: Optional[int]) -> List[BaseMessage]:
+    """Newest suffix of LangChain `messages` that fits in `budget` (for checkpointed state)."""
+    if budget is None:
+        return messages
+    total = 0
+    start = len(messages)
+    for i in range(len(messages) - 1, -1, -1):
+        total += message_tokens(messages[i])
+        if total > budget:
+            break
+        start = i
+    return messages[start:]
@@ -0,0 +1,145 @@
+# app/agents/trajectory.py
+"""Persist and replay the tool traffic of chat turns.
+
+A supervisor turn's AI tool calls and tool results (goal/task reads, Tavily searches,
+generator output) are stored as compact messages rows next to the final reply, so the
+next turn can reuse recent results instead of calling the tools again. On replay,
+results are capped, stale or superseded results are elided, and tool-call/result pairs
+cut apart by the history window are repaired so the model API accepts the sequence.
+"""
+import json
+import os
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Set
+
+from langchain_core.messages import AIMessage, BaseMessage, ToolMessage
+
+# Stored size of one tool result (characters)
+TOOL_RESULT_STORE_CHARS = int(os.getenv("COACH_TOOL_RESULT_STORE_CHARS", "4000"))
+# Replayed size of one tool result (characters)
+TOOL_REPLAY_CHARS = int(os.getenv("COACH_TOOL_REPLAY_CHARS", "1500"))
+# Results older than this are replayed as a stub telling the model to call the tool again
+TOOL_REPLAY_MAX_AGE_S = float(os.getenv("COACH_TOOL_REPLAY_MAX_AGE_S", "1800"))
+
+
+def is_handoff(tool_name: Optional[str]) -> bool:
+    """Supervisor handoff tools carry no data worth keeping."""
+    return bool(tool_name) and (tool_name.startswith("transfer_to_") or tool_name.startswith("transfer_back_to_"))
+
+
+def _truncate(text: str, limit: int) -> str:
+    if len(text) <= limit:
+        return text
+    return text[:limit] + f"… [truncated {len(text) - limit} chars]"
+
+
+def trajectory_to_persist(turn_messages: List[BaseMessage], final_ai: AIMessage) -> List[BaseMessage]:
+    """Tool calls and results from one turn (handoffs and intermediate agent chatter dropped).
+
+    `turn_messages` are the graph's messages after the user's message; the final reply
+    is persisted separately and excluded here.
+    """
+    out: List[BaseMessage] = []
+    for m in turn_messages:
+        if m is final_ai:
+            continue
+        if isinstance(m, AIMessage) and m.tool_calls:
+            calls = [
+                {"id": c.get("id"), "name": c.get("name"), "args": c.get("args") or {}}
+                for c in m.tool_calls
+                if not is_handoff(c.get("name"))
+            ]
+            if calls:
+                out.append(AIMessage(content="", tool_calls=calls, name=m.name))
+        elif isinstance(m, ToolMessage) and not is_handoff(m.name):
+            content = m.content if isinstance(m.content, str) else json.dumps(m.content, default=str)
+            out.append(
+                ToolMessage(
+                    content=_truncate(content, TOOL_RESULT_STORE_CHARS),
+                    tool_call_id=m.tool_call_id,
+                    name=m.name,
+                )
+            )
+    return out
+
+
+def _age_s(row: Dict[str, Any], now: datetime) -> Optional[float]:
+    raw = row.get("created_at")
+    if not raw:
+        return None
+    try:
+        ts = datetime.fromisoformat(str(raw).replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if ts.tzinfo is None:
+        ts = ts.replace(tzinfo=timezone.utc)
+    return (now - ts).total_seconds()
+
+
+def compact_tool_rows(rows: List[Dict[str, Any]], *, now: Optional[datetime] = None) -> List[Dict[str, Any]]:
+    """Cap and elide tool-result rows before replay (input rows are not modified).
+
+    A result is elided when it is older than TOOL_REPLAY_MAX_AGE_S or when a later call of
+    the same tool with the same arguments superseded it.
+    """
+    now = now or datetime.now(timezone.utc)
+    call_keys: Dict[str, str] = {}
+    for r in rows:
+        content = r.get("content")
+        if r.get("role") == "assistant" and isinstance(content, dict):
+            for c in content.get("tool_calls") or []:
+                call_keys[c.get("id")] = f"{c.get('name')}:{json.dumps(c.get('args') or {}, sort_keys=True, default=str)}"
+    latest: Dict[str, int] = {}
+    for i, r in enumerate(rows):
+        content = r.get("content")
+        if r.get("role") == "tool" and isinstance(content, dict):
+            key = call_keys.get(content.get("tool_call_id"))
+            if key:
+                latest[key] = i
+
+    out: List[Dict[str, Any]] = []
+    for i, r in enumerate(rows):
+        content = r.get("content")
+        if r.get("role") != "tool" or not isinstance(content, dict):
+            out.append(r)
+            continue
+        name = content.get("name") or "tool"
+        text = content.get("text") if isinstance(content.get("text"), str) else ""
+        key = call_keys.get(content.get("tool_call_id"))
+        age = _age_s(r, now)
+        if key and latest.get(key, i) != i:
+            text = f"[{name} result superseded by a later call; see below]"
+        elif age is not None and age > TOOL_REPLAY_MAX_AGE_S:
+            text = f"[{name} result from {int(age // 60)} min ago elided as stale; call {name} again if needed]"
+        elif len(text) > TOOL_REPLAY_CHARS:
+            text = _truncate(text, TOOL_REPLAY_CHARS)
+        else:
+            out.append(r)
+            continue
+        # Drop the stored count so the window re-counts the shortened text
+        new_content = {k: v for k, v in content.items() if k != "tokens"}
+        new_content["text"] = text
+        out.append({**r, "content": new_content})
+    return out
+
+
+def sanitize_tool_pairs(messages: List[BaseMessage]) -> List[BaseMessage]:
+    """Drop tool results whose call fell outside the window and tool calls left without results."""
+    answered: Set[str] = {m.tool_call_id for m in messages if isinstance(m, ToolMessage)}
+    out: List[BaseMessage] = []
+    open_calls: Set[str] = set()
+    for m in messages:
+        if isinstance(m, AIMessage) and m.tool_calls:
+            calls = [c for c in m.tool_calls if c.get("id") in answered]
+            if not calls:
+                if isinstance(m.content, str) and m.content.strip():
+                    out.append(AIMessage(content=m.content, name=m.name))
+                continue
+            open_calls.update(c["id"] for c in calls)
+            out.append(AIMessage(content=m.content, tool_calls=calls, name=m.name) if len(calls) != len(m.tool_calls) else m)
+        elif isinstance(m, ToolMessage):
+            if m.tool_call_id in open_calls:
+                out.append(m)
+        else:
+            out.append(m)
+    return out
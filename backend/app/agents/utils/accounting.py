@@ -0,0 +1,371 @@
+# app/agents/utils/accounting.py
+"""Token, cost and LLM-latency accounting per request, user, route, agent and model.
+
+`AccountingCallbackHandler` is attached to every chat model FitnessCoach builds. For each
+LLM call it reads `usage_metadata` (prompt, completion and cached prompt tokens), the
+model name and the wall time, and attributes them to:
+- the request: a RequestUsage the HTTP middleware puts in CURRENT_USAGE (route, user);
+- the agent: CURRENT_AGENT when a caller set it (agent_scope("diet"), ...), otherwise the
+  LangGraph namespace the call ran in (supervisor, goals_agent, coach);
+- the UsageLedger: lifetime totals by route/agent/model and rolling per-user totals
+  (time buckets over ACCOUNTING_WINDOW_S) that quotas can later be checked against.
+"""
+import json
+import os
+import re
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from typing import Any, Deque, Dict, Iterator, List, Optional, Tuple
+
+from langchain_core.callbacks import BaseCallbackHandler
+from loguru import logger
+
+from app.agents.context import CURRENT_AGENT, CURRENT_USAGE
+from app.observability.metrics import LLM_LATENCY
+
+REQUEST_ID_HEADER = "X-Request-ID"
+# Client-supplied request ids must look like an id (they key logs and traces)
+REQUEST_ID_RE = re.compile(r"[A-Za-z0-9._:-]{8,128}")
+USAGE_HEADER = "X-LLM-Usage"
+
+# Rolling per-user window and its bucket size
+ACCOUNTING_WINDOW_S = int(os.getenv("ACCOUNTING_WINDOW_S", str(24 * 3600)))
+ACCOUNTING_BUCKET_S = int(os.getenv("ACCOUNTING_BUCKET_S", "300"))
+ACCOUNTING_MAX_USERS = int(os.getenv("ACCOUNTING_MAX_USERS", "10000"))
+
+# USD per 1M tokens: (input, cached input, output). Longest matching prefix of the model
+# name wins; override or extend with ACCOUNTING_MODEL_PRICES='{"gpt-4o": [2.5, 1.25, 10]}'.
+MODEL_PRICES_PER_1M: Dict[str, Tuple[float, float, float]] = {
+    "gpt-4o": (2.50, 1.25, 10.00),
+    "gpt-4o-mini": (0.15, 0.075, 0.60),
+    "gpt-4.1": (2.00, 0.50, 8.00),
+    "gpt-4.1-mini": (0.40, 0.10, 1.60),
+    "gpt-5": (1.25, 0.125, 10.00),
+    "gpt-5-mini": (0.25, 0.025, 2.00),
+    "gpt-5-nano": (0.05, 0.005, 0.40),
+}
+try:
+    MODEL_PRICES_PER_1M.update(
+        {k: tuple(v) for k, v in json.loads(os.getenv("ACCOUNTING_MODEL_PRICES", "") or "{}").items()}  # type: ignore[misc]
+    )
+except ValueError as e:
+    logger.warning("ignoring invalid ACCOUNTING_MODEL_PRICES: {}", e)
+
+# LangGraph namespaces that name an agent (flat topology's single agent runs as "agent")
+_NAMESPACE_AGENTS = {"supervisor": "supervisor", "goals_agent": "goals_agent", "agent": "coach"}
+
+
+def estimate_cost(model: str, input_tokens: int, output_tokens: int, cached_tokens: int = 0) -> Optional[float]:
+    """USD for one call; None when the model has no price entry."""
+    key = max((k for k in MODEL_PRICES_PER_1M if model.startswith(k)), key=len, default=None)
+    if key is None:
+        return None
+    p_in, p_cached, p_out = MODEL_PRICES_PER_1M[key]
+    uncached = max(input_tokens - cached_tokens, 0)
+    return (uncached * p_in + cached_tokens * p_cached + output_tokens * p_out) / 1_000_000
+
+
+class Tally:
+    __slots__ = ("calls", "errors", "input_tokens", "output_tokens", "cached_tokens", "llm_s", "cost_usd")
+
+    def __init__(self) -> None:
+        self.calls = 0
+        self.errors = 0
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self.cached_tokens = 0
+        self.llm_s = 0.0
+        self.cost_usd = 0.0
+
+    def add(self, other: "Tally") -> None:
+        for f in self.__slots__:
+            setattr(self, f, getattr(self, f) + getattr(other, f))
+
+    @property
+    def total_tokens(self) -> int:
+        return self.input_tokens + self.output_tokens
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "input_tokens": self.input_tokens,
+            "output_tokens": self.output_tokens,
+            "cached_tokens": self.cached_tokens,
+            "total_tokens": self.total_tokens,
+            "llm_s": round(self.llm_s, 3),
+            "cost_usd": round(self.cost_usd, 6),
+        }
+
+
+def _call_tally(input_tokens: int, output_tokens: int, cached_tokens: int, seconds: float, cost: Optional[float], error: bool) -> Tally:
+    t = Tally()
+    t.calls = 1
+    t.errors = 1 if error else 0
+    t.input_tokens = input_tokens
+    t.output_tokens = output_tokens
+    t.cached_tokens = cached_tokens
+    t.llm_s = seconds
+    t.cost_usd = cost or 0.0
+    return t
+
+
+class RequestUsage:
+    """LLM usage of one HTTP request, broken down by agent and model."""
+
+    def __init__(self, *, request_id: Optional[str] = None, route: str = "background", user_id: Optional[str] = None) -> None:
+        self.request_id = request_id or uuid.uuid4().hex
+        self.route = route
+        self.user_id = user_id
+        self.total = Tally()
+        self.by_agent: Dict[str, Tally] = {}
+        self.by_model: Dict[str, Tally] = {}
+        self._lock = threading.Lock()
+
+    def record(self, agent: str, model: str, call: Tally) -> None:
+        with self._lock:
+            self.total.add(call)
+            self.by_agent.setdefault(agent, Tally()).add(call)
+            self.by_model.setdefault(model, Tally()).add(call)
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "request_id": self.request_id,
+                "route": self.route,
+                **self.total.as_dict(),
+                "by_agent": {k: v.as_dict() for k, v in self.by_agent.items()},
+                "by_model": {k: v.as_dict() for k, v in self.by_model.items()},
+            }
+
+    def header_value(self) -> str:
+        t = self.total
+        return (
+            f"calls={t.calls};in={t.input_tokens};out={t.output_tokens};cached={t.cached_tokens};"
+            f"llm_ms={int(t.llm_s * 1000)};cost_usd={t.cost_usd:.6f}"
+        )
+
+
+def current_usage() -> Optional[RequestUsage]:
+    usage = CURRENT_USAGE.get()
+    return usage if isinstance(usage, RequestUsage) else None
+
+
+def attribute_user(user_id: Optional[str]) -> None:
+    """Attach the authenticated user to the current request's usage (called by auth)."""
+    usage = current_usage()
+    if usage is not None and user_id:
+        usage.user_id = user_id
+
+
+@contextmanager
+def usage_scope(usage: RequestUsage) -> Iterator[RequestUsage]:
+    token = CURRENT_USAGE.set(usage)
+    try:
+        yield usage
+    finally:
+        CURRENT_USAGE.reset(token)
+
+
+@contextmanager
+def agent_scope(agent: str) -> Iterator[None]:
+    """Attribute LLM calls made inside the block to `agent`."""
+    token = CURRENT_AGENT.set(agent)
+    try:
+        yield
+    finally:
+        CURRENT_AGENT.reset(token)
+
+
+class _UserWindow:
+    __slots__ = ("lifetime", "buckets")
+
+    def __init__(self) -> None:
+        self.lifetime = Tally()
+        self.buckets: Deque[Tuple[int, Tally]] = deque()
+
+
+class UsageLedger:
+    """Process-wide totals by route/agent/model plus rolling per-user windows (LRU-bounded)."""
+
+    def __init__(
+        self,
+        *,
+        window_s: int = ACCOUNTING_WINDOW_S,
+        bucket_s: int = ACCOUNTING_BUCKET_S,
+        max_users: int = ACCOUNTING_MAX_USERS,
+    ) -> None:
+        self.window_s = window_s
+        self.bucket_s = max(bucket_s, 1)
+        self.max_users = max_users
+        self.total = Tally()
+        self.by_route: Dict[str, Tally] = {}
+        self.by_agent: Dict[str, Tally] = {}
+        self.by_model: Dict[str, Tally] = {}
+        self._users: "OrderedDict[str, _UserWindow]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def record(self, *, route: str, user_id: Optional[str], agent: str, model: str, call: Tally, now: Optional[float] = None) -> None:
+        now = time.time() if now is None else now
+        with self._lock:
+            self.total.add(call)
+            self.by_route.setdefault(route, Tally()).add(call)
+            self.by_agent.setdefault(agent, Tally()).add(call)
+            self.by_model.setdefault(model, Tally()).add(call)
+            if not user_id:
+                return
+            win = self._users.get(user_id)
+            if win is None:
+                win = self._users[user_id] = _UserWindow()
+                while len(self._users) > self.max_users:
+                    self._users.popitem(last=False)
+            else:
+                self._users.move_to_end(user_id)
+            win.lifetime.add(call)
+            bucket = int(now // self.bucket_s)
+            if not win.buckets or win.buckets[-1][0] != bucket:
+                win.buckets.append((bucket, Tally()))
+            win.buckets[-1][1].add(call)
+            self._trim(win, now)
+
+    def _trim(self, win: _UserWindow, now: float) -> None:
+        oldest = int((now - self.window_s) // self.bucket_s)
+        while win.buckets and win.buckets[0][0] <= oldest:
+            win.buckets.popleft()
+
+    def user_totals(self, user_id: str, *, window_s: Optional[int] = None, now: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """Lifetime and rolling-window totals for a user (window_s <= ACCOUNTING_WINDOW_S)."""
+        now = time.time() if now is None else now
+        window_s = min(window_s or self.window_s, self.window_s)
+        with self._lock:
+            win = self._users.get(user_id)
+            if win is None:
+                return None
+            self._trim(win, now)
+            oldest = int((now - window_s) // self.bucket_s)
+            recent = Tally()
+            for bucket, tally in win.buckets:
+                if bucket > oldest:
+                    recent.add(tally)
+            return {"user_id": user_id, "window_s": window_s, "window": recent.as_dict(), "lifetime": win.lifetime.as_dict()}
+
+    def top_users(self, n: int = 10) -> List[Dict[str, Any]]:
+        with self._lock:
+            ids = list(self._users)
+        rows = [self.user_totals(uid) for uid in ids]
+        rows = [r for r in rows if r is not None]
+        rows.sort(key=lambda r: r["window"]["total_tokens"], reverse=True)
+        return rows[:n]
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            out = {
+                "total": self.total.as_dict(),
+                "by_route": {k: v.as_dict() for k, v in self.by_route.items()},
+                "by_agent": {k: v.as_dict() for k, v in self.by_agent.items()},
+                "by_model": {k: v.as_dict() for k, v in self.by_model.items()},
+                "users_tracked": len(self._users),
+                "window_s": self.window_s,
+            }
+        out["top_users"] = self.top_users()
+        return out
+
+
+USAGE_LEDGER = UsageLedger()
+
+
+def _agent_from_metadata(metadata: Optional[Dict[str, Any]]) -> Optional[str]:
+    ns = str((metadata or {}).get("langgraph_checkpoint_ns") or "")
+    head = ns.split("|", 1)[0].split(":", 1)[0]
+    return _NAMESPACE_AGENTS.get(head)
+
+
+def _model_name(serialized: Any, metadata: Optional[Dict[str, Any]], invocation_params: Optional[Dict[str, Any]]) -> str:
+    params = invocation_params or {}
+    for value in (params.get("model"), params.get("model_name"), (metadata or {}).get("ls_model_name")):
+        if isinstance(value, str) and value:
+            return value
+    kwargs = serialized.get("kwargs") if isinstance(serialized, dict) else None
+    if isinstance(kwargs, dict):
+        value = kwargs.get("model_name") or kwargs.get("model")
+        if isinstance(value, str) and value:
+            return value
+    return "unknown"
+
+
+def _usage_from_response(response: Any) -> Tuple[int, int, int, Optional[str]]:
+    """(input, output, cached input) tokens and the reported model name of an LLMResult."""
+    inp = out = cached = 0
+    model = None
+    for gen_list in getattr(response, "generations", None) or []:
+        for gen in gen_list:
+            msg = getattr(gen, "message", None)
+            usage = getattr(msg, "usage_metadata", None) or {}
+            inp += int(usage.get("input_tokens") or 0)
+            out += int(usage.get("output_tokens") or 0)
+            cached += int((usage.get("input_token_details") or {}).get("cache_read") or 0)
+            meta = getattr(msg, "response_metadata", None) or {}
+            model = model or meta.get("model_name") or meta.get("model")
+    llm_output = getattr(response, "llm_output", None) or {}
+    if not (inp or out):
+        token_usage = llm_output.get("token_usage") or {}
+        inp = int(token_usage.get("prompt_tokens") or 0)
+        out = int(token_usage.get("completion_tokens") or 0)
+        cached = int((token_usage.get("prompt_tokens_details") or {}).get("cached_tokens") or 0)
+    return inp, out, cached, model or llm_output.get("model_name")
+
+
+class AccountingCallbackHandler(BaseCallbackHandler):
+    """Records usage and wall time of every LLM call into the request and the ledger.
+
+    Runs inline so CURRENT_USAGE/CURRENT_AGENT of the calling task are visible.
+    """
+
+    run_inline = True
+
+    def __init__(self, ledger: UsageLedger = USAGE_LEDGER) -> None:
+        self.ledger = ledger
+        # run_id -> (start, agent, model)
+        self._runs: Dict[Any, Tuple[float, str, str]] = {}
+
+    def _start(self, serialized: Any, run_id: Any, metadata: Optional[Dict[str, Any]], kwargs: Dict[str, Any]) -> None:
+        agent = CURRENT_AGENT.get() or _agent_from_metadata(metadata) or "unattributed"
+        model = _model_name(serialized, metadata, kwargs.get("invocation_params"))
+        self._runs[run_id] = (time.monotonic(), agent, model)
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, metadata=None, **kwargs):
+        self._start(serialized, run_id, metadata, kwargs)
+
+    def on_llm_start(self, serialized, prompts, *, run_id, metadata=None, **kwargs):
+        self._start(serialized, run_id, metadata, kwargs)
+
+    def _finish(self, run_id: Any, response: Any, error: bool) -> None:
+        started = self._runs.pop(run_id, None)
+        if started is None:
+            return
+        t0, agent, model = started
+        inp, out, cached, reported = _usage_from_response(response) if response is not None else (0, 0, 0, None)
+        if reported:
+            model = reported
+        elapsed = time.monotonic() - t0
+        LLM_LATENCY.labels(model, agent).observe(elapsed)
+        call = _call_tally(inp, out, cached, elapsed, estimate_cost(model, inp, out, cached), error)
+        usage = current_usage()
+        if usage is not None:
+            usage.record(agent, model, call)
+        self.ledger.record(
+            route=usage.route if usage is not None else "background",
+            user_id=usage.user_id if usage is not None else None,
+            agent=agent,
+            model=model,
+            call=call,
+        )
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        self._finish(run_id, response, error=False)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._finish(run_id, None, error=True)
@@ -0,0 +1,187 @@
+# app/agents/utils/hedging.py
+import asyncio
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, TypeVar
+
+from app.agents.utils.stats import LatencyWindow
+
+T = TypeVar("T")
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+def _env_flag(name: str, default: bool) -> bool:
+    val = os.getenv(name)
+    if val is None:
+        return default
+    return val.strip().lower() not in ("0", "false", "no", "off", "")
+
+
+# --- Configuration (env) ---
+# Deadline for one domain agent call, including any hedge. Per-domain overrides use
+# DOMAIN_AGENT_DEADLINE_<DOMAIN>_S, e.g. DOMAIN_AGENT_DEADLINE_STRENGTH_S=90.
+DOMAIN_AGENT_DEADLINE_S = _env_float("DOMAIN_AGENT_DEADLINE_S", 60.0)
+DOMAIN_AGENT_HEDGE = _env_flag("DOMAIN_AGENT_HEDGE", True)
+# Launch the duplicate once the primary is slower than this quantile of recent attempts.
+HEDGE_QUANTILE = _env_float("DOMAIN_AGENT_HEDGE_QUANTILE", 0.95)
+# Until enough samples exist, hedge after a fixed delay instead.
+HEDGE_MIN_SAMPLES = int(_env_float("DOMAIN_AGENT_HEDGE_MIN_SAMPLES", 20))
+HEDGE_DEFAULT_DELAY_S = _env_float("DOMAIN_AGENT_HEDGE_DEFAULT_DELAY_S", 20.0)
+HEDGE_MIN_DELAY_S = _env_float("DOMAIN_AGENT_HEDGE_MIN_DELAY_S", 2.0)
+
+
+class DomainCallStats:
+    """Counters and latency windows for one domain (diet/strength/cardio)."""
+
+    def __init__(self) -> None:
+        self.calls = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.timeouts = 0
+        self.errors = 0
+        # Latency of individual attempts (feeds the hedge delay); a cancelled attempt counts
+        # with the time it ran, a lower bound of its latency
+        self.attempts = LatencyWindow()
+        # What the caller actually waited for
+        self.effective = LatencyWindow()
+        # Estimated latency had we not hedged (see HedgedCaller._unhedged_estimate)
+        self.unhedged = LatencyWindow()
+
+    def snapshot(self) -> Dict[str, Any]:
+        eff = self.effective.snapshot()
+        unh = self.unhedged.snapshot()
+        improvement = {
+            q: (round(unh[q] - eff[q], 4) if unh[q] is not None and eff[q] is not None else None)
+            for q in ("p95", "p99")
+        }
+        return {
+            "calls": self.calls,
+            "hedges": self.hedges,
+            "hedge_rate": round(self.hedges / self.calls, 4) if self.calls else 0.0,
+            "hedge_wins": self.hedge_wins,
+            "timeouts": self.timeouts,
+            "errors": self.errors,
+            "attempt_latency_s": self.attempts.snapshot(),
+            "effective_latency_s": eff,
+            "unhedged_latency_estimate_s": unh,
+            "tail_improvement_s": improvement,
+        }
+
+
+class HedgedCaller:
+    """Run domain agent calls with a deadline and a single p95-triggered hedge.
+
+    The primary attempt starts immediately. If it has not finished after the
+    domain's hedge delay, an identical second attempt is launched; whichever
+    succeeds first wins and the other is cancelled. If nothing succeeds before
+    the deadline, asyncio.TimeoutError is raised.
+    """
+
+    def __init__(self, *, hedge_enabled: bool = DOMAIN_AGENT_HEDGE) -> None:
+        self.hedge_enabled = hedge_enabled
+        self._stats: Dict[str, DomainCallStats] = {}
+
+    def stats(self, domain: str) -> DomainCallStats:
+        st = self._stats.get(domain)
+        if st is None:
+            st = self._stats.setdefault(domain, DomainCallStats())
+        return st
+
+    def deadline_for(self, domain: str) -> float:
+        return _env_float(f"DOMAIN_AGENT_DEADLINE_{domain.upper()}_S", DOMAIN_AGENT_DEADLINE_S)
+
+    def hedge_delay(self, domain: str) -> Optional[float]:
+        if not self.hedge_enabled:
+            return None
+        attempts = self.stats(domain).attempts
+        if len(attempts) < HEDGE_MIN_SAMPLES:
+            return HEDGE_DEFAULT_DELAY_S
+        p = attempts.percentile(HEDGE_QUANTILE)
+        return max(HEDGE_MIN_DELAY_S, p if p is not None else HEDGE_DEFAULT_DELAY_S)
+
+    def _unhedged_estimate(self, st: DomainCallStats, elapsed: float) -> float:
+        """Expected primary latency given it was still running at `elapsed`.
+
+        The cancelled primary's real latency is unobservable, so use the mean of
+        recent completed attempts slower than `elapsed` (falls back to `elapsed`).
+        """
+        slower = [v for v in st.attempts.values() if v > elapsed]
+        return sum(slower) / len(slower) if slower else elapsed
+
+    async def call(
+        self,
+        domain: str,
+        factory: Callable[[], Awaitable[T]],
+        *,
+        deadline: Optional[float] = None,
+    ) -> T:
+        st = self.stats(domain)
+        st.calls += 1
+        budget = self.deadline_for(domain) if deadline is None else deadline
+        start = time.monotonic()
+        deadline_at = start + budget
+
+        async def _attempt() -> Any:
+            t0 = time.monotonic()
+            try:
+                out = await factory()
+            except asyncio.CancelledError:
+                # Slow primaries that lose to a hedge are cancelled; leaving them out would keep
+                # only the fast attempts in the window and shrink the hedge delay call after call
+                st.attempts.observe(time.monotonic() - t0)
+                raise
+            st.attempts.observe(time.monotonic() - t0)
+            return out
+
+        primary = asyncio.ensure_future(_attempt())
+        tasks: Dict[asyncio.Future, str] = {primary: "primary"}
+        try:
+            delay = self.hedge_delay(domain)
+            if delay is not None and delay < budget:
+                done, _ = await asyncio.wait({primary}, timeout=delay)
+                if not done:
+                    st.hedges += 1
+                    tasks[asyncio.ensure_future(_attempt())] = "hedge"
+            pending = set(tasks)
+            last_exc: Optional[BaseException] = None
+            while pending:
+                remaining = deadline_at - time.monotonic()
+                if remaining <= 0:
+                    break
+                done, pending = await asyncio.wait(pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+                for fut in done:
+                    if fut.exception() is not None:
+                        last_exc = fut.exception()
+                        continue
+                    elapsed = time.monotonic() - start
+                    st.effective.observe(elapsed)
+                    if tasks[fut] == "hedge":
+                        st.hedge_wins += 1
+                        st.unhedged.observe(self._unhedged_estimate(st, elapsed))
+                    else:
+                        st.unhedged.observe(elapsed)
+                    return fut.result()
+                if not done:
+                    break
+            if last_exc is not None and not pending:
+                st.errors += 1
+                raise last_exc
+            st.timeouts += 1
+            raise asyncio.TimeoutError(f"{domain} agent missed its {budget:.1f}s deadline")
+        finally:
+            for fut in tasks:
+                if not fut.done():
+                    fut.cancel()
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "hedge_enabled": self.hedge_enabled,
+            "hedge_quantile": HEDGE_QUANTILE,
+            "domains": {d: {**st.snapshot(), "hedge_delay_s": self.hedge_delay(d), "deadline_s": self.deadline_for(d)} for d, st in self._stats.items()},
+        }
@@ -0,0 +1,44 @@
+# app/agents/utils/stats.py
+import threading
+from collections import deque
+from typing import Dict, Optional
+
+
+class LatencyWindow:
+    """Rolling window of the most recent latency samples (seconds).
+
+    Cheap to update on the hot path; percentiles are computed on read.
+    """
+
+    def __init__(self, maxlen: int = 512) -> None:
+        self._samples: deque[float] = deque(maxlen=maxlen)
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(float(seconds))
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def values(self) -> list[float]:
+        with self._lock:
+            return list(self._samples)
+
+    def percentile(self, q: float) -> Optional[float]:
+        """Nearest-rank percentile for q in [0, 1]; None when the window is empty."""
+        data = sorted(self.values())
+        if not data:
+            return None
+        idx = min(len(data) - 1, max(0, int(round(q * (len(data) - 1)))))
+        return data[idx]
+
+    def snapshot(self) -> Dict[str, Optional[float]]:
+        data = sorted(self.values())
+        if not data:
+            return {"count": 0, "p50": None, "p95": None, "p99": None, "max": None}
+
+        def _q(q: float) -> float:
+            return round(data[min(len(data) - 1, int(round(q * (len(data) - 1))))], 4)
+
+        return {"count": len(data), "p50": _q(0.50), "p95": _q(0.95), "p99": _q(0.99), "max": round(data[-1], 4)}
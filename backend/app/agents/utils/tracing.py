@@ -1,84 +1,395 @@
-from typing import Any, Dict, List
+# app/agents/utils/tracing.py
+"""Per-request trace trees for agent runs, kept in a bounded ring buffer.
+
+One TracingCallbackHandler is shared by every request, so it holds no per-event state
+itself. Chain, LLM and tool runs become spans linked by run_id/parent_run_id and grouped
+into a trace per HTTP request (the accounting request id; background runs get their own
+trace). Only the most recent TRACE_MAX_TRACES traces are kept, each capped at
+TRACE_MAX_SPANS spans. Sampling is decided per trace from a hash of its id, so all spans
+of a trace share the decision. Finished traces are handed to a background thread for
+export (stdout summary line or JSONL file); the callback path never prints or does I/O.
+"""
+import hashlib
+import json
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
 from langchain_core.callbacks import BaseCallbackHandler
+from loguru import logger
 
-class TracingCallbackHandler(BaseCallbackHandler):
-    def __init__(self) -> None:
+from app.agents.utils.accounting import current_usage
+
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "1.0"))
+TRACE_MAX_TRACES = int(os.getenv("TRACE_MAX_TRACES", "200"))
+TRACE_MAX_SPANS = int(os.getenv("TRACE_MAX_SPANS", "500"))
+# stdout (one summary line per trace) | jsonl (full trace per line to TRACE_EXPORT_PATH) | none
+TRACE_EXPORT = os.getenv("TRACE_EXPORT", "stdout").strip().lower()
+TRACE_EXPORT_PATH = os.getenv("TRACE_EXPORT_PATH", "traces.jsonl")
+TRACE_EXPORT_QUEUE = int(os.getenv("TRACE_EXPORT_QUEUE", "1000"))
+_TEXT_LIMIT = 400
+
+
+def _truncate(s: Any, limit: int = _TEXT_LIMIT) -> str:
+    try:
+        text = s if isinstance(s, str) else repr(s)
+    except Exception:
+        text = str(s)
+    if len(text) > limit:
+        return text[:limit] + "…"
+    return text
+
+
+def _label_from_serialized(serialized: Any, fallback: Optional[str] = None) -> str:
+    if fallback:
+        return fallback
+    if isinstance(serialized, dict):
+        for k in ("name", "id"):
+            v = serialized.get(k)
+            if v:
+                return ".".join(str(x) for x in v) if isinstance(v, (list, tuple)) else _truncate(v, 120)
+    return "unknown"
+
+
+def _end_status(error: BaseException) -> str:
+    # Supervisor handoffs unwind through the graph as GraphBubbleUp (ParentCommand); not failures
+    return "handoff" if any(c.__name__ == "GraphBubbleUp" for c in type(error).__mro__) else "error"
+
+
+def sampled(trace_id: str, rate: float = TRACE_SAMPLE_RATE) -> bool:
+    if rate >= 1.0:
+        return True
+    if rate <= 0.0:
+        return False
+    h = int.from_bytes(hashlib.blake2b(trace_id.encode(), digest_size=8).digest(), "big")
+    return h / 2**64 < rate
+
+
+class _Trace:
+    __slots__ = ("trace_id", "route", "user_id", "started_at", "spans", "events", "dropped_spans", "open", "finished")
+
+    def __init__(self, trace_id: str, route: str, user_id: Optional[str]) -> None:
+        self.trace_id = trace_id
+        self.route = route
+        self.user_id = user_id
+        self.started_at = time.time()
+        self.spans: Dict[str, Dict[str, Any]] = {}
         self.events: List[Dict[str, Any]] = []
+        self.dropped_spans = 0
+        self.open = 0
+        self.finished = False
+
+    def summary(self) -> Dict[str, Any]:
+        kinds: Dict[str, int] = {}
+        errors = 0
+        end = self.started_at
+        for s in self.spans.values():
+            kinds[s["kind"]] = kinds.get(s["kind"], 0) + 1
+            errors += s["status"] == "error"
+            end = max(end, s.get("ended_at") or s["started_at"])
+        return {
+            "trace_id": self.trace_id,
+            "route": self.route,
+            "user_id": self.user_id,
+            "started_at": self.started_at,
+            "duration_ms": round((end - self.started_at) * 1000, 1),
+            "spans": len(self.spans),
+            "by_kind": kinds,
+            "errors": errors,
+            "dropped_spans": self.dropped_spans,
+            "open_spans": self.open,
+        }
+
+    def tree(self) -> Dict[str, Any]:
+        nodes = {rid: {**s, "children": []} for rid, s in self.spans.items()}
+        roots = []
+        for node in nodes.values():
+            parent = nodes.get(node["parent_run_id"]) if node["parent_run_id"] else None
+            (parent["children"] if parent is not None else roots).append(node)
+        return {**self.summary(), "events": list(self.events), "roots": roots}
+
+
+class TraceStore:
+    """Ring buffer of recent traces plus the run_id -> trace index for open runs."""
+
+    def __init__(self, *, max_traces: int = TRACE_MAX_TRACES, max_spans: int = TRACE_MAX_SPANS, sample_rate: float = TRACE_SAMPLE_RATE) -> None:
+        self.max_traces = max_traces
+        self.max_spans = max_spans
+        self.sample_rate = sample_rate
+        self._traces: "OrderedDict[str, _Trace]" = OrderedDict()
+        # run_id -> trace_id (None when the trace is not sampled) for runs still open
+        self._runs: Dict[str, Optional[str]] = {}
+        # Client-supplied request ids accepted recently (see claim)
+        self._claimed: "OrderedDict[str, None]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.exporter = TraceExporter()
+        self.unsampled_runs = 0
+        self.evicted = 0
+
+    def _trace_for(self, run_id: str, parent_run_id: Optional[str]) -> Optional[_Trace]:
+        """Resolve (and create) the trace a new run belongs to; None when not sampled."""
+        if parent_run_id and parent_run_id in self._runs:
+            trace_id = self._runs[parent_run_id]
+        else:
+            usage = current_usage()
+            trace_id = usage.request_id if usage is not None else run_id
+            if not sampled(trace_id, self.sample_rate):
+                trace_id = None
+        self._runs[run_id] = trace_id
+        # Runs that never report an end (cancelled tasks) must not accumulate
+        while len(self._runs) > self.max_traces * self.max_spans:
+            self._runs.pop(next(iter(self._runs)))
+        if trace_id is None:
+            self.unsampled_runs += 1
+            return None
+        return self._get_or_create(trace_id)
+
+    def _get_or_create(self, trace_id: str) -> _Trace:
+        trace = self._traces.get(trace_id)
+        if trace is None:
+            usage = current_usage()
+            trace = _Trace(trace_id, usage.route if usage is not None else "background", usage.user_id if usage is not None else None)
+            self._traces[trace_id] = trace
+            while len(self._traces) > self.max_traces:
+                self._traces.popitem(last=False)
+                self.evicted += 1
+        return trace
+
+    def claim(self, trace_id: str) -> bool:
+        """Reserve a client-supplied request id as a trace key.
+
+        False when the id is already a trace's key or was claimed recently, so one request
+        cannot add spans to another's trace; the caller then generates a fresh id.
+        """
+        with self._lock:
+            if trace_id in self._traces or trace_id in self._claimed:
+                return False
+            self._claimed[trace_id] = None
+            while len(self._claimed) > 4 * self.max_traces:
+                self._claimed.popitem(last=False)
+            return True
+
+    def start(self, run_id: Any, parent_run_id: Any, kind: str, name: str, payload: Dict[str, Any]) -> None:
+        rid, pid = str(run_id), (str(parent_run_id) if parent_run_id else None)
+        with self._lock:
+            if rid in self._runs:
+                return  # same run reported by a constructor and an inherited callback
+            trace = self._trace_for(rid, pid)
+            if trace is None:
+                return
+            if len(trace.spans) >= self.max_spans:
+                trace.dropped_spans += 1
+                return
+            trace.spans[rid] = {
+                "run_id": rid,
+                "parent_run_id": pid,
+                "kind": kind,
+                "name": name,
+                "started_at": time.time(),
+                "ended_at": None,
+                "duration_ms": None,
+                "status": "running",
+                **payload,
+            }
+            trace.open += 1
+
+    def end(self, run_id: Any, payload: Dict[str, Any], *, status: str = "ok") -> None:
+        rid = str(run_id)
+        export = None
+        with self._lock:
+            trace_id = self._runs.pop(rid, None)
+            trace = self._traces.get(trace_id) if trace_id else None
+            span = trace.spans.get(rid) if trace is not None else None
+            if span is None or span["ended_at"] is not None:
+                return
+            span["ended_at"] = time.time()
+            span["duration_ms"] = round((span["ended_at"] - span["started_at"]) * 1000, 1)
+            span["status"] = status
+            span.update(payload)
+            trace.open -= 1
+            # Background traces end with their last run; request traces when the request does
+            if trace.open == 0 and trace.route == "background" and not trace.finished:
+                trace.finished = True
+                export = trace.tree()
+        if export is not None:
+            self.exporter.submit(export)
+
+    def event(self, kind: str, payload: Dict[str, Any]) -> None:
+        usage = current_usage()
+        if usage is None or not sampled(usage.request_id, self.sample_rate):
+            return
+        with self._lock:
+            trace = self._get_or_create(usage.request_id)
+            if len(trace.events) < self.max_spans:
+                trace.events.append({"type": kind, "at": time.time(), **payload})
+
+    def finish(self, trace_id: str) -> None:
+        """Mark a request's trace complete and queue it for export."""
+        with self._lock:
+            trace = self._traces.get(trace_id)
+            if trace is None or trace.finished:
+                return
+            trace.finished = True
+            export = trace.tree()
+        self.exporter.submit(export)
+
+    def get(self, trace_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            trace = self._traces.get(trace_id)
+            return trace.tree() if trace is not None else None
 
-    def _truncate(self, s: Any, limit: int = 400) -> str:
+    def recent(self, limit: int = 50) -> List[Dict[str, Any]]:
+        with self._lock:
+            traces = list(self._traces.values())[-limit:]
+            return [t.summary() for t in reversed(traces)]
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "traces": len(self._traces),
+                "max_traces": self.max_traces,
+                "max_spans": self.max_spans,
+                "sample_rate": self.sample_rate,
+                "open_runs": len(self._runs),
+                "unsampled_runs": self.unsampled_runs,
+                "evicted": self.evicted,
+                "export": self.exporter.snapshot(),
+            }
+
+
+class TraceExporter:
+    """Exports finished traces from a daemon thread; drops (and counts) when the queue is full."""
+
+    def __init__(self, *, mode: str = TRACE_EXPORT, path: str = TRACE_EXPORT_PATH, maxsize: int = TRACE_EXPORT_QUEUE) -> None:
+        self.mode = mode
+        self.path = path
+        self._queue: "queue.Queue[Dict[str, Any]]" = queue.Queue(maxsize=maxsize)
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self.exported = 0
+        self.dropped = 0
+        self.errors = 0
+
+    def submit(self, trace: Dict[str, Any]) -> None:
+        if self.mode == "none":
+            return
+        self._ensure_thread()
         try:
-            text = s if isinstance(s, str) else repr(s)
-        except Exception:
-            text = str(s)
-        if len(text) > limit:
-            return text[:limit] + "…"
-        return text
-
-    def _label_from_serialized(self, serialized: Any) -> str:
-        if serialized is None:
-            return "None"
-        if isinstance(serialized, dict):
-            for k in ("id", "name", "lc_serializable"):
-                v = serialized.get(k)
-                if v:
-                    return self._truncate(v, 120)
-            return self._truncate(serialized, 120)
-        if isinstance(serialized, (list, tuple)):
+            self._queue.put_nowait(trace)
+        except queue.Full:
+            self.dropped += 1
+
+    def _ensure_thread(self) -> None:
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="trace-exporter", daemon=True)
+                self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            trace = self._queue.get()
             try:
-                return ".".join(str(x) for x in serialized)
-            except Exception:
-                return self._truncate(serialized, 120)
-        return self._truncate(serialized, 120)
-
-    def _log(self, kind: str, payload: Dict[str, Any]) -> None:
-        entry = {"type": kind, **payload}
-        self.events.append(entry)
-        label = payload.get("name") or payload.get("tool") or payload.get("lc_serializable")
-        print(f"[TRACE] {kind}: {label}")
-
-    def on_chain_start(self, serialized, inputs, **kwargs):
-        name = self._label_from_serialized(serialized)
+                self._export(trace)
+                self.exported += 1
+            except Exception as e:
+                self.errors += 1
+                logger.warning("trace export failed: {}", e)
+
+    def _export(self, trace: Dict[str, Any]) -> None:
+        if self.mode == "jsonl":
+            with open(self.path, "a") as f:
+                f.write(json.dumps(trace, default=str) + "\n")
+            return
+        kinds = ",".join(f"{k}={v}" for k, v in sorted(trace["by_kind"].items()))
+        logger.info(
+            "trace={} route={} spans={} ({}) duration={}ms errors={} dropped={}",
+            trace["trace_id"], trace["route"], trace["spans"], kinds, trace["duration_ms"], trace["errors"], trace["dropped_spans"],
+        )
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {"mode": self.mode, "queued": self._queue.qsize(), "exported": self.exported, "dropped": self.dropped, "errors": self.errors}
+
+
+TRACE_STORE = TraceStore()
+
+
+class TracingCallbackHandler(BaseCallbackHandler):
+    """Records chain/LLM/tool runs into TRACE_STORE (shared by all requests)."""
+
+    # Cheap, lock-protected bookkeeping only; no thread hop per event
+    run_inline = True
+
+    def __init__(self, store: TraceStore = TRACE_STORE) -> None:
+        self.store = store
+        # Tool-result cache outcomes per tool: {"get_goals": {"hit": n, "miss": m}}
+        self.cache_stats: Dict[str, Dict[str, int]] = {}
+
+    def record_cache(self, tool: str, hit: bool) -> None:
+        outcome = "hit" if hit else "miss"
+        per_tool = self.cache_stats.setdefault(tool, {"hit": 0, "miss": 0})
+        per_tool[outcome] += 1
+        self.store.event(f"tool_cache_{outcome}", {"tool": tool})
+
+    def cache_summary(self) -> Dict[str, Any]:
+        hits = sum(v["hit"] for v in self.cache_stats.values())
+        misses = sum(v["miss"] for v in self.cache_stats.values())
+        return {"by_tool": self.cache_stats, "hits": hits, "misses": misses, "round_trips_saved": hits}
+
+    def on_chain_start(self, serialized, inputs, *, run_id, parent_run_id=None, **kwargs):
         if isinstance(inputs, dict):
-            safe_inputs = {k: self._truncate(v) for k, v in inputs.items()}
-        elif isinstance(inputs, (list, tuple)):
-            safe_inputs = {str(i): self._truncate(v) for i, v in enumerate(inputs)}
+            safe_inputs = {k: _truncate(v) for k, v in inputs.items()}
         else:
-            safe_inputs = {"value": self._truncate(inputs)}
-        self._log("chain_start", {"name": name, "inputs": safe_inputs})
+            safe_inputs = {"value": _truncate(inputs)}
+        name = _label_from_serialized(serialized, kwargs.get("name"))
+        self.store.start(run_id, parent_run_id, "chain", name, {"inputs": safe_inputs})
 
-    def on_chain_end(self, outputs, **kwargs):
-        safe_outputs = outputs
-        try:
-            if isinstance(outputs, dict):
-                safe_outputs = {k: self._truncate(v) for k, v in outputs.items()}
-        except Exception:
-            safe_outputs = self._truncate(outputs)
-        self._log("chain_end", {"outputs": safe_outputs})
-
-    def on_llm_start(self, serialized, prompts, **kwargs):
-        name = self._label_from_serialized(serialized)
-        safe_prompts = [self._truncate(p) for p in (prompts or [])]
-        self._log("llm_start", {"name": name, "prompts": safe_prompts})
-
-    def on_llm_end(self, response, **kwargs):
+    def on_chain_end(self, outputs, *, run_id, **kwargs):
+        if isinstance(outputs, dict):
+            safe_outputs: Any = {k: _truncate(v) for k, v in outputs.items()}
+        else:
+            safe_outputs = _truncate(outputs)
+        self.store.end(run_id, {"outputs": safe_outputs})
+
+    def on_chain_error(self, error, *, run_id, **kwargs):
+        status = _end_status(error)
+        self.store.end(run_id, {"error": _truncate(error)} if status == "error" else {}, status=status)
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, parent_run_id=None, **kwargs):
+        last = messages[0][-1].content if messages and messages[0] else ""
+        name = _label_from_serialized(serialized, kwargs.get("name"))
+        self.store.start(run_id, parent_run_id, "llm", name, {"messages": len(messages[0]) if messages else 0, "last_message": _truncate(last)})
+
+    def on_llm_start(self, serialized, prompts, *, run_id, parent_run_id=None, **kwargs):
+        name = _label_from_serialized(serialized, kwargs.get("name"))
+        self.store.start(run_id, parent_run_id, "llm", name, {"prompts": [_truncate(p) for p in (prompts or [])]})
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
         texts: List[str] = []
-        try:
-            gens = getattr(response, "generations", []) or []
-            for gen_list in gens:
-                for gen in gen_list:
-                    txt = getattr(getattr(gen, "message", None), "content", None) or getattr(gen, "text", None)
-                    if txt:
-                        texts.append(self._truncate(txt))
-        except Exception as e:
-            texts.append(f"<parse_error {e}>")
-        self._log("llm_end", {"response": texts})
-
-    def on_tool_start(self, serialized, input_str, **kwargs):
-        try:
-            name = serialized.get("name") if isinstance(serialized, dict) else self._label_from_serialized(serialized)
-        except Exception:
-            name = self._label_from_serialized(serialized)
-        self._log("tool_start", {"tool": name, "input": self._truncate(input_str)})
+        tool_calls: List[str] = []
+        for gen_list in getattr(response, "generations", None) or []:
+            for gen in gen_list:
+                msg = getattr(gen, "message", None)
+                txt = getattr(msg, "content", None) or getattr(gen, "text", None)
+                if txt:
+                    texts.append(_truncate(txt))
+                tool_calls.extend(c.get("name", "") for c in (getattr(msg, "tool_calls", None) or []))
+        self.store.end(run_id, {"response": texts, "tool_calls": tool_calls})
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self.store.end(run_id, {"error": _truncate(error)}, status="error")
+
+    def on_tool_start(self, serialized, input_str, *, run_id, parent_run_id=None, **kwargs):
+        name = _label_from_serialized(serialized, kwargs.get("name"))
+        self.store.start(run_id, parent_run_id, "tool", name, {"input": _truncate(input_str)})
+
+    def on_tool_end(self, output, *, run_id, **kwargs):
+        self.store.end(run_id, {"output": _truncate(output)})
 
-    def on_tool_end(self, output, **kwargs):
-        self._log("tool_end", {"output": self._truncate(output)})
\ No newline at end of file
+    def on_tool_error(self, error, *, run_id, **kwargs):
+        status = _end_status(error)
+        self.store.end(run_id, {"error": _truncate(error)} if status == "error" else {}, status=status)
@@ -1,9 +1,21 @@
-from fastapi import APIRouter, HTTPException
-from typing import Dict, Any
+import asyncio
+import gc
+import threading
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import PlainTextResponse
+from typing import Dict, Any, Optional
 from pydantic import BaseModel
 
 from app.agents.graph import get_coach
 from app.agents.client import FitnessCoach
+from app.tools.tool_cache import GOALS_TOOL_CACHE
+from app.agents.utils.accounting import USAGE_LEDGER
+from app.agents.utils.tracing import TRACE_STORE
+from app.dependencies.auth import require_admin
+from app.observability.heap import HEAP_PROFILER, HEAP_TRACEMALLOC_FRAMES, OBJECT_GROWTH, known_buffers, rss_bytes
+from app.observability.loop_monitor import LOOP_MONITOR
+from app.observability.metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, render as render_metrics
+from app.observability.profiler import PROFILE_DEFAULT_INTERVAL_MS, STACK_SAMPLER, ProfilerBusy, collapsed, top_frames
 
 router = APIRouter()
 
@@ -16,6 +28,217 @@ async def list_mcp_tools() -> Dict[str, Any]:
     return {"count": len(tools), "tool_names": [t.name for t in tools]}
 
 
+@router.get("/agents/hedging")
+async def domain_agent_hedging_stats() -> Dict[str, Any]:
+    """Deadline/hedging counters and latency percentiles for direct domain agent calls."""
+    coach = await get_coach()
+    return coach._coach.hedger.snapshot()
+
+
+@router.get("/coach/routing")
+async def coach_routing_stats() -> Dict[str, Any]:
+    """Model-tier routing decisions and per-tier latency for /coach/chat."""
+    coach = await get_coach()
+    return coach._coach.router.stats.snapshot()
+
+
+@router.get("/coach/fastpath")
+async def coach_fastpath_stats() -> Dict[str, Any]:
+    """Hits per intent, misses and latency of the direct data-answer path."""
+    coach = await get_coach()
+    return coach._fastpath.stats.snapshot()
+
+
+@router.get("/coach/prefetch")
+async def coach_prefetch_stats() -> Dict[str, Any]:
+    """Context prefetch for supervisor turns: read tool calls avoided and estimated latency saved."""
+    coach = await get_coach()
+    return coach._prefetch.stats.snapshot()
+
+
+@router.get("/coach/summary")
+async def coach_summary_stats() -> Dict[str, Any]:
+    """Rolling conversation summary: background folds, failures and fold latency."""
+    coach = await get_coach()
+    return coach._summarizer.stats.snapshot()
+
+
+@router.get("/coach/checkpoint")
+async def coach_checkpoint_stats() -> Dict[str, Any]:
+    """Checkpointed chat threads: turns resumed vs rebuilt from the messages table (by reason)."""
+    coach = await get_coach()
+    cp = coach._coach.checkpointer
+    saver_stats = cp.saver.snapshot() if hasattr(cp.saver, "snapshot") else {}
+    return {"kind": cp.kind, "enabled": cp.enabled, **cp.stats.snapshot(), **saver_stats}
+
+
+@router.get("/coach/history-cache")
+async def coach_history_cache_stats() -> Dict[str, Any]:
+    """Hot chat history cache: hit rate, stale (version-mismatch) misses and memory footprint."""
+    coach = await get_coach()
+    return coach._history_cache.snapshot()
+
+
+@router.get("/coach/memory")
+async def coach_memory_stats() -> Dict[str, Any]:
+    """Long-term memory: messages indexed, retrievals, snippets injected and latencies."""
+    coach = await get_coach()
+    return coach._memory.stats.snapshot()
+
+
+@router.get("/coach/answer-cache", dependencies=[Depends(require_admin)])
+async def coach_answer_cache_stats() -> Dict[str, Any]:
+    """Semantic answer cache: eligibility, hit rate, rejections and estimated latency saved.
+
+    Admin-only: top_questions is user-written text.
+    """
+    coach = await get_coach()
+    return coach._answer_cache.snapshot()
+
+
+@router.get("/agents/tool-cache")
+async def tool_cache_stats() -> Dict[str, Any]:
+    """MCP goal/task read cache: process-wide counters plus per-tool outcomes seen by the tracer."""
+    coach = await get_coach()
+    return {"cache": GOALS_TOOL_CACHE.snapshot(), "tracer": coach._coach.tracer.cache_summary()}
+
+
+@router.get("/usage", dependencies=[Depends(require_admin)])
+async def llm_usage() -> Dict[str, Any]:
+    """LLM tokens, cost and time by route, agent and model, plus the heaviest users in the window."""
+    return USAGE_LEDGER.snapshot()
+
+
+@router.get("/usage/users/{user_id}", dependencies=[Depends(require_admin)])
+async def llm_usage_for_user(user_id: str, window_s: int | None = None) -> Dict[str, Any]:
+    """Rolling-window and lifetime LLM usage for one user (basis for future quotas)."""
+    totals = USAGE_LEDGER.user_totals(user_id, window_s=window_s)
+    if totals is None:
+        raise HTTPException(status_code=404, detail="No usage recorded for this user")
+    return totals
+
+
+@router.get("/traces", dependencies=[Depends(require_admin)])
+async def recent_traces(limit: int = 50) -> Dict[str, Any]:
+    """Most recent request traces (newest first) plus tracer buffer/export counters."""
+    return {"tracer": TRACE_STORE.snapshot(), "traces": TRACE_STORE.recent(limit)}
+
+
+@router.get("/traces/{trace_id}", dependencies=[Depends(require_admin)])
+async def trace_tree(trace_id: str) -> Dict[str, Any]:
+    """Span tree (chain/LLM/tool runs) of a recent request; trace_id is its X-Request-ID."""
+    trace = TRACE_STORE.get(trace_id)
+    if trace is None:
+        raise HTTPException(status_code=404, detail="Trace not found (not sampled or already evicted)")
+    return trace
+
+
+@router.get("/event-loop", dependencies=[Depends(require_admin)])
+async def event_loop_health(limit: int = 20) -> Dict[str, Any]:
+    """Event-loop lag percentiles, stall counts and the most recent blocking call sites.
+
+    Offender stacks are only captured with LOOP_MONITOR_DEBUG=1.
+    """
+    return {**LOOP_MONITOR.snapshot(), "offenders": LOOP_MONITOR.offenders(limit)}
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics() -> PlainTextResponse:
+    """Latency histograms, counts and in-flight gauges in Prometheus text format."""
+    return PlainTextResponse(render_metrics(), media_type=METRICS_CONTENT_TYPE)
+
+
+@router.get("/heap", dependencies=[Depends(require_admin)])
+async def heap_overview() -> Dict[str, Any]:
+    """RSS, tracemalloc state, gc generation counts and the sizes of in-process caches/buffers."""
+    return {
+        "rss_mb": round(rss / 1e6, 2) if (rss := rss_bytes()) is not None else None,
+        "gc_counts": gc.get_count(),
+        "tracemalloc": HEAP_PROFILER.status(),
+        "buffers": known_buffers(),
+    }
+
+
+@router.post("/heap/tracemalloc/start", dependencies=[Depends(require_admin)])
+async def heap_tracemalloc_start(nframes: int = HEAP_TRACEMALLOC_FRAMES) -> Dict[str, Any]:
+    """Start tracing allocations (adds CPU and memory overhead until stopped)."""
+    return HEAP_PROFILER.start(nframes)
+
+
+@router.post("/heap/tracemalloc/stop", dependencies=[Depends(require_admin)])
+async def heap_tracemalloc_stop() -> Dict[str, Any]:
+    return HEAP_PROFILER.stop()
+
+
+@router.post("/heap/snapshots", dependencies=[Depends(require_admin)])
+async def heap_take_snapshot(label: str = "") -> Dict[str, Any]:
+    """Take a tracemalloc snapshot (kept in memory; the oldest is dropped past HEAP_MAX_SNAPSHOTS)."""
+    try:
+        return await asyncio.to_thread(HEAP_PROFILER.take_snapshot, label)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+
+@router.get("/heap/diff", dependencies=[Depends(require_admin)])
+async def heap_diff(
+    a: Optional[int] = None, b: Optional[int] = None, group_by: str = "lineno", limit: int = 25
+) -> Dict[str, Any]:
+    """Allocation growth from snapshot a to b grouped by lineno/filename/traceback (default: last two)."""
+    try:
+        return await asyncio.to_thread(HEAP_PROFILER.diff, a, b, group_by=group_by, limit=limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except LookupError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+
+@router.get("/heap/objects", dependencies=[Depends(require_admin)])
+async def heap_object_growth(limit: int = 25) -> Dict[str, Any]:
+    """Live objects per type and the types that grew since the previous call (first call = baseline)."""
+    return await asyncio.to_thread(OBJECT_GROWTH.growth, limit)
+
+
+@router.get("/profile", dependencies=[Depends(require_admin)])
+async def cpu_profile(
+    seconds: float = 5.0,
+    interval_ms: float = PROFILE_DEFAULT_INTERVAL_MS,
+    format: str = "collapsed",
+    tasks: bool = False,
+    include_idle: bool = False,
+    limit: int = 25,
+):
+    """Sample every thread's stack for `seconds` (capped by PROFILE_MAX_SECONDS); one run at a time.
+
+    format=collapsed returns flamegraph input (thread/task prefixed; with tasks=1 the await
+    chains of suspended tasks follow under an "await" root); format=json returns the hottest
+    frames by self and total samples.
+    """
+    if format not in ("collapsed", "json"):
+        raise HTTPException(status_code=400, detail="format must be 'collapsed' or 'json'")
+    loop = asyncio.get_running_loop()
+    try:
+        result = await asyncio.to_thread(
+            STACK_SAMPLER.run,
+            seconds,
+            interval_ms=interval_ms,
+            loop=loop,
+            loop_thread_id=threading.get_ident(),
+            tasks=tasks,
+            include_idle=include_idle,
+        )
+    except ProfilerBusy as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    stacks, awaits = result.pop("stacks"), result.pop("awaits")
+    if format == "collapsed":
+        return PlainTextResponse(collapsed(stacks) + collapsed(awaits, prefix="await;"))
+    return {
+        **result,
+        "distinct_stacks": len(stacks),
+        "top": top_frames(stacks, limit),
+        "await_top": top_frames(awaits, limit) if tasks else None,
+    }
+
+
 class SQLDiagRequest(BaseModel):
     user_id: str
     sql: str
@@ -32,3 +255,4 @@ async def run_sql_via_agent(req: SQLDiagRequest) -> Dict[str, Any]:
     final = await coach.ainvoke_chat(user_id=req.user_id, message=message)
     content = final.content if isinstance(final.content, str) else str(final.content)
     return {"assistant": content}
+
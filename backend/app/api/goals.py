@@ -4,13 +4,18 @@ from datetime import datetime
 from uuid import uuid4
 import os
 import httpx
+from loguru import logger
 import json
 
 from app.models.schemas import Goal, GoalCreate, User, CreateGoalResponse, Task
 from app.dependencies.auth import get_current_user
+from app.dependencies.deadline import check_deadline, httpx_timeout, translate_timeouts
+from app.observability.metrics import observe_supabase
+from app.observability.timing import phase
 from app.agents.graph import get_coach
 from app.api.profile import get_my_profile
 from app.agents.client import FitnessCoach
+from app.tools.tool_cache import GOALS_TOOL_CACHE
 from langchain_core.messages import SystemMessage, AIMessage
 router = APIRouter()
 
@@ -30,26 +35,34 @@ def _sb_headers(user_token: str) -> dict:
         "Prefer": "return=representation",
     }
 
+async def _sb_request(method: str, url: str, *, headers: dict, json=None):
+    # Timeout is capped by the remaining request budget (see app.dependencies.deadline)
+    with translate_timeouts("supabase"), observe_supabase(method, url) as obs:
+        async with httpx.AsyncClient(timeout=httpx_timeout(10.0)) as client:
+            resp = await client.request(method, url, headers=headers, json=json)
+            obs.status = resp.status_code
+            return resp
+
 @router.get("", response_model=List[Goal])   # <- no trailing slash
 async def list_goals(user_obj = Depends(get_current_user), authorization: str | None = Header(default=None)):
     user = _user_from_supabase(user_obj)
     if not _SUPABASE_URL or not _SUPABASE_ANON_KEY:
         # Fallback to in-memory for local misconfig
         goals = _IN_MEMORY_GOALS.get(user.id, [])
-        print(f"[goals.list] (mem) uid={user.id} count={len(goals)}")
+        logger.debug("goals.list (mem) uid={} count={}", user.id, len(goals))
         return goals
     if not authorization or not authorization.lower().startswith("bearer "):
         raise HTTPException(status_code=401, detail="Missing bearer token")
     token = authorization.split(" ", 1)[1]
 
     url = f"{_SUPABASE_URL}/rest/v1/goals?select=*&user_id=eq.{user.id}&order=created_at.desc"
-    async with httpx.AsyncClient(timeout=10) as client:
-        resp = await client.get(url, headers=_sb_headers(token))
+    with phase("goals-read"):
+        resp = await _sb_request("GET", url, headers=_sb_headers(token))
     if resp.status_code != 200:
-        print(f"[goals.list] supabase error {resp.status_code}: {resp.text}")
+        logger.warning("goals.list supabase error {}: {}", resp.status_code, resp.text)
         raise HTTPException(status_code=resp.status_code, detail="Failed to fetch goals")
     data = resp.json()
-    print(f"[goals.list] uid={user.id} count={len(data)}")  # TEMP debug
+    logger.debug("goals.list uid={} count={}", user.id, len(data))
     # httpx/json returns list[dict], Pydantic will coerce to List[Goal]
     return data
 
@@ -79,8 +92,8 @@ async def create_goal(payload: GoalCreate, user_obj = Depends(get_current_user),
 
     # Supabase pre-check: only one active goal per type per user
     check_url = f"{_SUPABASE_URL}/rest/v1/goals?select=id&user_id=eq.{user.id}&type=eq.{payload.type}&status=eq.active&limit=1"
-    async with httpx.AsyncClient(timeout=10) as client:
-        pre = await client.get(check_url, headers=_sb_headers(token))
+    with phase("goal-check"):
+        pre = await _sb_request("GET", check_url, headers=_sb_headers(token))
     if pre.status_code == 200:
         try:
             existing = pre.json()
@@ -90,9 +103,9 @@ async def create_goal(payload: GoalCreate, user_obj = Depends(get_current_user),
             raise
         except Exception as e:
             # If parsing fails, continue to attempt creation; server-side RLS/constraints may still protect
-            print(f"[goals.create] precheck parse error: {e}")
+            logger.warning("goals.create precheck parse error: {}", e)
     else:
-        print(f"[goals.create] precheck error {pre.status_code}: {pre.text}")
+        logger.warning("goals.create precheck error {}: {}", pre.status_code, pre.text)
 
     body = {
         "user_id": user.id,
@@ -102,23 +115,26 @@ async def create_goal(payload: GoalCreate, user_obj = Depends(get_current_user),
         "status": "active",
     }
     url = f"{_SUPABASE_URL}/rest/v1/goals"
-    async with httpx.AsyncClient(timeout=10) as client:
-        resp = await client.post(url, headers=_sb_headers(token), json=body)
+    with phase("goal-insert"):
+        resp = await _sb_request("POST", url, headers=_sb_headers(token), json=body)
     if resp.status_code not in (200, 201):
-        print(f"[goals.create] supabase error {resp.status_code}: {resp.text}")
+        logger.warning("goals.create supabase error {}: {}", resp.status_code, resp.text)
         raise HTTPException(status_code=resp.status_code, detail="Failed to create goal")
     created = resp.json()
-    print(f"[goals.create] supabase created goal {created}")
+    logger.debug("goals.create supabase created goal {}", created)
     # Supabase returns a list when Prefer return=representation and single object
     if isinstance(created, list) and created:
         created = created[0]
+    # Cached get_goals/get_goal_tasks results for this user are now stale
+    GOALS_TOOL_CACHE.invalidate_user(user.id)
     # ok, so now we have "created", which is a goal object.
     # We will give it to the goal agent directly. 
     # The goal agent will not have to fetch from db again, we will directly pass the
     #    - User profile
     #    - created object (goal)
 
-    user_profile = await get_my_profile(user_obj, authorization)
+    with phase("profile"):
+        user_profile = await get_my_profile(user_obj, authorization)
     coach_service = await get_coach()
     # Access the underlying FitnessCoach instance prepared by CoachService
     coach_impl = coach_service._coach
@@ -127,6 +143,7 @@ async def create_goal(payload: GoalCreate, user_obj = Depends(get_current_user),
 
     # Prefer direct deterministic generation via domain sub-agents (use initialized coach_impl)
     parsed_items: list[dict] = []
+    missing_domains: list[str] = []
     try:
         direct = await coach_impl.generate_tasks_direct(
             user_profile=user_profile,
@@ -134,13 +151,16 @@ async def create_goal(payload: GoalCreate, user_obj = Depends(get_current_user),
             #existing_tasks_summary=existing_tasks_summary,
         )
         parsed_items = direct.get("items", []) if isinstance(direct, dict) else []
-        print(f"[goals.create] direct_merge items_count={len(parsed_items)}")
+        missing_domains = direct.get("missing_domains", []) if isinstance(direct, dict) else []
+        logger.debug("goals.create direct_merge items_count={} missing_domains={}", len(parsed_items), missing_domains)
     except Exception as e:
-        print(f"[goals.create] direct_generation_error: {e}")
+        logger.error("goals.create direct_generation_error: {}", e)
 
     # No fallback: direct deterministic domain generation only
-    print(f"[goals.create] items_count={len(parsed_items)}")
+    logger.info("goals.create items_count={}", len(parsed_items))
     if not parsed_items:
+        # Nothing generated because the request budget ran out -> 504 rather than 400
+        check_deadline("goal task generation")
         raise HTTPException(status_code=400, detail="Agent returned no tasks to create.")
 
     # Persist parsed tasks to Supabase (best-effort)
@@ -161,21 +181,27 @@ async def create_goal(payload: GoalCreate, user_obj = Depends(get_current_user),
                 })
             if tasks_rows:
                 tasks_url = f"{_SUPABASE_URL}/rest/v1/tasks"
-                async with httpx.AsyncClient(timeout=10) as client:
-                    t_resp = await client.post(tasks_url, headers=_sb_headers(token), json=tasks_rows)
+                with phase("tasks-insert"):
+                    t_resp = await _sb_request("POST", tasks_url, headers=_sb_headers(token), json=tasks_rows)
                 if t_resp.status_code not in (200, 201):
-                    print(f"[goals.create] tasks insert error {t_resp.status_code}: {t_resp.text}")
+                    logger.warning("goals.create tasks insert error {}: {}", t_resp.status_code, t_resp.text)
                 else:
                     try:
                         inserted = t_resp.json()
                         count = len(inserted) if isinstance(inserted, list) else 1
                     except Exception:
                         count = len(tasks_rows)
-                    print(f"[goals.create] inserted {count} tasks for goal={created.get('id')}")
+                    logger.info("goals.create inserted {} tasks for goal={}", count, created.get("id"))
+                    GOALS_TOOL_CACHE.invalidate_user(user.id)
         except Exception as e:
-            print(f"[goals.create] failed to persist tasks: {e}")
+            logger.error("goals.create failed to persist tasks: {}", e)
 
-    return {"goal": created, "agent_output": parsed_items}
+    return {
+        "goal": created,
+        "agent_output": parsed_items,
+        "partial": bool(missing_domains),
+        "missing_domains": missing_domains,
+    }
 
 @router.delete("/{goal_id}", status_code=204)
 async def delete_goal(goal_id: str, user_obj = Depends(get_current_user), authorization: str | None = Header(default=None)) -> None:
@@ -189,8 +215,10 @@ async def delete_goal(goal_id: str, user_obj = Depends(get_current_user), author
     token = authorization.split(" ", 1)[1]
 
     url = f"{_SUPABASE_URL}/rest/v1/goals?id=eq.{goal_id}"
-    async with httpx.AsyncClient(timeout=10) as client:
-        resp = await client.request("DELETE", url, headers=_sb_headers(token))
+    with phase("goal-delete"):
+        resp = await _sb_request("DELETE", url, headers=_sb_headers(token))
+    if resp.status_code in (200, 204):
+        GOALS_TOOL_CACHE.invalidate_user(_user_from_supabase(user_obj).id)
 
     if resp.status_code == 200:
         try:
@@ -223,9 +251,9 @@ async def list_goal_tasks(goal_id: str, user_obj = Depends(get_current_user), au
     token = authorization.split(" ", 1)[1]
 
     url = f"{_SUPABASE_URL}/rest/v1/tasks?select=*&goal_id=eq.{goal_id}&order=created_at.desc"
-    async with httpx.AsyncClient(timeout=10) as client:
-        resp = await client.get(url, headers=_sb_headers(token))
+    with phase("tasks-read"):
+        resp = await _sb_request("GET", url, headers=_sb_headers(token))
     if resp.status_code != 200:
-        print(f"[goals.tasks] supabase error {resp.status_code}: {resp.text}")
+        logger.warning("goals.tasks supabase error {}: {}", resp.status_code, resp.text)
         raise HTTPException(status_code=resp.status_code, detail="Failed to fetch tasks")
     return resp.json()
\ No newline at end of file
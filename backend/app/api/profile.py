@@ -1,11 +1,14 @@
 from fastapi import APIRouter, Depends, Header, HTTPException
 import os
 import httpx
+from loguru import logger
 from typing import Optional
 from fastapi.encoders import jsonable_encoder
 import asyncio
 
 from app.dependencies.auth import get_current_user
+from app.dependencies.deadline import httpx_timeout, remaining, translate_timeouts
+from app.observability.metrics import observe_supabase
 from app.models.schemas import Profile, ProfileUpsert
 
 router = APIRouter()
@@ -31,13 +34,18 @@ async def _sb_request_with_retry(method: str, url: str, *, headers: dict, json:
     last_exc: Exception | None = None
     for attempt in range(retries + 1):
         try:
-            async with httpx.AsyncClient(timeout=_HTTPX_TIMEOUT) as client:
-                resp = await client.request(method, url, headers=headers, json=json)
+            with translate_timeouts("supabase"), observe_supabase(method, url) as obs:
+                async with httpx.AsyncClient(timeout=httpx_timeout(_HTTPX_TIMEOUT)) as client:
+                    resp = await client.request(method, url, headers=headers, json=json)
+                obs.status = resp.status_code
             return resp
         except (httpx.ConnectTimeout, httpx.ReadTimeout, httpx.ConnectError) as e:
             last_exc = e
-            if attempt < retries:
-                await asyncio.sleep(0.5 * (2 ** attempt))
+            backoff = 0.5 * (2 ** attempt)
+            rem = remaining()
+            # Only retry if the request budget still covers the backoff
+            if attempt < retries and (rem is None or rem > backoff):
+                await asyncio.sleep(backoff)
             else:
                 raise
 
@@ -53,7 +61,7 @@ async def get_my_profile(user_obj = Depends(get_current_user), authorization: st
     url = f"{_SUPABASE_URL}/rest/v1/profiles?select=*&id=eq.{uid}"
     resp = await _sb_request_with_retry("GET", url, headers=_sb_headers(token))
     if resp.status_code != 200:
-        print(f"[profile.me] supabase error {resp.status_code}: {resp.text}")
+        logger.warning("profile.me supabase error {}: {}", resp.status_code, resp.text)
         raise HTTPException(status_code=resp.status_code, detail="Failed to fetch profile")
     data = resp.json()
     if isinstance(data, list) and data:
@@ -75,7 +83,7 @@ async def upsert_profile(payload: ProfileUpsert, user_obj = Depends(get_current_
     get_url = f"{_SUPABASE_URL}/rest/v1/profiles?select=id&id=eq.{uid}"
     get_resp = await _sb_request_with_retry("GET", get_url, headers=_sb_headers(token))
     if get_resp.status_code != 200:
-        print(f"[profile.upsert] precheck error {get_resp.status_code}: {get_resp.text}")
+        logger.warning("profile.upsert precheck error {}: {}", get_resp.status_code, get_resp.text)
         raise HTTPException(status_code=get_resp.status_code, detail="Failed to fetch profile")
     exists = False
     try:
@@ -87,10 +95,12 @@ async def upsert_profile(payload: ProfileUpsert, user_obj = Depends(get_current_
     if exists:
         # Update existing row
         patch_url = f"{_SUPABASE_URL}/rest/v1/profiles?id=eq.{uid}"
-        async with httpx.AsyncClient(timeout=10) as client:
-            patch_resp = await client.patch(patch_url, headers=_sb_headers(token), json=jsonable_encoder(payload.dict(exclude_unset=True)))
+        with observe_supabase("PATCH", patch_url) as obs:
+            async with httpx.AsyncClient(timeout=httpx_timeout(10.0)) as client:
+                patch_resp = await client.patch(patch_url, headers=_sb_headers(token), json=jsonable_encoder(payload.dict(exclude_unset=True)))
+            obs.status = patch_resp.status_code
         if patch_resp.status_code not in (200, 204):
-            print(f"[profile.upsert] patch error {patch_resp.status_code}: {patch_resp.text}")
+            logger.warning("profile.upsert patch error {}: {}", patch_resp.status_code, patch_resp.text)
             raise HTTPException(status_code=patch_resp.status_code, detail="Failed to update profile")
         # fetch updated
         final = await _sb_request_with_retry("GET", f"{_SUPABASE_URL}/rest/v1/profiles?select=*&id=eq.{uid}", headers=_sb_headers(token))
@@ -102,10 +112,12 @@ async def upsert_profile(payload: ProfileUpsert, user_obj = Depends(get_current_
         # Insert new row with id
         insert_payload = {"id": uid, **payload.dict(exclude_unset=True)}
         post_url = f"{_SUPABASE_URL}/rest/v1/profiles"
-        async with httpx.AsyncClient(timeout=10) as client:
-            post_resp = await client.post(post_url, headers=_sb_headers(token), json=jsonable_encoder(insert_payload))
+        with observe_supabase("POST", post_url) as obs:
+            async with httpx.AsyncClient(timeout=httpx_timeout(10.0)) as client:
+                post_resp = await client.post(post_url, headers=_sb_headers(token), json=jsonable_encoder(insert_payload))
+            obs.status = post_resp.status_code
         if post_resp.status_code not in (200, 201):
-            print(f"[profile.upsert] insert error {post_resp.status_code}: {post_resp.text}")
+            logger.warning("profile.upsert insert error {}: {}", post_resp.status_code, post_resp.text)
             raise HTTPException(status_code=post_resp.status_code, detail="Failed to create profile")
         data = post_resp.json()
         if isinstance(data, list) and data:
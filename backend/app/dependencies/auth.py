@@ -1,8 +1,14 @@
+import hmac
 import os
 from typing import Dict, Any
 from fastapi import Header, HTTPException, status
 import httpx
 
+from app.agents.utils.accounting import attribute_user
+from app.dependencies.deadline import httpx_timeout, translate_timeouts
+from app.observability.metrics import observe_supabase
+from app.observability.timing import phase
+
 SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_ANON_KEY = os.getenv("SUPABASE_ANON_KEY")
 
@@ -10,6 +16,9 @@ if not SUPABASE_URL:
     # Allow import in tooling; actual runtime should have env present
     SUPABASE_URL = ""
 
+# Shared secret for admin-only diagnostics (X-Admin-Token); unset disables those endpoints
+DIAGNOSTICS_ADMIN_TOKEN = os.getenv("DIAGNOSTICS_ADMIN_TOKEN", "")
+
 async def get_current_user(authorization: str | None = Header(default=None)) -> Dict[str, Any]:
     if not authorization or not authorization.lower().startswith("bearer "):
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Missing bearer token")
@@ -22,8 +31,22 @@ async def get_current_user(authorization: str | None = Header(default=None)) ->
         "Authorization": f"Bearer {token}",
         "apikey": SUPABASE_ANON_KEY,
     }
-    async with httpx.AsyncClient(timeout=10) as client:
-        resp = await client.get(url, headers=headers)
+    with phase("auth"), translate_timeouts("supabase auth"), observe_supabase("GET", url) as obs:
+        async with httpx.AsyncClient(timeout=httpx_timeout(10.0)) as client:
+            resp = await client.get(url, headers=headers)
+        obs.status = resp.status_code
     if resp.status_code != 200:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid or expired token")
-    return resp.json()  # returns Supabase user object
+    user = resp.json()  # Supabase user object
+    # LLM usage of this request counts towards the user's rolling totals
+    attribute_user(user.get("id"))
+    return user
+
+
+async def require_admin(x_admin_token: str | None = Header(default=None)) -> None:
+    """Gate for admin-only diagnostics: X-Admin-Token must match DIAGNOSTICS_ADMIN_TOKEN."""
+    if not DIAGNOSTICS_ADMIN_TOKEN:
+        # Not configured: behave as if the endpoint did not exist
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    if not x_admin_token or not hmac.compare_digest(x_admin_token, DIAGNOSTICS_ADMIN_TOKEN):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin token required")
@@ -1,10 +1,18 @@
 from __future__ import annotations
 
+from datetime import datetime, timedelta, timezone
 from typing import Any, Dict, List, Optional
 
 import os
 from supabase import create_client
 import httpx
+from loguru import logger
+
+from app.agents.tokens import window_rows, with_token_count
+from app.agents.trajectory import compact_tool_rows, sanitize_tool_pairs
+from app.dependencies.deadline import httpx_timeout, translate_timeouts
+from app.observability.metrics import observe_supabase
+from app.observability.timing import timed_phase
 
 _SUPABASE_URL = os.getenv("SUPABASE_URL", "")
 _SUPABASE_ANON_KEY = os.getenv("SUPABASE_ANON_KEY", "")
@@ -18,9 +26,15 @@ def _sb_headers(user_token: str) -> dict:
     }
 
 _HTTPX_TIMEOUT = httpx.Timeout(connect=10.0, read=20.0, write=10.0, pool=20.0)
+# Cleared once if conversations.version is missing (schema not migrated)
+_VERSION_COLUMN = True
 def _sb_request(method: str, url: str, *, headers: dict, json: dict | None = None):
-    with httpx.Client(timeout=_HTTPX_TIMEOUT) as client:
-        return client.request(method, url, headers=headers, json=json)
+    # Runs in a worker thread (asyncio.to_thread); the "sync" in-flight gauge is thread pool usage
+    with translate_timeouts("supabase"), observe_supabase(method, url, client="sync") as obs:
+        with httpx.Client(timeout=httpx_timeout(_HTTPX_TIMEOUT)) as client:
+            resp = client.request(method, url, headers=headers, json=json)
+            obs.status = resp.status_code
+            return resp
 
 from langchain_core.messages import (
     AIMessage,
@@ -51,12 +65,19 @@ def _to_lc_message(role: str, content: Dict[str, Any]) -> BaseMessage:
     if role == "user":
         return HumanMessage(content=text or content)
     if role == "assistant":
+        tool_calls = content.get("tool_calls") if isinstance(content, dict) else None
+        if tool_calls:
+            return AIMessage(
+                content=text,
+                tool_calls=[{"id": c.get("id"), "name": c.get("name"), "args": c.get("args") or {}, "type": "tool_call"} for c in tool_calls],
+            )
         return AIMessage(content=text or content)
     if role == "system":
         return SystemMessage(content=text or content)
     if role == "tool":
         tool_call_id = content.get("tool_call_id") if isinstance(content, dict) else None
-        return ToolMessage(content=text or content, tool_call_id=tool_call_id)
+        name = content.get("name") if isinstance(content, dict) else None
+        return ToolMessage(content=text or content, tool_call_id=tool_call_id, name=name)
     # Fallback to human
     return HumanMessage(content=text or content)
 
@@ -78,6 +99,15 @@ def _from_lc_message(msg: BaseMessage) -> Dict[str, Any]:
     else:
         # Structured content: store as-is
         content = msg.content  # type: ignore[assignment]
+    if isinstance(msg, AIMessage) and msg.id and isinstance(content, dict):
+        # Lets a graph checkpoint confirm it is in sync with the table (app/agents/checkpoint.py)
+        content["lc_id"] = msg.id
+    if isinstance(msg, AIMessage) and msg.tool_calls and isinstance(content, dict):
+        # Compact tool calls (see app/agents/trajectory.py)
+        content["tool_calls"] = [{"id": c.get("id"), "name": c.get("name"), "args": c.get("args") or {}} for c in msg.tool_calls]
+    if isinstance(msg, ToolMessage) and isinstance(content, dict):
+        content["tool_call_id"] = msg.tool_call_id
+        content["name"] = msg.name
     return {"role": role, "content": content}
 
 
@@ -85,13 +115,23 @@ class ChatStore:
     """DB-backed transcript store for conversations/messages.
 
     Expected schema:
-      conversations(id uuid pk, user_id uuid, goal_id uuid null, created_at timestamptz)
+      conversations(id uuid pk, user_id uuid, goal_id uuid null, created_at timestamptz,
+                    summary text null, summary_through timestamptz null, summary_updated_at timestamptz null,
+                    version bigint)
       messages(id uuid pk, conversation_id uuid fk, role text, content jsonb, created_at timestamptz)
+
+    Text content is stored as {"text": ..., "tokens": n}; the token count is computed once
+    on insert so history windows never re-tokenize. Assistant tool calls add
+    "tool_calls": [{id, name, args}] and tool results add "tool_call_id"/"name".
+
+    Reads and writes are timed as the conv/history/persist Server-Timing phases.
     """
 
     def __init__(self, user_token: Optional[str] = None) -> None:
         # If a user token is provided, prefer REST with RLS
         self._user_token = user_token
+        # conversations.version seen by get_or_create_conversation (None if the column is missing)
+        self._versions: Dict[str, Optional[int]] = {}
         if user_token:
             # REST mode: RLS enforced by Supabase using JWT
             self._use_rest = True
@@ -105,21 +145,27 @@ class ChatStore:
         """Return a builder with select/insert support. Use .table(...) for compatibility."""
         return self._supa.table(table)
 
+    @timed_phase("conv")
     def get_or_create_conversation(self, user_id: str, goal_id: Optional[str] = None) -> str:
         """Return an existing conversation id for (user_id, goal_id) or create one."""
         if self._use_rest:
             if not _SUPABASE_URL or not _SUPABASE_ANON_KEY:
                 raise RuntimeError("Supabase not configured")
             # Try to find existing
-            base = f"{_SUPABASE_URL}/rest/v1/conversations?select=id&user_id=eq.{user_id}"
-            if goal_id is None:
-                url = base + "&goal_id=is.null&order=created_at.desc&limit=1"
-            else:
-                url = base + f"&goal_id=eq.{goal_id}&order=created_at.desc&limit=1"
-            resp = _sb_request("GET", url, headers=_sb_headers(self._user_token))
+            global _VERSION_COLUMN
+            filters = f"&user_id=eq.{user_id}" + ("&goal_id=is.null" if goal_id is None else f"&goal_id=eq.{goal_id}")
+            filters += "&order=created_at.desc&limit=1"
+            select = "id,version" if _VERSION_COLUMN else "id"
+            resp = _sb_request("GET", f"{_SUPABASE_URL}/rest/v1/conversations?select={select}{filters}", headers=_sb_headers(self._user_token))
+            if resp.status_code == 400 and _VERSION_COLUMN:
+                # conversations.version not migrated yet: no history caching, plain lookup
+                logger.warning("conversations.version unavailable: {}", resp.text[:200])
+                _VERSION_COLUMN = False
+                resp = _sb_request("GET", f"{_SUPABASE_URL}/rest/v1/conversations?select=id{filters}", headers=_sb_headers(self._user_token))
             if resp.status_code == 200:
                 data = resp.json() or []
                 if isinstance(data, list) and data:
+                    self._versions[data[0]["id"]] = data[0].get("version")
                     return data[0]["id"]
             # Create new
             payload = {"user_id": user_id, "goal_id": goal_id}
@@ -129,9 +175,10 @@ class ChatStore:
                 raise RuntimeError(f"Failed to create conversation: {resp2.status_code} {resp2.text}")
             data2 = resp2.json() or []
             if isinstance(data2, list) and data2:
-                return data2[0]["id"]
-            if isinstance(data2, dict):
-                return data2.get("id")
+                data2 = data2[0]
+            if isinstance(data2, dict) and data2.get("id"):
+                self._versions[data2["id"]] = data2.get("version")
+                return data2["id"]
             raise RuntimeError("Conversation create response unexpected")
         # fallback client path
         q = (
@@ -165,6 +212,13 @@ class ChatStore:
             return ins_data[0]["id"]
         return ins_data["id"]
 
+    @timed_phase("conv")
+    def conversation_version(self, conversation_id: str) -> Optional[int]:
+        """conversations.version as read by get_or_create_conversation (bumped by a trigger on
+        every message insert and summary update); None when unknown."""
+        return self._versions.get(conversation_id)
+
+    @timed_phase("conv")
     def find_conversation(self, user_id: str, goal_id: Optional[str] = None) -> Optional[str]:
         """Return conversation id for (user_id, goal_id) if it exists; else None.
         Does not create new rows.
@@ -201,6 +255,7 @@ class ChatStore:
             return data.get("id")
         return None
 
+    @timed_phase("history")
     def fetch_recent_messages(self, conversation_id: str, limit_n: int = 30) -> List[Dict[str, Any]]:
         """Return latest N messages for a conversation in chronological order."""
         if self._use_rest:
@@ -228,32 +283,76 @@ class ChatStore:
         rows.reverse()  # chronological
         return rows
 
-    def fetch_messages_asc(self, conversation_id: str, limit_n: int = 200) -> List[Dict[str, Any]]:
-        """Return messages oldest→newest for display."""
+    @timed_phase("history")
+    def get_summary(self, conversation_id: str) -> Dict[str, Any]:
+        """Return {"summary", "summary_through"} from the conversations row ({} if unavailable).
+
+        Missing summary columns (schema not migrated yet) are treated as "no summary".
+        """
         if self._use_rest:
             if not _SUPABASE_URL or not _SUPABASE_ANON_KEY:
                 raise RuntimeError("Supabase not configured")
-            url = (
-                f"{_SUPABASE_URL}/rest/v1/messages?select=*&conversation_id=eq.{conversation_id}"
-                f"&order=created_at.asc&limit={limit_n}"
-            )
+            url = f"{_SUPABASE_URL}/rest/v1/conversations?select=summary,summary_through&id=eq.{conversation_id}&limit=1"
+            resp = _sb_request("GET", url, headers=_sb_headers(self._user_token))
+            if resp.status_code != 200:
+                logger.warning("summary unavailable: {} {}", resp.status_code, resp.text[:200])
+                return {}
+            data = resp.json() or []
+            return data[0] if isinstance(data, list) and data else {}
+        try:
+            res = self._from_table("conversations").select("summary,summary_through").eq("id", conversation_id).limit(1).execute()
+        except Exception as e:
+            logger.warning("summary unavailable: {}", e)
+            return {}
+        data = res.data or []
+        return data[0] if isinstance(data, list) and data else {}
+
+    @timed_phase("summary")
+    def update_summary(self, conversation_id: str, summary: str, summary_through: str) -> None:
+        """Persist the running summary and the created_at of the last message folded into it."""
+        payload = {
+            "summary": summary,
+            "summary_through": summary_through,
+            "summary_updated_at": datetime.now(timezone.utc).isoformat(),
+        }
+        if self._use_rest:
+            if not _SUPABASE_URL or not _SUPABASE_ANON_KEY:
+                raise RuntimeError("Supabase not configured")
+            url = f"{_SUPABASE_URL}/rest/v1/conversations?id=eq.{conversation_id}"
+            resp = _sb_request("PATCH", url, headers=_sb_headers(self._user_token), json=payload)
+            if resp.status_code not in (200, 204):
+                raise RuntimeError(f"Failed to update summary: {resp.status_code} {resp.text}")
+            return
+        self._from_table("conversations").update(payload).eq("id", conversation_id).execute()
+
+    @timed_phase("history")
+    def fetch_messages_asc(self, conversation_id: str, limit_n: int = 200, *, chat_only: bool = False) -> List[Dict[str, Any]]:
+        """Return messages oldest→newest for display.
+
+        chat_only keeps user/assistant rows with text and no tool calls (filtered by
+        PostgREST, so `limit_n` counts displayed messages, not tool traffic).
+        """
+        if self._use_rest:
+            if not _SUPABASE_URL or not _SUPABASE_ANON_KEY:
+                raise RuntimeError("Supabase not configured")
+            url = f"{_SUPABASE_URL}/rest/v1/messages?select=*&conversation_id=eq.{conversation_id}"
+            if chat_only:
+                url += "&role=in.(user,assistant)&content->tool_calls=is.null&content->>text=neq."
+            url += f"&order=created_at.asc&limit={limit_n}"
             resp = _sb_request("GET", url, headers=_sb_headers(self._user_token))
             if resp.status_code != 200:
                 raise RuntimeError(f"Failed to fetch messages: {resp.status_code} {resp.text}")
             return resp.json() or []
-        resp = (
-            self._from_table("messages")
-            .select("*")
-            .eq("conversation_id", conversation_id)
-            .order("created_at", desc=False)
-            .limit(limit_n)
-            .execute()
-        )
+        q = self._from_table("messages").select("*").eq("conversation_id", conversation_id)
+        if chat_only:
+            q = q.in_("role", ["user", "assistant"]).filter("content->tool_calls", "is", "null").neq("content->>text", "")
+        resp = q.order("created_at", desc=False).limit(limit_n).execute()
         rows = resp.data or []
         return rows
 
+    @timed_phase("persist")
     def insert_message(self, conversation_id: str, role: str, content: Dict[str, Any]) -> Dict[str, Any]:
-        payload = {"conversation_id": conversation_id, "role": role, "content": content}
+        payload = {"conversation_id": conversation_id, "role": role, "content": with_token_count(content)}
         if self._use_rest:
             if not _SUPABASE_URL or not _SUPABASE_ANON_KEY:
                 raise RuntimeError("Supabase not configured")
@@ -275,14 +374,59 @@ class ChatStore:
             return data
         return {}
 
+    @timed_phase("persist")
     def insert_lc_message(self, conversation_id: str, msg: BaseMessage) -> Dict[str, Any]:
         mapped = _from_lc_message(msg)
         return self.insert_message(conversation_id, mapped["role"], mapped["content"])
 
-    def to_lc_messages(self, rows: List[Dict[str, Any]]) -> List[BaseMessage]:
+    @timed_phase("persist")
+    def insert_lc_messages(self, conversation_id: str, msgs: List[BaseMessage], *, after: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Insert several messages in one request, keeping their order.
+
+        Rows of one insert would share now(), so created_at is set explicitly: microseconds
+        apart, starting after `after` (the created_at of the turn's user row) or now.
+        """
+        if not msgs:
+            return []
+        if len(msgs) == 1:
+            return [self.insert_lc_message(conversation_id, msgs[0])]
+        base = datetime.now(timezone.utc)
+        if after:
+            try:
+                prev = datetime.fromisoformat(str(after).replace("Z", "+00:00"))
+                if prev.tzinfo is None:
+                    prev = prev.replace(tzinfo=timezone.utc)
+                base = max(base, prev + timedelta(milliseconds=1))
+            except ValueError:
+                pass
+        payload = []
+        for i, m in enumerate(msgs):
+            mapped = _from_lc_message(m)
+            payload.append({
+                "conversation_id": conversation_id,
+                "role": mapped["role"],
+                "content": with_token_count(mapped["content"]),
+                "created_at": (base + timedelta(microseconds=i)).isoformat(),
+            })
+        if self._use_rest:
+            if not _SUPABASE_URL or not _SUPABASE_ANON_KEY:
+                raise RuntimeError("Supabase not configured")
+            url = f"{_SUPABASE_URL}/rest/v1/messages"
+            resp = _sb_request("POST", url, headers=_sb_headers(self._user_token), json=payload)
+            if resp.status_code not in (200, 201):
+                raise RuntimeError(f"Failed to insert messages: {resp.status_code} {resp.text}")
+            data = resp.json() or []
+            return data if isinstance(data, list) else [data]
+        resp = self._from_table("messages").insert(payload).execute()
+        data = resp.data or []
+        return data if isinstance(data, list) else [data]
+
+    def to_lc_messages(self, rows: List[Dict[str, Any]], token_budget: Optional[int] = None) -> List[BaseMessage]:
+        """Convert rows to LC messages, keeping only the newest rows that fit `token_budget`."""
         out: List[BaseMessage] = []
-        for r in rows:
+        # Tool results are capped/elided before windowing; pairs cut by the window are repaired
+        for r in window_rows(compact_tool_rows(rows), token_budget):
             role = r.get("role")
             content = r.get("content", {})
             out.append(_to_lc_message(role, content))
-        return out
\ No newline at end of file
+        return sanitize_tool_pairs(out)
\ No newline at end of file
@@ -0,0 +1,160 @@
+import asyncio
+import os
+import time
+from contextlib import contextmanager
+from typing import Awaitable, Iterator, Mapping, Optional, TypeVar
+
+import httpx
+from langchain_core.callbacks import BaseCallbackHandler
+
+from app.agents.context import CURRENT_DEADLINE
+
+T = TypeVar("T")
+
+# Clients may shorten (or, up to the cap, extend) the route default with this header, in seconds.
+DEADLINE_HEADER = "X-Request-Timeout"
+
+DEFAULT_REQUEST_DEADLINE_S = float(os.getenv("REQUEST_DEADLINE_S", "20"))
+MAX_REQUEST_DEADLINE_S = float(os.getenv("REQUEST_DEADLINE_MAX_S", "300"))
+
+# (method or "*", path, seconds). First match wins; unlisted routes use the default.
+ROUTE_DEADLINES_S: list[tuple[str, str, float]] = [
+    ("POST", "/goals", float(os.getenv("REQUEST_DEADLINE_GOALS_CREATE_S", "120"))),
+    ("POST", "/coach/chat", float(os.getenv("REQUEST_DEADLINE_COACH_CHAT_S", "90"))),
+]
+
+
+class DeadlineExceeded(TimeoutError):
+    """The per-request budget ran out before (or while) doing downstream work."""
+
+
+def resolve_request_deadline(method: str, path: str, headers: Mapping[str, str]) -> float:
+    """Return the budget in seconds for a request: header if valid, else the route default."""
+    raw = headers.get(DEADLINE_HEADER) or headers.get(DEADLINE_HEADER.lower())
+    if raw:
+        try:
+            val = float(raw)
+            if val > 0:
+                return min(val, MAX_REQUEST_DEADLINE_S)
+        except ValueError:
+            pass
+    for m, route, seconds in ROUTE_DEADLINES_S:
+        if (m == "*" or m == method.upper()) and path.rstrip("/") == route:
+            return seconds
+    return DEFAULT_REQUEST_DEADLINE_S
+
+
+@contextmanager
+def deadline_scope(seconds: Optional[float]) -> Iterator[None]:
+    """Set CURRENT_DEADLINE for the enclosed block; an outer, earlier deadline always wins."""
+    if seconds is None:
+        yield
+        return
+    new_deadline = time.monotonic() + seconds
+    outer = CURRENT_DEADLINE.get()
+    if outer is not None:
+        new_deadline = min(outer, new_deadline)
+    token = CURRENT_DEADLINE.set(new_deadline)
+    try:
+        yield
+    finally:
+        CURRENT_DEADLINE.reset(token)
+
+
+@contextmanager
+def detached_deadline_scope(seconds: Optional[float]) -> Iterator[None]:
+    """Replace the inherited deadline with a fresh one (None = no deadline).
+
+    For background tasks that outlive the request they were started from: asyncio copies
+    the request's context, CURRENT_DEADLINE included, into the task.
+    """
+    token = CURRENT_DEADLINE.set(time.monotonic() + seconds if seconds is not None else None)
+    try:
+        yield
+    finally:
+        CURRENT_DEADLINE.reset(token)
+
+
+def remaining() -> Optional[float]:
+    """Seconds left in the current request budget, or None when no deadline is set."""
+    deadline = CURRENT_DEADLINE.get()
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+
+def check_deadline(what: str = "request") -> None:
+    rem = remaining()
+    if rem is not None and rem <= 0:
+        raise DeadlineExceeded(f"deadline_exceeded: no budget left for {what}")
+
+
+def budget(default: float, what: str = "request") -> float:
+    """Timeout for a downstream call: min(default, remaining budget). Fails fast when exhausted."""
+    check_deadline(what)
+    rem = remaining()
+    return default if rem is None else min(default, rem)
+
+
+def httpx_timeout(default: httpx.Timeout | float, what: str = "supabase") -> httpx.Timeout:
+    """Cap each phase of an httpx timeout by the remaining budget."""
+    base = default if isinstance(default, httpx.Timeout) else httpx.Timeout(default)
+    check_deadline(what)
+    rem = remaining()
+    if rem is None:
+        return base
+
+    def _cap(v: Optional[float]) -> float:
+        return rem if v is None else min(v, rem)
+
+    return httpx.Timeout(connect=_cap(base.connect), read=_cap(base.read), write=_cap(base.write), pool=_cap(base.pool))
+
+
+@contextmanager
+def translate_timeouts(what: str = "supabase") -> Iterator[None]:
+    """Re-raise httpx timeouts as DeadlineExceeded when they were caused by the request budget."""
+    try:
+        yield
+    except httpx.TimeoutException as e:
+        rem = remaining()
+        if rem is not None and rem <= 0.05:
+            raise DeadlineExceeded(f"deadline_exceeded: {what} timed out with the request budget") from e
+        raise
+
+
+async def with_deadline(aw: Awaitable[T], what: str = "call") -> T:
+    """Await `aw` bounded by the remaining budget (unbounded when no deadline is set)."""
+    rem = remaining()
+    if rem is None:
+        return await aw
+    if rem <= 0:
+        # Don't start work the client has already abandoned
+        if asyncio.iscoroutine(aw):
+            aw.close()
+        raise DeadlineExceeded(f"deadline_exceeded: no budget left for {what}")
+    try:
+        return await asyncio.wait_for(aw, timeout=rem)
+    except asyncio.TimeoutError as e:
+        if isinstance(e, DeadlineExceeded):
+            raise
+        raise DeadlineExceeded(f"deadline_exceeded: {what} ran past the request budget") from e
+
+
+class DeadlineCallbackHandler(BaseCallbackHandler):
+    """Abort LLM and tool steps inside a graph once the request budget is spent.
+
+    Attach at the top-level ainvoke; child runs inherit it. Raises instead of
+    logging so no further model/tool calls are started.
+    """
+
+    raise_error = True
+    run_inline = True
+
+    def on_llm_start(self, serialized, prompts, **kwargs):
+        check_deadline("llm call")
+
+    def on_chat_model_start(self, serialized, messages, **kwargs):
+        check_deadline("llm call")
+
+    def on_tool_start(self, serialized, input_str, **kwargs):
+        check_deadline("tool call")
@@ -0,0 +1,43 @@
+import os
+from typing import Any, Dict, List
+
+import httpx
+
+from app.dependencies.deadline import httpx_timeout, translate_timeouts
+from app.observability.metrics import observe_supabase
+
+_SUPABASE_URL = os.getenv("SUPABASE_URL", "")
+_SUPABASE_ANON_KEY = os.getenv("SUPABASE_ANON_KEY", "")
+
+_HTTPX_TIMEOUT = httpx.Timeout(connect=5.0, read=10.0, write=5.0, pool=10.0)
+
+
+def _sb_headers(user_token: str) -> dict:
+    return {
+        "Authorization": f"Bearer {user_token}",
+        "apikey": _SUPABASE_ANON_KEY,
+        "Content-Type": "application/json",
+    }
+
+
+def supabase_configured() -> bool:
+    return bool(_SUPABASE_URL and _SUPABASE_ANON_KEY)
+
+
+async def sb_select(table: str, query: str, *, user_token: str) -> List[Dict[str, Any]]:
+    """Async PostgREST read with the user's JWT (RLS enforced).
+
+    `query` is the raw query string, e.g. "select=*&order=created_at.desc".
+    Raises RuntimeError on non-2xx responses.
+    """
+    if not supabase_configured():
+        raise RuntimeError("Supabase not configured")
+    url = f"{_SUPABASE_URL}/rest/v1/{table}?{query}"
+    with translate_timeouts(f"supabase:{table}"), observe_supabase("GET", url) as obs:
+        async with httpx.AsyncClient(timeout=httpx_timeout(_HTTPX_TIMEOUT)) as client:
+            resp = await client.get(url, headers=_sb_headers(user_token))
+        obs.status = resp.status_code
+    if resp.status_code not in (200, 206):
+        raise RuntimeError(f"rest_error:{table}:{resp.status_code}: {resp.text[:200]}")
+    data = resp.json()
+    return data if isinstance(data, list) else []
@@ -5,26 +5,53 @@ from dotenv import load_dotenv
 from pydantic import BaseModel
 from typing import Optional, Dict, Any
 import asyncio
-from app.agents.graph import get_coach
-import logging
+import time
+from app.agents.graph import get_coach, shutdown_coach
 from fastapi import Request
 from fastapi.exceptions import HTTPException
 from fastapi.responses import JSONResponse
 from starlette.requests import Request as StarletteRequest
+from starlette.routing import Match
 # NEW: additional imports for auth + headers
 from fastapi import Depends, Header
 import httpx
+from loguru import logger
 from app.dependencies.auth import get_current_user
+from app.agents.utils.accounting import (
+    REQUEST_ID_HEADER,
+    REQUEST_ID_RE,
+    USAGE_HEADER,
+    RequestUsage,
+    current_usage,
+    usage_scope,
+)
+from app.agents.utils.tracing import TRACE_STORE
+from app.observability.log import configure_logging
+from app.observability.loop_monitor import LOOP_MONITOR, LOOP_MONITOR_ENABLED
+from app.observability.metrics import CHATS_IN_FLIGHT, HTTP_LATENCY, observe_supabase
+from app.observability.timing import SERVER_TIMING_HEADER, phase, timing_scope
+from app.dependencies.deadline import (
+    DeadlineExceeded,
+    deadline_scope,
+    httpx_timeout,
+    resolve_request_deadline,
+    translate_timeouts,
+)
 
 load_dotenv()
+# Queue-backed loguru handler with per-module levels (LOG_LEVEL / LOG_LEVELS)
+configure_logging()
 
 from app.api.goals import router as goals_router
 from app.api.schedule import router as schedule_router
 from app.api.profile import router as profile_router
 from app.api.diagnostics import router as diagnostics_router
 from app.dependencies.chat_store import ChatStore
+from app.agents.tokens import content_text
 
 APP_ENV = os.getenv("APP_ENV", "local")
+# Include the LLM usage breakdown in /coach/chat responses (also per request via X-Debug-Usage: 1)
+DEBUG_USAGE = os.getenv("COACH_DEBUG_USAGE", "0").strip().lower() in ("1", "true", "yes", "on")
 
 app = FastAPI(title="FitnessAgent API", version="0.1.0")
 
@@ -45,24 +72,79 @@ app.add_middleware(
     allow_headers=["*"]
 )
 
-logger = logging.getLogger("uvicorn.error")
+def _route_path(request: StarletteRequest) -> Optional[str]:
+    # Aggregate by route pattern (/goals/{goal_id}), not raw path, to keep cardinality low
+    for route in app.router.routes:
+        match, _ = route.matches(request.scope)
+        if match == Match.FULL:
+            return getattr(route, "path", None)
+    return None
+
+def _route_template(request: StarletteRequest) -> str:
+    return f"{request.method} {_route_path(request) or request.url.path}"
 
 @app.middleware("http")
 async def log_requests(request: StarletteRequest, call_next):
-    logger.info(f"--> {request.method} {request.url.path}")
+    logger.debug("--> {} {}", request.method, request.url.path)
+    t0 = time.perf_counter()
+    status = 500
     try:
         response = await call_next(request)
-        logger.info(f"<-- {response.status_code} {request.method} {request.url.path}")
+        status = response.status_code
+        logger.info("<-- {} {} {} {:.1f}ms", status, request.method, request.url.path, (time.perf_counter() - t0) * 1000)
         return response
     except Exception:
-        logger.exception(f"!! {request.method} {request.url.path} crashed")
+        logger.exception("!! {} {} crashed", request.method, request.url.path)
         raise
+    finally:
+        # Unmatched paths (scanners, typos) share one series
+        HTTP_LATENCY.labels(request.method, _route_path(request) or "unmatched", status).observe(time.perf_counter() - t0)
+
+@app.middleware("http")
+async def request_deadline(request: StarletteRequest, call_next):
+    # Per-request budget (header or route default) read by every downstream call
+    seconds = resolve_request_deadline(request.method, request.url.path, request.headers)
+    with deadline_scope(seconds):
+        return await call_next(request)
+
+@app.middleware("http")
+async def request_accounting(request: StarletteRequest, call_next):
+    # LLM tokens/cost/time of this request, attributed by the AccountingCallbackHandler
+    # A client X-Request-ID is kept for correlation only when well formed and not already in
+    # use as a trace key; otherwise the request gets a fresh id (returned in the header)
+    client_id = request.headers.get(REQUEST_ID_HEADER)
+    if client_id and not (REQUEST_ID_RE.fullmatch(client_id) and TRACE_STORE.claim(client_id)):
+        client_id = None
+    usage = RequestUsage(request_id=client_id, route=_route_template(request))
+    with usage_scope(usage):
+        response = await call_next(request)
+    # The request's trace (keyed by the same id) is complete; export it off the event loop
+    TRACE_STORE.finish(usage.request_id)
+    response.headers[REQUEST_ID_HEADER] = usage.request_id
+    if usage.total.calls:
+        response.headers[USAGE_HEADER] = usage.header_value()
+        logger.info("usage route={} user={} {}", usage.route, usage.user_id, usage.header_value())
+    return response
+
+@app.middleware("http")
+async def server_timing(request: StarletteRequest, call_next):
+    # Phase breakdown (auth, conv, history, graph, persist, ...) for clients and proxies
+    with timing_scope() as timing:
+        response = await call_next(request)
+    if timing is not None:
+        response.headers[SERVER_TIMING_HEADER] = timing.header_value(total_s=time.perf_counter() - timing.started)
+    return response
 
 @app.exception_handler(HTTPException)
 async def http_exception_handler(request: Request, exc: HTTPException):
-    logger.warning(f"HTTPException {exc.status_code} at {request.url.path}: {exc.detail}")
+    logger.warning("HTTPException {} at {}: {}", exc.status_code, request.url.path, exc.detail)
     return JSONResponse(status_code=exc.status_code, content={"detail": exc.detail})
 
+@app.exception_handler(DeadlineExceeded)
+async def deadline_exceeded_handler(request: Request, exc: DeadlineExceeded):
+    logger.warning("DeadlineExceeded at {}: {}", request.url.path, exc)
+    return JSONResponse(status_code=504, content={"detail": str(exc)})
+
 @app.get("/")
 async def root():
     return {"status": "ok", "env": APP_ENV}
@@ -87,8 +169,11 @@ def _sb_headers(user_token: str) -> dict:
 
 async def _sb_request(method: str, url: str, *, headers: dict):
     # lightweight wrapper; profile.py has a retry variant if needed
-    async with httpx.AsyncClient(timeout=httpx.Timeout(connect=10.0, read=20.0, write=10.0, pool=20.0)) as client:
-        return await client.request(method, url, headers=headers)
+    with translate_timeouts("supabase"), observe_supabase(method, url) as obs:
+        async with httpx.AsyncClient(timeout=httpx_timeout(httpx.Timeout(connect=10.0, read=20.0, write=10.0, pool=20.0))) as client:
+            resp = await client.request(method, url, headers=headers)
+            obs.status = resp.status_code
+            return resp
 
 # -----------------------------
 # Coach startup + endpoints
@@ -96,12 +181,26 @@ async def _sb_request(method: str, url: str, *, headers: dict):
 
 @app.on_event("startup")
 async def _startup_init_coach():
+    # Event-loop lag/stall monitoring (/diagnostics/event-loop)
+    if LOOP_MONITOR_ENABLED:
+        LOOP_MONITOR.start()
     # Warm the coach singleton so first chat is fast
     try:
         await get_coach()
-        print("[startup] Coach initialized")
+        logger.info("Coach initialized")
+    except Exception as e:
+        logger.error("Coach init failed: {}", e)
+
+@app.on_event("shutdown")
+async def _shutdown_coach():
+    # Release checkpointer connections (sqlite/postgres) if the coach was started
+    try:
+        await shutdown_coach()
     except Exception as e:
-        print(f"[startup] Coach init failed: {e}")
+        logger.error("Coach cleanup failed: {}", e)
+    await LOOP_MONITOR.stop()
+    # Drain the queued log records before the process exits
+    await logger.complete()
 
 class ChatRequest(BaseModel):
     # user_id now optional and validated against JWT if provided
@@ -114,6 +213,7 @@ async def coach_chat(
     req: ChatRequest,
     user_obj = Depends(get_current_user),
     authorization: str | None = Header(default=None),
+    x_debug_usage: str | None = Header(default=None),
 ) -> Dict[str, Any]:
     if not authorization or not authorization.lower().startswith("bearer "):
         raise HTTPException(status_code=401, detail="Missing bearer token")
@@ -129,7 +229,8 @@ async def coach_chat(
         if not _SUPABASE_URL or not _SUPABASE_ANON_KEY:
             raise HTTPException(status_code=500, detail="Supabase not configured")
         url = f"{_SUPABASE_URL}/rest/v1/goals?select=id&id=eq.{req.goal_id}"
-        resp = await _sb_request("GET", url, headers=_sb_headers(token))
+        with phase("goal-check"):
+            resp = await _sb_request("GET", url, headers=_sb_headers(token))
         if resp.status_code != 200:
             raise HTTPException(status_code=resp.status_code, detail="Failed to verify goal ownership")
         rows = []
@@ -141,14 +242,27 @@ async def coach_chat(
             raise HTTPException(status_code=404, detail="Goal not found or not owned by user")
 
     coach = await get_coach()
-    final = await coach.ainvoke_chat(user_id=uid, user_jwt=token, message=req.message, goal_id=req.goal_id)
-    return {"role": "assistant", "content": final.content}
+    with CHATS_IN_FLIGHT.track_inprogress():
+        final = await coach.ainvoke_chat(user_id=uid, user_jwt=token, message=req.message, goal_id=req.goal_id)
+    body: Dict[str, Any] = {"role": "assistant", "content": final.content}
+    usage = current_usage()
+    if usage is not None and (DEBUG_USAGE or x_debug_usage == "1"):
+        body["usage"] = usage.summary()
+    return body
 
 @app.get("/coach/progress")
 async def coach_progress(goal_id: str) -> Dict[str, Any]:
     coach = await get_coach()
     return coach.progress(goal_id)
 
+@app.delete("/coach/memory", status_code=204)
+async def forget_coach_memory(user_obj = Depends(get_current_user)) -> None:
+    """Erase the authenticated user's long-term chat memory (the coach's local index of their
+    messages). Call on account deletion; chat rows themselves are in Supabase under RLS.
+    """
+    coach = await get_coach()
+    await coach.forget_user(user_obj.get("id"))
+
 @app.get("/coach/history")
 async def get_chat_history(
     goal_id: Optional[str] = None,
@@ -165,19 +279,27 @@ async def get_chat_history(
     try:
         # Enforce RLS by using per-request JWT with REST-backed ChatStore
         store = ChatStore(user_token=authorization.split(" ", 1)[1])
-        conv_id = store.find_conversation(user_id=uid, goal_id=goal_id)
+        conv_id = await asyncio.to_thread(store.find_conversation, user_id=uid, goal_id=goal_id)
         if not conv_id:
             return {"conversation_id": None, "messages": []}
-        rows = store.fetch_messages_asc(conversation_id=conv_id, limit_n=limit)
-        messages = [
-            {
-                "role": r.get("role"),
-                "content": r.get("content", {}),
-                "created_at": r.get("created_at"),
-            }
-            for r in (rows or [])
-        ]
+        rows = await asyncio.to_thread(store.fetch_messages_asc, conversation_id=conv_id, limit_n=limit, chat_only=True)
+        # Only the chat bubbles: tool results and assistant tool-call steps are persisted for
+        # the agent's replay, not for the UI. chat_only drops them in the query so `limit`
+        # counts visible messages; the loop below re-checks. Rows also carry bookkeeping
+        # (token counts, ids) in `content`; the client decodes it as a string map, so only
+        # the text is returned
+        messages = []
+        for r in rows or []:
+            content = r.get("content") or {}
+            text = content_text(content)
+            if r.get("role") not in ("user", "assistant") or not text.strip():
+                continue
+            if isinstance(content, dict) and content.get("tool_calls"):
+                continue
+            messages.append({"role": r.get("role"), "content": {"text": text}, "created_at": r.get("created_at")})
         return {"conversation_id": conv_id, "messages": messages}
+    except DeadlineExceeded:
+        raise
     except Exception as e:
         # Surface a helpful error
         raise HTTPException(status_code=500, detail=f"Failed to load chat history: {e}")
@@ -81,3 +81,6 @@ class ProfileUpsert(ProfileBase):
 class CreateGoalResponse(BaseModel):
     goal: Goal
     agent_output: Optional[Any] = None
+    # True when some domain agents missed their deadline; see missing_domains
+    partial: bool = False
+    missing_domains: List[str] = []
@@ -0,0 +1,213 @@
+# app/observability/heap.py
+"""Heap diagnostics for a live worker: tracemalloc snapshots, object growth, buffer sizes.
+
+- `HeapProfiler` starts/stops tracemalloc, keeps the last HEAP_MAX_SNAPSHOTS snapshots
+  and diffs any two of them grouped by line, file or traceback, so growth between two
+  points in time is attributed to the allocating code.
+- `ObjectGrowth` counts live gc-tracked objects per type and reports which types grew
+  since the previous call (objgraph's show_growth, without the dependency).
+- `known_buffers()` reports the sizes of the process-wide caches and buffers, the first
+  place to look when RSS climbs.
+
+Snapshots and gc walks take the GIL for a while (hundreds of ms on a busy worker), so
+the endpoints run them in a worker thread and they stay admin-only.
+"""
+import gc
+import os
+import threading
+import time
+import tracemalloc
+from collections import Counter, OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+HEAP_MAX_SNAPSHOTS = int(os.getenv("HEAP_MAX_SNAPSHOTS", "5"))
+HEAP_TRACEMALLOC_FRAMES = int(os.getenv("HEAP_TRACEMALLOC_FRAMES", "10"))
+GROUP_BY = ("lineno", "filename", "traceback")
+
+# Allocation records of tracemalloc itself and of the import system are noise in a diff
+_TRACE_FILTERS = [
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(False, "<unknown>"),
+]
+
+
+def rss_bytes() -> Optional[int]:
+    """Current resident set size (Linux /proc; None elsewhere)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def _mb(n: Optional[int]) -> Optional[float]:
+    return round(n / 1e6, 2) if n is not None else None
+
+
+class HeapProfiler:
+    """tracemalloc control plus a bounded, id-addressed list of snapshots."""
+
+    def __init__(self, *, max_snapshots: int = HEAP_MAX_SNAPSHOTS) -> None:
+        self.max_snapshots = max_snapshots
+        # id -> (label, taken_at, rss, snapshot)
+        self._snapshots: "OrderedDict[int, Tuple[str, float, Optional[int], tracemalloc.Snapshot]]" = OrderedDict()
+        self._next_id = 1
+        self._lock = threading.Lock()
+
+    def start(self, nframes: int = HEAP_TRACEMALLOC_FRAMES) -> Dict[str, Any]:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(max(1, nframes))
+        return self.status()
+
+    def stop(self) -> Dict[str, Any]:
+        # Existing snapshots stay usable; tracing overhead and its memory are released
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+        return self.status()
+
+    def status(self) -> Dict[str, Any]:
+        tracing = tracemalloc.is_tracing()
+        current, peak = tracemalloc.get_traced_memory() if tracing else (0, 0)
+        with self._lock:
+            snapshots = [self._describe(sid, entry) for sid, entry in self._snapshots.items()]
+        return {
+            "tracing": tracing,
+            "nframes": tracemalloc.get_traceback_limit() if tracing else None,
+            "traced_mb": _mb(current),
+            "traced_peak_mb": _mb(peak),
+            "tracemalloc_overhead_mb": _mb(tracemalloc.get_tracemalloc_memory()) if tracing else None,
+            "snapshots": snapshots,
+        }
+
+    @staticmethod
+    def _describe(sid: int, entry: Tuple[str, float, Optional[int], tracemalloc.Snapshot]) -> Dict[str, Any]:
+        label, taken_at, rss, _ = entry
+        return {"id": sid, "label": label, "taken_at": taken_at, "rss_mb": _mb(rss)}
+
+    def take_snapshot(self, label: str = "") -> Dict[str, Any]:
+        """Snapshot the traced heap (tracemalloc must be running). Blocking; run off the loop."""
+        if not tracemalloc.is_tracing():
+            raise RuntimeError("tracemalloc is not running; start it first")
+        snapshot = tracemalloc.take_snapshot().filter_traces(_TRACE_FILTERS)
+        entry = (label, time.time(), rss_bytes(), snapshot)
+        with self._lock:
+            sid = self._next_id
+            self._next_id += 1
+            self._snapshots[sid] = entry
+            while len(self._snapshots) > self.max_snapshots:
+                self._snapshots.popitem(last=False)
+        total = sum(stat.size for stat in snapshot.statistics("filename"))
+        return {**self._describe(sid, entry), "traced_mb": _mb(total)}
+
+    def _get(self, sid: Optional[int], default_index: int) -> Tuple[int, tracemalloc.Snapshot]:
+        with self._lock:
+            ids = list(self._snapshots)
+            if sid is None:
+                if len(ids) < abs(default_index):
+                    raise LookupError("need at least two snapshots to diff")
+                sid = ids[default_index]
+            entry = self._snapshots.get(sid)
+        if entry is None:
+            raise LookupError(f"snapshot {sid} not found (only the last {self.max_snapshots} are kept)")
+        return sid, entry[3]
+
+    def diff(self, a: Optional[int] = None, b: Optional[int] = None, *, group_by: str = "lineno", limit: int = 25) -> Dict[str, Any]:
+        """Top allocation sites by growth from snapshot a to b (default: the last two)."""
+        if group_by not in GROUP_BY:
+            raise ValueError(f"group_by must be one of {GROUP_BY}")
+        a_id, old = self._get(a, -2)
+        b_id, new = self._get(b, -1)
+        stats = new.compare_to(old, group_by)
+        rows = []
+        for stat in stats[:limit]:
+            frame = stat.traceback[0]
+            row: Dict[str, Any] = {
+                "file": frame.filename,
+                "line": frame.lineno if group_by != "filename" else None,
+                "size_diff_kb": round(stat.size_diff / 1024, 1),
+                "size_kb": round(stat.size / 1024, 1),
+                "count_diff": stat.count_diff,
+                "count": stat.count,
+            }
+            if group_by == "traceback":
+                row["traceback"] = [f"{f.filename}:{f.lineno}" for f in stat.traceback]
+            rows.append(row)
+        return {
+            "from": a_id,
+            "to": b_id,
+            "group_by": group_by,
+            "total_diff_kb": round(sum(s.size_diff for s in stats) / 1024, 1),
+            "top": rows,
+        }
+
+
+class ObjectGrowth:
+    """Live object counts per type, and growth since the previous `growth()` call."""
+
+    def __init__(self) -> None:
+        self._previous: Optional[Counter] = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _count() -> Counter:
+        gc.collect()
+        counts: Counter = Counter()
+        for obj in gc.get_objects():
+            t = type(obj)
+            counts[f"{t.__module__}.{t.__qualname__}"] += 1
+        return counts
+
+    def growth(self, limit: int = 25) -> Dict[str, Any]:
+        """Blocking (full gc + walk of every tracked object); run off the loop."""
+        counts = self._count()
+        with self._lock:
+            previous, self._previous = self._previous, counts
+        grown = []
+        if previous is not None:
+            deltas = ((name, n, n - previous.get(name, 0)) for name, n in counts.items())
+            grown = sorted((d for d in deltas if d[2] > 0), key=lambda d: d[2], reverse=True)[:limit]
+        return {
+            "baseline": previous is None,
+            "objects": sum(counts.values()),
+            "growth": [{"type": name, "count": n, "delta": delta} for name, n, delta in grown],
+            "most_common": [{"type": name, "count": n} for name, n in counts.most_common(limit)],
+            # Clients created per call and never closed show up here
+            "http_clients": {name: n for name, n in counts.items() if name in ("httpx.Client", "httpx.AsyncClient")},
+        }
+
+
+def known_buffers() -> Dict[str, Any]:
+    """Sizes of the in-process caches and buffers (imports are local: this module sits below them)."""
+    from app.agents import graph
+    from app.agents.tokens import count_tokens
+    from app.agents.utils.accounting import USAGE_LEDGER
+    from app.agents.utils.tracing import TRACE_STORE
+    from app.api.goals import _IN_MEMORY_GOALS
+    from app.tools.tool_cache import GOALS_TOOL_CACHE
+
+    tokens = count_tokens.cache_info()
+    trace = TRACE_STORE.snapshot()
+    out: Dict[str, Any] = {
+        "trace_store": {k: trace.get(k) for k in ("traces", "max_traces", "open_runs", "export")},
+        "usage_ledger": {"users_tracked": len(USAGE_LEDGER._users)},
+        "goals_tool_cache": {"entries": GOALS_TOOL_CACHE.snapshot()["entries"]},
+        "in_memory_goals": {"users": len(_IN_MEMORY_GOALS), "goals": sum(len(v) for v in _IN_MEMORY_GOALS.values())},
+        "count_tokens_lru": {"entries": tokens.currsize, "max": tokens.maxsize},
+    }
+    coach = graph._coach_singleton
+    if coach is not None:
+        history = coach._history_cache.snapshot()
+        memory = coach._memory
+        with memory._lock:
+            indexes = list(memory._indexes.values())
+        out["history_cache"] = {k: history[k] for k in ("conversations", "users", "bytes", "max_bytes")}
+        out["answer_cache"] = {"entries": len(coach._answer_cache), "max_entries": coach._answer_cache.max_entries}
+        out["long_term_memory"] = {"open_indexes": len(indexes), "vectors": sum(len(ix) for ix in indexes)}
+        out["background_tasks"] = {"memory_indexing": len(memory._tasks), "summary_folds": len(coach._summarizer._tasks)}
+    return out
+
+
+HEAP_PROFILER = HeapProfiler()
+OBJECT_GROWTH = ObjectGrowth()
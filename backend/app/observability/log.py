@@ -0,0 +1,76 @@
+# app/observability/log.py
+"""Application logging: loguru with per-module levels and a queue-based sink.
+
+Modules log with `from loguru import logger`; `configure_logging()` (called once by
+app.main) replaces loguru's default synchronous stderr handler with one that:
+
+- drops records below LOG_LEVEL, or below the LOG_LEVELS override for their module
+  ("app.agents.client=DEBUG,app.api.goals=WARNING"; a prefix covers its submodules);
+- with LOG_ENQUEUE=1, only puts the record on a queue in the calling thread and
+  writes it from loguru's worker thread, so a slow stdout/pipe never stalls the
+  event loop (`await logger.complete()` on shutdown drains it);
+- tags every record with the request id (X-Request-ID) of the calling context and
+  renders as text or, with LOG_FORMAT=json, one JSON object per line.
+
+Use `logger.debug("... {}", value)` style arguments on hot paths: the message is only
+formatted when some handler accepts the record.
+"""
+import os
+import sys
+from typing import Any, Dict, Optional, TextIO
+
+from loguru import logger
+
+from app.agents.context import CURRENT_USAGE
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").strip().upper()
+LOG_LEVELS = os.getenv("LOG_LEVELS", "")
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text").strip().lower()  # text | json
+LOG_ENQUEUE = os.getenv("LOG_ENQUEUE", "1").strip().lower() not in ("0", "false", "no", "off")
+# Share of chat turns whose agent transcript (last 20 messages) is logged
+LOG_TRANSCRIPT_SAMPLE_RATE = float(os.getenv("LOG_TRANSCRIPT_SAMPLE_RATE", "0"))
+
+TEXT_FORMAT = (
+    "{time:YYYY-MM-DD HH:mm:ss.SSS} | {level: <7} | {name}:{line} | {extra[request_id]} | {message}"
+)
+
+
+def parse_levels(spec: str) -> Dict[str, str]:
+    """'app.agents=DEBUG, app.api.goals=warning' -> {"app.agents": "DEBUG", "app.api.goals": "WARNING"}."""
+    levels: Dict[str, str] = {}
+    for part in (spec or "").split(","):
+        module, sep, level = part.partition("=")
+        if sep and module.strip() and level.strip():
+            levels[module.strip()] = level.strip().upper()
+    return levels
+
+
+def _add_request_id(record: Dict[str, Any]) -> None:
+    # Patchers run in the caller before the record is queued, so the request's contextvars are visible
+    usage = CURRENT_USAGE.get()
+    record["extra"].setdefault("request_id", getattr(usage, "request_id", None) or "-")
+
+
+def configure_logging(
+    *,
+    level: str = LOG_LEVEL,
+    levels: Optional[str] = LOG_LEVELS,
+    fmt: str = LOG_FORMAT,
+    enqueue: bool = LOG_ENQUEUE,
+    sink: TextIO = sys.stderr,
+) -> int:
+    """Install the application handler (replacing any previous one); returns its id."""
+    per_module: Dict[str, Any] = {"": level, **parse_levels(levels or "")}
+    lowest = min(logger.level(v).no for v in per_module.values())
+    logger.remove()
+    logger.configure(patcher=_add_request_id)
+    return logger.add(
+        sink,
+        level=lowest,
+        filter=per_module,
+        format=TEXT_FORMAT,
+        serialize=fmt == "json",
+        enqueue=enqueue,
+        backtrace=False,
+        diagnose=False,
+    )
@@ -0,0 +1,193 @@
+# app/observability/loop_monitor.py
+"""Event-loop lag monitor and blocking-call detector.
+
+A task on the loop sleeps LOOP_MONITOR_INTERVAL_S at a time and records how late it
+wakes up: that delay is the lag every other coroutine saw (coach_event_loop_lag_seconds).
+A wake-up later than LOOP_BLOCK_THRESHOLD_S counts as a stall.
+
+With LOOP_MONITOR_DEBUG=1 a watchdog thread also checks the monitor's heartbeat; when it
+goes stale past the threshold the loop thread is still inside the blocking call, so its
+current stack (sys._current_frames) shows the culprit, e.g. a sync httpx call made by
+ChatStore on the loop. Each stall is logged with that stack and kept as a recent
+offender, grouped by the innermost app/ frame, for /diagnostics/event-loop.
+"""
+import asyncio
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional
+
+from loguru import logger
+
+from app.agents.utils.stats import LatencyWindow
+from app.observability.metrics import EVENT_LOOP_LAG, EVENT_LOOP_STALLS
+
+LOOP_MONITOR_ENABLED = os.getenv("LOOP_MONITOR", "1").strip().lower() not in ("0", "false", "no", "off")
+LOOP_MONITOR_DEBUG = os.getenv("LOOP_MONITOR_DEBUG", "0").strip().lower() in ("1", "true", "yes", "on")
+LOOP_MONITOR_INTERVAL_S = float(os.getenv("LOOP_MONITOR_INTERVAL_S", "0.25"))
+LOOP_BLOCK_THRESHOLD_S = float(os.getenv("LOOP_BLOCK_THRESHOLD_S", "0.1"))
+LOOP_MAX_OFFENDERS = int(os.getenv("LOOP_MAX_OFFENDERS", "50"))
+_STACK_FRAMES = 15
+_APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _blocking_site(frames: List[traceback.FrameSummary]) -> str:
+    """Innermost frame in our own code (else the innermost frame) as 'path:line func'."""
+    for f in reversed(frames):
+        if f.filename.startswith(_APP_DIR):
+            return f"{os.path.relpath(f.filename, os.path.dirname(_APP_DIR))}:{f.lineno} {f.name}"
+    if frames:
+        f = frames[-1]
+        return f"{f.filename}:{f.lineno} {f.name}"
+    return "unknown"
+
+
+class _Stall:
+    __slots__ = ("site", "stack", "detected_at", "blocked_s")
+
+    def __init__(self, site: str, stack: List[str], blocked_s: float) -> None:
+        self.site = site
+        self.stack = stack
+        self.detected_at = time.time()
+        self.blocked_s = blocked_s
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "site": self.site,
+            "blocked_ms": round(self.blocked_s * 1000, 1),
+            "detected_at": self.detected_at,
+            "stack": self.stack,
+        }
+
+
+class LoopMonitor:
+    """Lag sampler task plus (in debug mode) the stack-capturing watchdog thread."""
+
+    def __init__(
+        self,
+        *,
+        interval_s: float = LOOP_MONITOR_INTERVAL_S,
+        block_threshold_s: float = LOOP_BLOCK_THRESHOLD_S,
+        capture_stacks: bool = LOOP_MONITOR_DEBUG,
+        max_offenders: int = LOOP_MAX_OFFENDERS,
+    ) -> None:
+        self.interval_s = interval_s
+        self.block_threshold_s = block_threshold_s
+        self.capture_stacks = capture_stacks
+        self.lag = LatencyWindow()
+        self.max_lag_s = 0.0
+        self.samples = 0
+        self.stalls = 0
+        self._offenders: Deque[_Stall] = deque(maxlen=max_offenders)
+        # site -> [stalls, total blocked s, max blocked s]
+        self._by_site: Dict[str, List[float]] = {}
+        self._lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._beat = time.monotonic()
+        self._last_lag = 0.0
+        self._loop_thread_id: Optional[int] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self) -> None:
+        """Start on the running loop (call from startup)."""
+        if self.running:
+            return
+        self._loop_thread_id = threading.get_ident()
+        self._beat = time.monotonic()
+        self._stop.clear()
+        self._task = asyncio.get_running_loop().create_task(self._sample(), name="loop-monitor")
+        if self.capture_stacks:
+            self._watchdog = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+            self._watchdog.start()
+
+    async def stop(self) -> None:
+        self._stop.set()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _sample(self) -> None:
+        while True:
+            t0 = time.perf_counter()
+            await asyncio.sleep(self.interval_s)
+            lag = max(0.0, time.perf_counter() - t0 - self.interval_s)
+            self._last_lag = lag
+            self._beat = time.monotonic()
+            self.samples += 1
+            self.lag.observe(lag)
+            EVENT_LOOP_LAG.observe(lag)
+            if lag > self.max_lag_s:
+                self.max_lag_s = lag
+            if lag > self.block_threshold_s:
+                self.stalls += 1
+                EVENT_LOOP_STALLS.inc()
+                if not self.capture_stacks:
+                    logger.warning("event loop blocked ~{:.0f}ms (set LOOP_MONITOR_DEBUG=1 for the stack)", lag * 1000)
+
+    def _watch(self) -> None:
+        stall: Optional[_Stall] = None
+        beat_at_stall = 0.0
+        while not self._stop.wait(self.block_threshold_s / 4):
+            beat = self._beat
+            blocked = time.monotonic() - beat - self.interval_s
+            if stall is not None and beat != beat_at_stall:
+                # The loop got back to the monitor: the stall is over and its full lag is known
+                stall.blocked_s = max(stall.blocked_s, self._last_lag)
+                self._finish(stall)
+                stall = None
+            if stall is None and blocked > self.block_threshold_s:
+                frame = sys._current_frames().get(self._loop_thread_id)
+                frames = traceback.extract_stack(frame)[-_STACK_FRAMES:] if frame is not None else []
+                stall = _Stall(_blocking_site(frames), [line.rstrip() for line in traceback.format_list(frames)], blocked)
+                beat_at_stall = beat
+            elif stall is not None:
+                stall.blocked_s = max(stall.blocked_s, blocked)
+
+    def _finish(self, stall: _Stall) -> None:
+        with self._lock:
+            self._offenders.append(stall)
+            site = self._by_site.setdefault(stall.site, [0, 0.0, 0.0])
+            site[0] += 1
+            site[1] += stall.blocked_s
+            site[2] = max(site[2], stall.blocked_s)
+        logger.warning(
+            "event loop blocked {:.0f}ms at {}\n{}", stall.blocked_s * 1000, stall.site, "\n".join(stall.stack)
+        )
+
+    def offenders(self, limit: int = 20) -> List[Dict[str, Any]]:
+        with self._lock:
+            recent = list(self._offenders)[-limit:]
+        return [s.as_dict() for s in reversed(recent)]
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            sites = sorted(self._by_site.items(), key=lambda kv: kv[1][1], reverse=True)
+        return {
+            "running": self.running,
+            "capture_stacks": self.capture_stacks,
+            "interval_s": self.interval_s,
+            "block_threshold_s": self.block_threshold_s,
+            "samples": self.samples,
+            "stalls": self.stalls,
+            "max_lag_s": round(self.max_lag_s, 4),
+            "lag_s": self.lag.snapshot(),
+            "top_sites": [
+                {"site": site, "stalls": int(n), "total_ms": round(total * 1000, 1), "max_ms": round(mx * 1000, 1)}
+                for site, (n, total, mx) in sites[:10]
+            ],
+        }
+
+
+LOOP_MONITOR = LoopMonitor()
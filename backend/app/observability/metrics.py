@@ -0,0 +1,302 @@
+# app/observability/metrics.py
+"""Process-wide counters, gauges and histograms rendered in Prometheus text format.
+
+Dependency-free on purpose: each labelled series is a small object with a fixed bucket
+list, so an observation is a bisect plus three additions under a per-series lock (see
+benchmarks/bench_metrics.py). Callers on hot paths can keep the child returned by
+`labels(...)` to skip the label lookup.
+
+Label values must come from small sets (route templates, table names, model names);
+never put ids or raw paths into a label.
+"""
+import re
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+# Seconds; covers a cached PostgREST read (~5 ms) up to a slow multi-agent generation
+LATENCY_BUCKETS: Tuple[float, ...] = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+COUNT_BUCKETS: Tuple[float, ...] = (0, 1, 2, 3, 4, 5, 7, 10, 15, 20, 30, 50)
+LAG_BUCKETS: Tuple[float, ...] = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _fmt(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _label_str(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        # Label tuples as passed (e.g. status=200) -> child, so repeat lookups skip str()
+        self._lookup: Dict[Tuple[object, ...], object] = {}
+        self._lock = threading.Lock()
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values: object):
+        """Series for these label values (created on first use)."""
+        child = self._lookup.get(values)
+        if child is None:
+            key = tuple(str(v) for v in values)
+            if len(key) != len(self.labelnames):
+                raise ValueError(f"{self.name}: expected labels {self.labelnames}, got {key}")
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+                self._lookup[values] = child
+        return child
+
+    def _series(self) -> List[Tuple[Tuple[str, ...], object]]:
+        with self._lock:
+            return list(self._children.items())
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for values, child in sorted(self._series()):
+            lines.extend(self._render_child(values, child))
+        return lines
+
+    def _render_child(self, values: Tuple[str, ...], child) -> List[str]:
+        return [f"{self.name}{_label_str(self.labelnames, values)} {_fmt(child.value)}"]
+
+
+class _CounterChild:
+    __slots__ = ("value", "_lock")
+
+    def __init__(self) -> None:
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self.value += amount
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self) -> _CounterChild:
+        return _CounterChild()
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.labels().inc(amount)
+
+
+class _GaugeChild:
+    __slots__ = ("value", "_lock")
+
+    def __init__(self) -> None:
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self.value -= amount
+
+    def set(self, value: float) -> None:
+        self.value = float(value)
+
+    @contextmanager
+    def track_inprogress(self) -> Iterator[None]:
+        self.inc()
+        try:
+            yield
+        finally:
+            self.dec()
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def _new_child(self) -> _GaugeChild:
+        return _GaugeChild()
+
+    def track_inprogress(self):
+        return self.labels().track_inprogress()
+
+
+class _HistogramChild:
+    __slots__ = ("bounds", "counts", "sum", "count", "_lock")
+
+    def __init__(self, bounds: Tuple[float, ...]) -> None:
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        i = bisect_left(self.bounds, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += value
+            self.count += 1
+
+    @contextmanager
+    def time(self) -> Iterator[None]:
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - t0)
+
+    def state(self) -> Tuple[List[int], float, int]:
+        with self._lock:
+            return list(self.counts), self.sum, self.count
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS
+    ) -> None:
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(float(b) for b in buckets))
+
+    def _new_child(self) -> _HistogramChild:
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float) -> None:
+        self.labels().observe(value)
+
+    def _render_child(self, values: Tuple[str, ...], child: _HistogramChild) -> List[str]:
+        counts, total, count = child.state()
+        lines = []
+        cumulative = 0
+        for bound, n in zip(self.buckets + (float("inf"),), counts):
+            cumulative += n
+            le = f'le="{_fmt(bound)}"'
+            lines.append(f"{self.name}_bucket{_label_str(self.labelnames, values, le)} {cumulative}")
+        labels = _label_str(self.labelnames, values)
+        lines.append(f"{self.name}_sum{labels} {_fmt(round(total, 6))}")
+        lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class Registry:
+    def __init__(self) -> None:
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"metric already registered: {metric.name}")
+            self._metrics[metric.name] = metric
+        if not metric.labelnames:
+            metric.labels()  # unlabelled series render (as 0) before the first observation
+        return metric
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines: List[str] = []
+        for m in metrics:
+            lines.extend(m.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+HTTP_LATENCY: Histogram = REGISTRY.register(Histogram(
+    "coach_http_request_duration_seconds", "HTTP request latency by route template.", ("method", "route", "status"),
+))
+SUPABASE_LATENCY: Histogram = REGISTRY.register(Histogram(
+    "coach_supabase_request_duration_seconds", "Supabase REST/auth round-trip latency.", ("table", "verb", "status"),
+))
+SUPABASE_IN_FLIGHT: Gauge = REGISTRY.register(Gauge(
+    "coach_supabase_requests_in_flight", "Supabase requests currently open (sync ones occupy a worker thread).", ("client",),
+))
+MCP_TOOL_LATENCY: Histogram = REGISTRY.register(Histogram(
+    "coach_mcp_tool_duration_seconds", "MCP goals tool latency as seen by the agent tools.", ("tool", "cache"),
+))
+LLM_LATENCY: Histogram = REGISTRY.register(Histogram(
+    "coach_llm_call_duration_seconds", "Chat model call latency by model and agent.", ("model", "agent"),
+))
+GENERATION_ITEMS: Histogram = REGISTRY.register(Histogram(
+    "coach_generation_items", "Tasks produced per generation call.", ("domain",), buckets=COUNT_BUCKETS,
+))
+CHATS_IN_FLIGHT: Gauge = REGISTRY.register(Gauge(
+    "coach_chats_in_flight", "/coach/chat requests currently being handled.",
+))
+EVENT_LOOP_LAG: Histogram = REGISTRY.register(Histogram(
+    "coach_event_loop_lag_seconds", "Delay of the loop monitor's periodic wake-up beyond its interval.", buckets=LAG_BUCKETS,
+))
+EVENT_LOOP_STALLS: Counter = REGISTRY.register(Counter(
+    "coach_event_loop_stalls_total", "Times the event loop was blocked longer than LOOP_BLOCK_THRESHOLD_S.",
+))
+
+
+_TARGET_END = re.compile(r"[/?#]")
+
+
+def supabase_target(url: str) -> str:
+    """Table (or auth endpoint) a Supabase URL addresses, e.g. 'goals' or 'auth:user'."""
+    for prefix, label in (("/rest/v1/", ""), ("/auth/v1/", "auth:")):
+        idx = url.find(prefix)
+        if idx >= 0:
+            name = _TARGET_END.split(url[idx + len(prefix):], 1)[0]
+            return f"{label}{name}" if name else "unknown"
+    return "unknown"
+
+
+class observe_supabase:
+    """Time one Supabase round-trip; set `.status` once the response is in.
+
+        with observe_supabase("GET", url) as obs:
+            resp = await client.get(url)
+            obs.status = resp.status_code
+
+    Works around both sync (worker thread) and async calls.
+    """
+
+    __slots__ = ("table", "verb", "status", "_in_flight", "_t0")
+
+    def __init__(self, verb: str, url: str, *, client: str = "async") -> None:
+        self.table = supabase_target(url)
+        self.verb = verb.upper()
+        self.status: Optional[int] = None
+        self._in_flight = SUPABASE_IN_FLIGHT.labels(client)
+
+    def __enter__(self) -> "observe_supabase":
+        self._in_flight.inc()
+        self._t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        elapsed = time.perf_counter() - self._t0
+        self._in_flight.dec()
+        status = str(self.status) if self.status is not None else ("error" if exc_type is not None else "unknown")
+        SUPABASE_LATENCY.labels(self.table, self.verb, status).observe(elapsed)
+
+
+def render() -> str:
+    return REGISTRY.render()
@@ -0,0 +1,195 @@
+# app/observability/profiler.py
+"""On-demand in-process sampling profiler with collapsed-stack (flamegraph) output.
+
+`StackSampler.run(seconds)` runs in a worker thread and every `interval_ms` reads the
+current frame of every other thread (sys._current_frames); stacks on the event-loop
+thread are prefixed with the asyncio task that was running. With `tasks=True` it also
+records, every few samples, where each *suspended* task is waiting by walking its
+coroutine await chain on the loop (wall-clock view: which awaits requests sit in).
+
+Output is Brendan Gregg's collapsed format, one `frame;frame;frame count` line per
+distinct stack (root first), ready for flamegraph.pl / speedscope / inferno.
+
+Bounded for production use: at most PROFILE_MAX_SECONDS per run, interval >= 1 ms,
+one run at a time, stack depth capped, and nothing is installed into the interpreter
+(no settrace/setprofile), so the profiled code runs unmodified.
+"""
+import asyncio
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+PROFILE_MAX_SECONDS = float(os.getenv("PROFILE_MAX_SECONDS", "30"))
+PROFILE_DEFAULT_INTERVAL_MS = float(os.getenv("PROFILE_DEFAULT_INTERVAL_MS", "10"))
+_MAX_DEPTH = 128
+_TASK_SAMPLE_EVERY = 10  # await-chain samples every N stack samples
+_MAX_TASKS = 500
+
+# Leaf frames of threads that are parked, not working (skipped unless include_idle)
+_IDLE_LEAVES = {
+    ("selectors.py", "select"),
+    ("threading.py", "wait"),
+    ("threading.py", "_wait_for_tstate_lock"),
+    ("queue.py", "get"),
+    ("thread.py", "_worker"),
+    ("socket.py", "accept"),
+    ("connection.py", "_recv"),  # multiprocessing pipe read (loguru enqueue writer)
+}
+
+
+class ProfilerBusy(RuntimeError):
+    pass
+
+
+def _short_path(filename: str) -> str:
+    """Module-ish path: 'app/agents/graph.py', 'langchain_core/messages/ai.py', 'asyncio/events.py'."""
+    best = filename
+    for root in sys.path:
+        if root and filename.startswith(root) and len(filename) - len(root) < len(best):
+            best = filename[len(root):].lstrip(os.sep)
+    return best
+
+
+class StackSampler:
+    def __init__(self) -> None:
+        self._run_lock = threading.Lock()
+        self._labels: Dict[Any, str] = {}  # code object -> "path:qualname"
+        self.runs = 0
+
+    @property
+    def busy(self) -> bool:
+        return self._run_lock.locked()
+
+    def _label(self, code) -> str:
+        label = self._labels.get(code)
+        if label is None:
+            name = getattr(code, "co_qualname", code.co_name)
+            label = f"{_short_path(code.co_filename)}:{name}".replace(";", ":")
+            self._labels[code] = label
+        return label
+
+    def _stack(self, frame) -> List[str]:
+        frames = []
+        while frame is not None and len(frames) < _MAX_DEPTH:
+            frames.append(self._label(frame.f_code))
+            frame = frame.f_back
+        frames.reverse()
+        return frames
+
+    def _await_chain(self, coro) -> List[str]:
+        chain = []
+        while coro is not None and len(chain) < _MAX_DEPTH:
+            frame = getattr(coro, "cr_frame", None) or getattr(coro, "gi_frame", None) or getattr(coro, "ag_frame", None)
+            if frame is not None:
+                chain.append(self._label(frame.f_code))
+            coro = getattr(coro, "cr_await", None) or getattr(coro, "gi_yieldfrom", None) or getattr(coro, "ag_await", None)
+        return chain
+
+    def run(
+        self,
+        seconds: float,
+        *,
+        interval_ms: float = PROFILE_DEFAULT_INTERVAL_MS,
+        loop: Optional[asyncio.AbstractEventLoop] = None,
+        loop_thread_id: Optional[int] = None,
+        tasks: bool = False,
+        include_idle: bool = False,
+    ) -> Dict[str, Any]:
+        """Sample for `seconds` (blocking: call via asyncio.to_thread). Raises ProfilerBusy."""
+        if not self._run_lock.acquire(blocking=False):
+            raise ProfilerBusy("a profile is already running")
+        try:
+            return self._run(
+                min(max(seconds, 0.1), PROFILE_MAX_SECONDS), max(interval_ms, 1.0) / 1000, loop, loop_thread_id, tasks, include_idle
+            )
+        finally:
+            self._run_lock.release()
+
+    def _run(self, seconds, interval_s, loop, loop_thread_id, tasks, include_idle) -> Dict[str, Any]:
+        own = threading.get_ident()
+        stacks: Counter = Counter()
+        awaits: Counter = Counter()
+        per_thread: Counter = Counter()
+        pending_task_sample = threading.Event()
+        samples = 0
+
+        def sample_tasks() -> None:
+            # Runs on the loop: where every suspended task is currently awaiting
+            try:
+                for task in list(asyncio.all_tasks(loop))[:_MAX_TASKS]:
+                    chain = self._await_chain(task.get_coro())
+                    if chain:
+                        awaits[";".join(chain)] += 1
+            finally:
+                pending_task_sample.clear()
+
+        t_start = time.perf_counter()
+        cpu_start = time.thread_time()
+        deadline = t_start + seconds
+        next_tick = t_start
+        while True:
+            now = time.perf_counter()
+            if now >= deadline:
+                break
+            if now < next_tick:
+                time.sleep(next_tick - now)
+            next_tick += interval_s
+            samples += 1
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                leaf = frame.f_code
+                if not include_idle and (os.path.basename(leaf.co_filename), leaf.co_name) in _IDLE_LEAVES:
+                    continue
+                prefix = [f"thread:{names.get(ident, ident)}"]
+                if loop is not None and ident == loop_thread_id:
+                    task = asyncio.current_task(loop)
+                    if task is not None:
+                        prefix.append(f"task:{getattr(task.get_coro(), '__qualname__', task.get_name())}")
+                stacks[";".join(prefix + self._stack(frame))] += 1
+                per_thread[prefix[0]] += 1
+            if tasks and loop is not None and samples % _TASK_SAMPLE_EVERY == 0 and not pending_task_sample.is_set():
+                pending_task_sample.set()
+                loop.call_soon_threadsafe(sample_tasks)
+            del frame
+        duration = time.perf_counter() - t_start
+        self.runs += 1
+        return {
+            "duration_s": round(duration, 3),
+            "interval_ms": round(interval_s * 1000, 2),
+            "samples": samples,
+            "overhead_pct": round((time.thread_time() - cpu_start) / duration * 100, 2) if duration else None,
+            "per_thread": dict(per_thread),
+            "stacks": stacks,
+            "awaits": awaits,
+        }
+
+
+def collapsed(counter: Counter, prefix: str = "") -> str:
+    return "".join(f"{prefix}{stack} {n}\n" for stack, n in counter.most_common())
+
+
+def top_frames(counter: Counter, limit: int = 25) -> Dict[str, List[Dict[str, Any]]]:
+    """Hottest frames by self samples (leaf) and by total samples (anywhere on the stack)."""
+    total = sum(counter.values()) or 1
+    self_c: Counter = Counter()
+    total_c: Counter = Counter()
+    for stack, n in counter.items():
+        frames = [f for f in stack.split(";") if not f.startswith(("thread:", "task:"))]
+        if not frames:
+            continue
+        self_c[frames[-1]] += n
+        for f in set(frames):
+            total_c[f] += n
+
+    def rows(c: Counter) -> List[Dict[str, Any]]:
+        return [{"frame": f, "samples": n, "pct": round(n / total * 100, 1)} for f, n in c.most_common(limit)]
+
+    return {"self": rows(self_c), "total": rows(total_c)}
+
+
+STACK_SAMPLER = StackSampler()
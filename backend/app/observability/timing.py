@@ -0,0 +1,121 @@
+# app/observability/timing.py
+"""Per-request phase timings emitted as a `Server-Timing` response header.
+
+The middleware opens a `ServerTiming` for each request (CURRENT_TIMING); code on the
+request path wraps its phases in `phase("name")` (or decorates a function with
+`timed_phase("name")`), and the collected durations go out as
+
+    Server-Timing: auth;dur=41.2, conv;dur=63.0, history;dur=88.4;desc="2 calls", graph;dur=2310.7, total;dur=2598.3
+
+Phases may overlap (the history reads run concurrently with the prefetch), so they do
+not need to add up to `total`. Repeated phases are summed and report their call count.
+A phase nested in another phase of the same name (insert_lc_messages -> insert_message)
+is only counted once. Outside a request (background tasks, CLI) `phase` is a no-op.
+"""
+import contextvars
+import functools
+import inspect
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional
+
+from app.agents.context import CURRENT_TIMING
+
+SERVER_TIMING_ENABLED = os.getenv("COACH_SERVER_TIMING", "1").strip().lower() not in ("0", "false", "no", "off")
+SERVER_TIMING_HEADER = "Server-Timing"
+# Header entries beyond this are dropped (proxies cap header sizes)
+SERVER_TIMING_MAX_PHASES = int(os.getenv("COACH_SERVER_TIMING_MAX_PHASES", "24"))
+
+# Phase names currently open in this context (for the nested same-name check)
+_OPEN_PHASES: contextvars.ContextVar[frozenset] = contextvars.ContextVar("open_phases", default=frozenset())
+
+
+class ServerTiming:
+    """Phase name -> [total seconds, calls] for one request, in first-seen order.
+
+    Sync phases run in worker threads (asyncio.to_thread copies the context), hence the lock.
+    """
+
+    def __init__(self) -> None:
+        self.started = time.perf_counter()
+        self._phases: Dict[str, List[float]] = {}
+        self._lock = threading.Lock()
+
+    def add(self, name: str, seconds: float) -> None:
+        with self._lock:
+            entry = self._phases.get(name)
+            if entry is None:
+                self._phases[name] = [seconds, 1]
+            else:
+                entry[0] += seconds
+                entry[1] += 1
+
+    def phases(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            return {name: {"ms": round(s * 1000, 1), "calls": int(n)} for name, (s, n) in self._phases.items()}
+
+    def header_value(self, *, total_s: Optional[float] = None, max_phases: int = SERVER_TIMING_MAX_PHASES) -> str:
+        parts = []
+        with self._lock:
+            items = list(self._phases.items())[:max_phases]
+        for name, (seconds, calls) in items:
+            entry = f"{name};dur={seconds * 1000:.1f}"
+            if calls > 1:
+                entry += f';desc="{int(calls)} calls"'
+            parts.append(entry)
+        if total_s is not None:
+            parts.append(f"total;dur={total_s * 1000:.1f}")
+        return ", ".join(parts)
+
+
+@contextmanager
+def timing_scope() -> Iterator[Optional[ServerTiming]]:
+    """Collect phases of the enclosed request (yields None when disabled)."""
+    if not SERVER_TIMING_ENABLED:
+        yield None
+        return
+    timing = ServerTiming()
+    token = CURRENT_TIMING.set(timing)
+    try:
+        yield timing
+    finally:
+        CURRENT_TIMING.reset(token)
+
+
+@contextmanager
+def phase(name: str) -> Iterator[None]:
+    """Time the enclosed block as `name` in the current request's Server-Timing."""
+    timing = CURRENT_TIMING.get()
+    open_phases = _OPEN_PHASES.get()
+    if timing is None or name in open_phases:
+        yield
+        return
+    token = _OPEN_PHASES.set(open_phases | {name})
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        timing.add(name, time.perf_counter() - t0)
+        _OPEN_PHASES.reset(token)
+
+
+def timed_phase(name: str) -> Callable[[Callable], Callable]:
+    """Decorator form of `phase` for sync and async functions."""
+
+    def decorate(fn: Callable) -> Callable:
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                with phase(name):
+                    return await fn(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with phase(name):
+                return fn(*args, **kwargs)
+        return wrapper
+
+    return decorate
@@ -1,7 +1,11 @@
 # app/tools/generators.py
 from langchain_core.tools import tool
 from langchain_core.messages import HumanMessage, AIMessage
+from loguru import logger
 from app.agents.schemas import ItemsModel
+from app.agents.context_encoder import encode_context
+from app.agents.utils.accounting import agent_scope
+from app.observability.metrics import GENERATION_ITEMS
 
 
 def _extract_json_dict(text: str) -> dict:
@@ -50,8 +54,13 @@ def _normalize_output(res) -> dict:
 
     Supports dict, pydantic model, AIMessage (JSON text), or string JSON.
     """
-    import json as _json
     if isinstance(res, dict):
+        # Compiled ReAct agents return {"messages": [...]}; the items are in the last AI reply
+        msgs = res.get("messages")
+        if isinstance(msgs, list) and msgs:
+            last_ai = next((m for m in reversed(msgs) if isinstance(m, AIMessage)), None)
+            if last_ai is not None and isinstance(last_ai.content, str):
+                return _extract_json_dict(last_ai.content)
         return res
     if hasattr(res, "model_dump"):
         try:
@@ -72,14 +81,13 @@ def make_generators(diet_agent, strength_agent, cardio_agent, tracer):
     @tool("diet_generate")
     async def diet_generate(user_profile: dict, goal: dict, existing_tasks_summary: dict | None = None) -> dict:
         """Generate diet/nutrition tasks. Inputs: user_profile, goal, existing_tasks_summary? -> {items}. Returns a JSON dict with key 'items'."""
-        import json as _json
-        payload = {"user_profile": user_profile, "goal": goal, "existing_tasks_summary": existing_tasks_summary or None}
-        ctx = _json.dumps(payload, default=str)
+        ctx = encode_context("diet", user_profile, goal, existing_tasks_summary)
         # ReAct sub-agent invocation via messages; fallback to legacy context_json
-        try:
-            res = await diet_agent.ainvoke({"messages": [HumanMessage(content=f"CONTEXT:\n{ctx}")]}, config={"callbacks": [tracer]})
-        except Exception:
-            res = await diet_agent.ainvoke({"context_json": ctx}, config={"callbacks": [tracer]})
+        with agent_scope("diet"):
+            try:
+                res = await diet_agent.ainvoke({"messages": [HumanMessage(content=f"CONTEXT:\n{ctx}")]}, config={"callbacks": [tracer]})
+            except Exception:
+                res = await diet_agent.ainvoke({"context_json": ctx}, config={"callbacks": [tracer]})
         out = _normalize_output(res)
         try:
             model = ItemsModel.model_validate(out)
@@ -89,19 +97,19 @@ def make_generators(diet_agent, strength_agent, cardio_agent, tracer):
         if not isinstance(out, dict) or not out.get("items"):
             raw = getattr(res, "content", None) if isinstance(res, AIMessage) else (res if isinstance(res, str) else None)
             snippet = (raw[:300] + "…") if isinstance(raw, str) and len(raw) > 300 else (raw or "<non-text>")
-            print(f"[DEBUG] diet_generate empty items; raw= {snippet}")
+            logger.warning("diet_generate empty items; raw= {}", snippet)
+        GENERATION_ITEMS.labels("diet").observe(len(out.get("items") or []) if isinstance(out, dict) else 0)
         return out
 
     @tool("strength_generate")
     async def strength_generate(user_profile: dict, goal: dict, existing_tasks_summary: dict | None = None) -> dict:
         """Generate strength/resistance training tasks. Inputs: user_profile, goal, existing_tasks_summary? -> {items}. Returns a JSON dict with key 'items'."""
-        import json as _json
-        payload = {"user_profile": user_profile, "goal": goal, "existing_tasks_summary": existing_tasks_summary or None}
-        ctx = _json.dumps(payload, default=str)
-        try:
-            res = await strength_agent.ainvoke({"messages": [HumanMessage(content=f"CONTEXT:\n{ctx}")]}, config={"callbacks": [tracer]})
-        except Exception:
-            res = await strength_agent.ainvoke({"context_json": ctx}, config={"callbacks": [tracer]})
+        ctx = encode_context("strength", user_profile, goal, existing_tasks_summary)
+        with agent_scope("strength"):
+            try:
+                res = await strength_agent.ainvoke({"messages": [HumanMessage(content=f"CONTEXT:\n{ctx}")]}, config={"callbacks": [tracer]})
+            except Exception:
+                res = await strength_agent.ainvoke({"context_json": ctx}, config={"callbacks": [tracer]})
         out = _normalize_output(res)
         try:
             model = ItemsModel.model_validate(out)
@@ -111,19 +119,19 @@ def make_generators(diet_agent, strength_agent, cardio_agent, tracer):
         if not isinstance(out, dict) or not out.get("items"):
             raw = getattr(res, "content", None) if isinstance(res, AIMessage) else (res if isinstance(res, str) else None)
             snippet = (raw[:300] + "…") if isinstance(raw, str) and len(raw) > 300 else (raw or "<non-text>")
-            print(f"[DEBUG] strength_generate empty items; raw= {snippet}")
+            logger.warning("strength_generate empty items; raw= {}", snippet)
+        GENERATION_ITEMS.labels("strength").observe(len(out.get("items") or []) if isinstance(out, dict) else 0)
         return out
 
     @tool("cardio_generate")
     async def cardio_generate(user_profile: dict, goal: dict, existing_tasks_summary: dict | None = None) -> dict:
         """Generate cardio tasks. Inputs: user_profile, goal, existing_tasks_summary? -> {items}. Returns a JSON dict with key 'items'."""
-        import json as _json
-        payload = {"user_profile": user_profile, "goal": goal, "existing_tasks_summary": existing_tasks_summary or None}
-        ctx = _json.dumps(payload, default=str)
-        try:
-            res = await cardio_agent.ainvoke({"messages": [HumanMessage(content=f"CONTEXT:\n{ctx}")]}, config={"callbacks": [tracer]})
-        except Exception:
-            res = await cardio_agent.ainvoke({"context_json": ctx}, config={"callbacks": [tracer]})
+        ctx = encode_context("cardio", user_profile, goal, existing_tasks_summary)
+        with agent_scope("cardio"):
+            try:
+                res = await cardio_agent.ainvoke({"messages": [HumanMessage(content=f"CONTEXT:\n{ctx}")]}, config={"callbacks": [tracer]})
+            except Exception:
+                res = await cardio_agent.ainvoke({"context_json": ctx}, config={"callbacks": [tracer]})
         out = _normalize_output(res)
         try:
             model = ItemsModel.model_validate(out)
@@ -133,7 +141,8 @@ def make_generators(diet_agent, strength_agent, cardio_agent, tracer):
         if not isinstance(out, dict) or not out.get("items"):
             raw = getattr(res, "content", None) if isinstance(res, AIMessage) else (res if isinstance(res, str) else None)
             snippet = (raw[:300] + "…") if isinstance(raw, str) and len(raw) > 300 else (raw or "<non-text>")
-            print(f"[DEBUG] cardio_generate empty items; raw= {snippet}")
+            logger.warning("cardio_generate empty items; raw= {}", snippet)
+        GENERATION_ITEMS.labels("cardio").observe(len(out.get("items") or []) if isinstance(out, dict) else 0)
         return out
 
     return diet_generate, strength_generate, cardio_generate
@@ -1,32 +1,73 @@
 # app/tools/goals_mcp.py
-from typing import Any, Dict, Tuple
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
 from langchain_core.tools import tool
 from app.agents.context import CURRENT_JWT, CURRENT_GOAL_ID
+from app.dependencies.deadline import DeadlineExceeded, with_deadline
+from app.observability.metrics import MCP_TOOL_LATENCY
+from app.tools.tool_cache import GOALS_TOOL_CACHE, ToolResultCache, user_key_from_jwt
 
 
-def make_goals_mcp_tools(goals_tool_map: Dict[str, Any]) -> Tuple[Any, Any]:
+def make_goals_mcp_tools(
+    goals_tool_map: Dict[str, Any],
+    *,
+    cache: Optional[ToolResultCache] = GOALS_TOOL_CACHE,
+    tracer: Any = None,
+) -> Tuple[Any, Any]:
     """Return LangChain tool wrappers for the MCP Goals server tools.
 
     Tools returned:
     - mcp_get_goals(limit: int = 20) -> dict
     - mcp_get_goal_tasks(goal_id: str, limit: int = 50) -> dict
+
+    Each MCP round-trip is bounded by the remaining request budget (CURRENT_DEADLINE).
+    Results are cached per (user, tool, args) for a short TTL; hits/misses are reported
+    to the tracer (record_cache) when it supports it. Latency of both is recorded in
+    coach_mcp_tool_duration_seconds{tool, cache}.
     """
 
+    async def _timed(tool_name: str, fetch: Callable[[], Awaitable[dict]]) -> dict:
+        with MCP_TOOL_LATENCY.labels(tool_name, "miss" if cache is not None else "off").time():
+            return await fetch()
+
+    async def _cached(jwt: str, tool_name: str, args: Dict[str, Any], fetch: Callable[[], Awaitable[dict]]) -> dict:
+        if cache is None:
+            return await _timed(tool_name, fetch)
+        user = user_key_from_jwt(jwt)
+        t0 = time.perf_counter()
+        hit, value = cache.get(user, tool_name, args)
+        if tracer is not None and hasattr(tracer, "record_cache"):
+            tracer.record_cache(tool_name, hit)
+        if hit:
+            MCP_TOOL_LATENCY.labels(tool_name, "hit").observe(time.perf_counter() - t0)
+            return value
+        value = await _timed(tool_name, fetch)
+        cache.set(user, tool_name, args, value)
+        return value
+
     @tool("get_goals")
     async def mcp_get_goals(limit: int = 20) -> dict:
         """Fetch the current user's goals via MCP (RLS enforced). Returns {items, count, next_cursor, as_of, truncated}."""
         jwt = CURRENT_JWT.get()
         if not jwt:
             raise PermissionError("jwt_missing: user JWT is required for RLS; please reauthenticate(client)")
-        try:
+        async def _fetch() -> dict:
             tool_impl = goals_tool_map.get("get_goals")
             if tool_impl is None:
                 raise RuntimeError("mcp_tool_not_found: goals.get_goals not available")
-            result = await tool_impl.ainvoke(
-                {"args": {"limit": int(limit), "jwt": jwt}},
-                config={"metadata": {"Authorization": f"Bearer {jwt}"}},
+            result = await with_deadline(
+                tool_impl.ainvoke(
+                    {"args": {"limit": int(limit), "jwt": jwt}},
+                    config={"metadata": {"Authorization": f"Bearer {jwt}"}},
+                ),
+                "mcp:get_goals",
             )
             return result if isinstance(result, dict) else {"items": result or [], "count": len(result or []), "next_cursor": None, "as_of": None, "truncated": False}
+
+        try:
+            return await _cached(jwt, "get_goals", {"limit": int(limit)}, _fetch)
+        except DeadlineExceeded:
+            raise
         except Exception as e:
             raise RuntimeError(f"mcp:get_goals_failed: {e}")
 
@@ -39,15 +80,23 @@ def make_goals_mcp_tools(goals_tool_map: Dict[str, Any]) -> Tuple[Any, Any]:
             raise PermissionError("jwt_missing: user JWT is required for RLS; please reauthenticate")
         if not gid:
             raise ValueError("goal_id_missing: a goal_id must be provided or set in context")
-        try:
+        async def _fetch() -> dict:
             tool_impl = goals_tool_map.get("get_goal_tasks")
             if tool_impl is None:
                 raise RuntimeError("mcp_tool_not_found: goals.get_goal_tasks not available")
-            result = await tool_impl.ainvoke(
-                {"args": {"goal_id": gid, "limit": int(limit), "jwt": jwt}},
-                config={"metadata": {"Authorization": f"Bearer {jwt}"}},
+            result = await with_deadline(
+                tool_impl.ainvoke(
+                    {"args": {"goal_id": gid, "limit": int(limit), "jwt": jwt}},
+                    config={"metadata": {"Authorization": f"Bearer {jwt}"}},
+                ),
+                "mcp:get_goal_tasks",
             )
             return result if isinstance(result, dict) else {"items": result or [], "count": len(result or []), "next_cursor": None, "as_of": None, "truncated": False}
+
+        try:
+            return await _cached(jwt, "get_goal_tasks", {"goal_id": gid, "limit": int(limit)}, _fetch)
+        except DeadlineExceeded:
+            raise
         except Exception as e:
             raise RuntimeError(f"mcp:get_goal_tasks_failed: {e}")
 
@@ -0,0 +1,83 @@
+# app/tools/tool_cache.py
+import hashlib
+import json
+import os
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+from cachetools import TTLCache
+from jose import jwt as jose_jwt
+
+TOOL_CACHE_TTL_S = float(os.getenv("TOOL_CACHE_TTL_S", "30"))
+TOOL_CACHE_MAX_ENTRIES = int(os.getenv("TOOL_CACHE_MAX_ENTRIES", "2048"))
+
+
+def user_key_from_jwt(token: str) -> str:
+    """Cache partition for a JWT: its `sub` (the Supabase user id) or a hash of the token.
+
+    The signature is not verified here; the token is only used to partition the cache,
+    and Supabase still enforces RLS with it on every miss.
+    """
+    try:
+        sub = jose_jwt.get_unverified_claims(token).get("sub")
+        if isinstance(sub, str) and sub:
+            return sub
+    except Exception:
+        pass
+    return "jwt:" + hashlib.sha256(token.encode()).hexdigest()[:24]
+
+
+class ToolResultCache:
+    """Short-lived cache of read-tool results keyed by (user, tool, args).
+
+    Write paths call invalidate_user() so a user never reads their own stale data
+    from this process; the TTL bounds staleness for writes made elsewhere.
+    """
+
+    def __init__(self, *, ttl: float = TOOL_CACHE_TTL_S, maxsize: int = TOOL_CACHE_MAX_ENTRIES) -> None:
+        self._cache: TTLCache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def _key(user: str, tool: str, args: Dict[str, Any]) -> Tuple[str, str, str]:
+        return (user, tool, json.dumps(args, sort_keys=True, default=str))
+
+    def get(self, user: str, tool: str, args: Dict[str, Any]) -> Tuple[bool, Any]:
+        key = self._key(user, tool, args)
+        with self._lock:
+            if key in self._cache:
+                self.hits += 1
+                return True, self._cache[key]
+            self.misses += 1
+            return False, None
+
+    def set(self, user: str, tool: str, args: Dict[str, Any], value: Any) -> None:
+        with self._lock:
+            self._cache[self._key(user, tool, args)] = value
+
+    def invalidate_user(self, user: str, tool: Optional[str] = None) -> int:
+        """Drop cached results for a user (optionally only one tool). Returns entries removed."""
+        with self._lock:
+            doomed = [k for k in list(self._cache.keys()) if k[0] == user and (tool is None or k[1] == tool)]
+            for k in doomed:
+                self._cache.pop(k, None)
+            self.invalidations += 1
+            return len(doomed)
+
+    def snapshot(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._cache),
+            "ttl_s": self._cache.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            "invalidations": self.invalidations,
+        }
+
+
+# Process-wide cache for MCP goal/task reads (see app/tools/goals_mcp.py)
+GOALS_TOOL_CACHE = ToolResultCache()
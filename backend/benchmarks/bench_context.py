@@ -0,0 +1,79 @@
+# benchmarks/bench_context.py
+"""Prompt tokens and encode time: raw JSON payload vs compact per-domain context.
+
+For each fixture (profile row, goal row, optional existing-task summary) and each
+domain agent, compares the CONTEXT message built by `encode_context_raw` (the previous
+`json.dumps(payload, default=str)`) with `encode_context`, both on their own and
+together with the domain's system prompt. Token counts use app.agents.tokens (tiktoken
+when available, chars/4 otherwise). The prefill figure is an estimate, not a
+measurement: saved input tokens divided by an assumed --prefill-tps tokens/s.
+
+Usage (from backend/):
+    python -m benchmarks.bench_context --fixtures benchmarks/fixtures/agent_contexts.json
+"""
+import argparse
+import json
+import os
+import statistics
+import timeit
+
+from app.agents.context_encoder import encode_context, encode_context_raw
+from app.agents.prompts import CARDIO_AGENT_PROMPT, DIET_AGENT_PROMPT, STRENGTH_AGENT_PROMPT
+from app.agents.tokens import _encoder, count_tokens
+
+DOMAIN_PROMPTS = {"diet": DIET_AGENT_PROMPT, "strength": STRENGTH_AGENT_PROMPT, "cardio": CARDIO_AGENT_PROMPT}
+DEFAULT_FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures", "agent_contexts.json")
+
+
+def _encode_us(fn, repeat: int) -> float:
+    return min(timeit.repeat(fn, number=repeat, repeat=3)) / repeat * 1e6
+
+
+def run(fixtures_path: str, repeat: int, prefill_tps: float) -> None:
+    with open(fixtures_path) as f:
+        cases = json.load(f)
+    print(f"tokenizer: {'tiktoken' if _encoder() is not None else 'chars/4 estimate'}; fixtures: {len(cases)}")
+    print(f"{'case':<30}{'domain':<10}{'raw tok':>9}{'compact':>9}{'saved':>8}{'prompt saved':>14}{'raw us':>9}{'cmp us':>9}")
+    ctx_ratios, prompt_ratios, saved_tokens = [], [], []
+    for case in cases:
+        profile, goal, summary = case["user_profile"], case["goal"], case.get("existing_tasks_summary")
+        raw = encode_context_raw(profile, goal, summary)
+        raw_tok = count_tokens(f"CONTEXT:\n{raw}")
+        raw_us = _encode_us(lambda: encode_context_raw(profile, goal, summary), repeat)
+        for domain, prompt in DOMAIN_PROMPTS.items():
+            compact = encode_context(domain, profile, goal, summary)
+            cmp_tok = count_tokens(f"CONTEXT:\n{compact}")
+            cmp_us = _encode_us(lambda: encode_context(domain, profile, goal, summary), repeat)
+            sys_tok = count_tokens(prompt)
+            ctx_ratio = 1 - cmp_tok / raw_tok
+            prompt_ratio = 1 - (sys_tok + cmp_tok) / (sys_tok + raw_tok)
+            ctx_ratios.append(ctx_ratio)
+            prompt_ratios.append(prompt_ratio)
+            saved_tokens.append(raw_tok - cmp_tok)
+            print(
+                f"{case['name'][:29]:<30}{domain:<10}{raw_tok:>9}{cmp_tok:>9}{ctx_ratio:>7.0%}{prompt_ratio:>14.0%}"
+                f"{raw_us:>9.1f}{cmp_us:>9.1f}"
+            )
+    mean_saved = statistics.fmean(saved_tokens)
+    print(
+        f"\ncontext tokens saved: mean {statistics.fmean(ctx_ratios):.0%} (min {min(ctx_ratios):.0%}, max {max(ctx_ratios):.0%}); "
+        f"whole domain prompt: mean {statistics.fmean(prompt_ratios):.0%}"
+    )
+    print(
+        f"mean {mean_saved:.0f} input tokens saved per agent call (x2-3 agents per goal)\n"
+        f"estimated prefill time saved (token count / assumed {prefill_tps:.0f} tok/s, not measured): "
+        f"{mean_saved / prefill_tps * 1000:.1f} ms per call"
+    )
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--fixtures", default=DEFAULT_FIXTURES)
+    ap.add_argument("--repeat", type=int, default=2000, help="encodes per timing sample")
+    ap.add_argument("--prefill-tps", type=float, default=5000.0, help="assumed input tokens/s for the prefill estimate")
+    args = ap.parse_args()
+    run(args.fixtures, args.repeat, args.prefill_tps)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+# benchmarks/bench_logging.py
+"""Chat-turn throughput with the old print() logging vs the queued loguru pipeline.
+
+Simulates --turns chat turns on one event loop, --concurrency at a time. Each turn
+awaits --io-ms of simulated I/O and emits what a supervisor turn used to print: the
+debug lines, a 20-message transcript, the router/prefetch/usage lines and a trace
+summary. The sink is a stream whose every write blocks for --write-us (a pipe or log
+driver under load), which is where synchronous print() stalls the event loop.
+
+Modes:
+    print          the previous behaviour: every line printed synchronously
+    loguru-sync    the new call sites at --level (INFO), transcript sampled, enqueue off
+    loguru-queue   the same with enqueue on (the default): writes happen on loguru's thread
+
+Usage (from backend/):
+    python -m benchmarks.bench_logging --turns 500 --concurrency 20 --write-us 200
+"""
+import argparse
+import asyncio
+import time
+
+from loguru import logger
+
+from app.agents.utils.tracing import sampled
+from app.observability.log import configure_logging
+
+TRANSCRIPT_LINES = 20
+
+
+class SlowStream:
+    """File-like sink where each write blocks (releasing the GIL) like a full pipe."""
+
+    def __init__(self, write_us: float) -> None:
+        self.write_s = write_us / 1e6
+        self.writes = 0
+
+    def write(self, text: str) -> int:
+        self.writes += 1
+        if self.write_s:
+            time.sleep(self.write_s)
+        return len(text)
+
+    def flush(self) -> None:
+        pass
+
+
+def _turn_print(i: int, out: SlowStream) -> None:
+    print(f"[DEBUG] invoking supervisor: user=u{i % 50} history_len=12 last_user=how should I train this week?", file=out)
+    print("[TRANSCRIPT] ---- agent conversation start ----", file=out)
+    for n in range(TRANSCRIPT_LINES):
+        print(f"[TRANSCRIPT] {n:02d} ai[supervisor]: message {n} of turn {i} " + "x" * 120, file=out)
+    print("[TRANSCRIPT] ---- agent conversation end ------", file=out)
+    print("[prefetch] injected=True read_tool_calls=0 fetch=0.120s exposed=0.000s", file=out)
+    print("[router] tier=full source=classifier reason=plan elapsed=2.31s", file=out)
+    print(f"[usage] POST /coach/chat user=u{i % 50} calls=3 in=2400 out=310 cost=0.0012", file=out)
+    print(f"[TRACE] trace=t{i} route=POST /coach/chat spans=14 duration=2310ms errors=0", file=out)
+
+
+def _turn_loguru(i: int, transcript_rate: float) -> None:
+    logger.debug("invoking supervisor: user={} history_len={} last_user={}", f"u{i % 50}", 12, "how should I train this week?")
+    if sampled(f"t{i}", transcript_rate):
+        lines = [f"{n:02d} ai[supervisor]: message {n} of turn {i} " + "x" * 120 for n in range(TRANSCRIPT_LINES)]
+        logger.info("agent transcript (last {} messages)\n{}", TRANSCRIPT_LINES, "\n".join(lines))
+    logger.debug("prefetch injected={} read_tool_calls={} fetch={:.3f}s exposed={:.3f}s", True, 0, 0.12, 0.0)
+    logger.info("router tier={} source={} reason={} elapsed={:.2f}s", "full", "classifier", "plan", 2.31)
+    logger.info("usage route={} user={} {}", "POST /coach/chat", f"u{i % 50}", "calls=3 in=2400 out=310 cost=0.0012")
+    logger.info("trace={} route={} spans={} duration={}ms errors={}", f"t{i}", "POST /coach/chat", 14, 2310, 0)
+
+
+async def _run(mode: str, turns: int, concurrency: int, io_s: float, out: SlowStream, transcript_rate: float) -> float:
+    sem = asyncio.Semaphore(concurrency)
+    blocked = [0.0]
+
+    async def turn(i: int) -> None:
+        async with sem:
+            await asyncio.sleep(io_s)
+            t0 = time.perf_counter()
+            if mode == "print":
+                _turn_print(i, out)
+            else:
+                _turn_loguru(i, transcript_rate)
+            blocked[0] += time.perf_counter() - t0
+
+    await asyncio.gather(*(turn(i) for i in range(turns)))
+    return blocked[0]
+
+
+def run(turns: int, concurrency: int, io_ms: float, write_us: float, transcript_rate: float, level: str) -> None:
+    print(
+        f"turns={turns} concurrency={concurrency} io={io_ms:.0f}ms/turn write={write_us:.0f}us/write "
+        f"transcript_sample={transcript_rate} level={level}"
+    )
+    print(f"{'mode':<14}{'turns/s':>10}{'loop blocked ms/turn':>22}{'sink writes':>13}{'drain ms':>10}")
+    for mode in ("print", "loguru-sync", "loguru-queue"):
+        out = SlowStream(write_us)
+        if mode != "print":
+            configure_logging(level=level, levels="", fmt="text", enqueue=mode == "loguru-queue", sink=out)
+        t0 = time.perf_counter()
+        blocked = asyncio.run(_run(mode, turns, concurrency, io_ms / 1000, out, transcript_rate))
+        wall = time.perf_counter() - t0
+        t1 = time.perf_counter()
+        if mode != "print":
+            logger.remove()  # waits for the queue to drain
+        drain_ms = (time.perf_counter() - t1) * 1000
+        print(f"{mode:<14}{turns / wall:>10.1f}{blocked / turns * 1000:>22.3f}{out.writes:>13}{drain_ms:>10.0f}")
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--turns", type=int, default=500)
+    ap.add_argument("--concurrency", type=int, default=20)
+    ap.add_argument("--io-ms", type=float, default=20.0, help="simulated awaited I/O per turn")
+    ap.add_argument("--write-us", type=float, default=200.0, help="blocking time of each sink write")
+    ap.add_argument("--transcript-rate", type=float, default=0.01, help="LOG_TRANSCRIPT_SAMPLE_RATE for the loguru modes")
+    ap.add_argument("--level", default="INFO", help="LOG_LEVEL for the loguru modes (DEBUG keeps every line)")
+    args = ap.parse_args()
+    run(args.turns, args.concurrency, args.io_ms, args.write_us, args.transcript_rate, args.level)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+# benchmarks/bench_memory.py
+"""Long-term memory retrieval latency on a large per-user index.
+
+Builds a VectorIndex of N random unit vectors in a temp directory (appended in batches,
+as background indexing would), reopens it from disk (memmap), then times top-k search
+and end-to-end retrieval with the deterministic HashingEmbedder.
+
+Usage (from backend/):
+    python -m benchmarks.bench_memory --vectors 100000 --dim 256 --queries 200 --k 4
+"""
+import argparse
+import asyncio
+import statistics
+import tempfile
+import time
+
+import numpy as np
+
+from app.agents.long_term_memory import HashingEmbedder, LongTermMemory, VectorIndex
+
+
+def _pct(values, q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000
+
+
+async def run(n: int, dim: int, queries: int, k: int, batch: int) -> None:
+    rng = np.random.default_rng(0)
+    embedder = HashingEmbedder(dim)
+    with tempfile.TemporaryDirectory() as root:
+        memory = LongTermMemory(embedder=embedder, root=root, enabled=True, top_k=k, min_score=-1.0)
+        idx = memory.index_for("bench-user")
+
+        t0 = time.perf_counter()
+        for start in range(0, n, batch):
+            size = min(batch, n - start)
+            vecs = rng.standard_normal((size, dim)).astype(np.float32)
+            vecs /= np.linalg.norm(vecs, axis=1, keepdims=True)
+            metas = [{"id": f"m{start + i}", "text": f"message {start + i}", "created_at": "2030-01-01T00:00:00Z"} for i in range(size)]
+            idx.append(vecs, metas)
+        append_s = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        reopened = VectorIndex(idx.path, dim=dim, embedder_name=embedder.name)
+        reopened.search(rng.standard_normal(dim).astype(np.float32), k)  # maps the file
+        open_s = time.perf_counter() - t0
+
+        search_times = []
+        for _ in range(queries):
+            q = rng.standard_normal(dim).astype(np.float32)
+            q /= np.linalg.norm(q)
+            t = time.perf_counter()
+            reopened.search(q, k)
+            search_times.append(time.perf_counter() - t)
+
+        e2e_times = []
+        for i in range(queries):
+            t = time.perf_counter()
+            await memory.retrieve("bench-user", f"my left knee hurts when I squat, week {i}")
+            e2e_times.append(time.perf_counter() - t)
+
+    print(f"vectors={n} dim={dim} k={k} queries={queries} ({n * dim * 4 / 1e6:.0f} MB on disk)")
+    print(f"append: {append_s:.2f}s total, {n / append_s:,.0f} vectors/s (batch={batch})")
+    print(f"reopen + first search: {open_s * 1000:.1f} ms")
+    print(f"{'':<22}{'p50 ms':>9}{'p95 ms':>9}{'mean ms':>9}")
+    for label, times in (("search", search_times), ("retrieve (embed+search)", e2e_times)):
+        print(f"{label:<22}{_pct(times, 0.5):>9.2f}{_pct(times, 0.95):>9.2f}{statistics.fmean(times) * 1000:>9.2f}")
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--vectors", type=int, default=100_000)
+    ap.add_argument("--dim", type=int, default=256)
+    ap.add_argument("--queries", type=int, default=200)
+    ap.add_argument("--k", type=int, default=4)
+    ap.add_argument("--batch", type=int, default=1000)
+    args = ap.parse_args()
+    asyncio.run(run(args.vectors, args.dim, args.queries, args.k, args.batch))
+
+
+if __name__ == "__main__":
+    main()
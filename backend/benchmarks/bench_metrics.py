@@ -0,0 +1,97 @@
+# benchmarks/bench_metrics.py
+"""Per-observation cost of the metrics registry on the hot path.
+
+Times, in ns per call: a histogram observe on a cached child, the same with the label
+lookup (`labels(...).observe`, what the middleware and callbacks do), a gauge inc/dec
+pair, the Supabase observe_supabase context manager, and LatencyWindow.observe for
+reference. Also renders a registry with --series labelled series per histogram and
+reports the scrape time. --threads runs the labelled observe from several threads at
+once to show lock contention.
+
+Usage (from backend/):
+    python -m benchmarks.bench_metrics
+    python -m benchmarks.bench_metrics --threads 4
+"""
+import argparse
+import itertools
+import random
+import threading
+import time
+import timeit
+
+from app.agents.utils.stats import LatencyWindow
+from app.observability.metrics import Gauge, Histogram, Registry, observe_supabase
+
+
+def _ns(fn, number: int) -> float:
+    return min(timeit.repeat(fn, number=number, repeat=5)) / number * 1e9
+
+
+def _threaded_ns(fn, number: int, threads: int) -> float:
+    barrier = threading.Barrier(threads + 1)
+
+    def worker() -> None:
+        barrier.wait()
+        for _ in range(number):
+            fn()
+
+    pool = [threading.Thread(target=worker) for _ in range(threads)]
+    for t in pool:
+        t.start()
+    barrier.wait()
+    t0 = time.perf_counter()
+    for t in pool:
+        t.join()
+    return (time.perf_counter() - t0) / (number * threads) * 1e9
+
+
+def run(number: int, series: int, threads: int) -> None:
+    hist = Histogram("bench_seconds", "bench", ("route", "status"))
+    gauge = Gauge("bench_in_flight", "bench")
+    child = hist.labels("/coach/chat", "200")
+    window = LatencyWindow()
+    samples = [random.lognormvariate(-2, 1.5) for _ in range(1024)]
+    it = itertools.cycle(samples)
+    url = "https://example.supabase.co/rest/v1/tasks?select=*&goal_id=eq.1"
+
+    def supabase() -> None:
+        with observe_supabase("GET", url) as obs:
+            obs.status = 200
+
+    rows = [
+        ("baseline (next sample only)", lambda: next(it)),
+        ("histogram child.observe", lambda: child.observe(next(it))),
+        ("histogram labels(...).observe", lambda: hist.labels("/coach/chat", "200").observe(next(it))),
+        ("gauge inc + dec", lambda: (gauge.labels().inc(), gauge.labels().dec())),
+        ("observe_supabase block", supabase),
+        ("LatencyWindow.observe (reference)", lambda: window.observe(next(it))),
+    ]
+    print(f"{'operation':<36}{'ns/op':>10}")
+    for name, fn in rows:
+        print(f"{name:<36}{_ns(fn, number):>10.0f}")
+    if threads > 1:
+        ns = _threaded_ns(lambda: hist.labels("/coach/chat", "200").observe(0.05), number, threads)
+        print(f"{f'labels(...).observe x{threads} threads':<36}{ns:>10.0f}  (wall ns per op, GIL-bound)")
+
+    registry = Registry()
+    for i in range(4):
+        h = registry.register(Histogram(f"bench_{i}_seconds", "bench", ("route", "status")))
+        for s in range(series):
+            h.labels(f"/route/{s}", "200").observe(0.1)
+    t0 = time.perf_counter()
+    text = registry.render()
+    ms = (time.perf_counter() - t0) * 1000
+    print(f"\nrender: 4 histograms x {series} series -> {len(text.splitlines())} lines, {len(text) / 1024:.0f} KiB in {ms:.1f} ms")
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--number", type=int, default=200_000, help="calls per timing sample")
+    ap.add_argument("--series", type=int, default=50, help="labelled series per histogram for the render timing")
+    ap.add_argument("--threads", type=int, default=1)
+    args = ap.parse_args()
+    run(args.number, args.series, args.threads)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,320 @@
+# benchmarks/bench_orchestration.py
+"""Microbenchmarks of the orchestration around the LLM calls (framework + our code).
+
+Every chat model is a zero-latency ScriptedChatModel wired with the same callbacks as
+FitnessCoach (tracer, accounting, deadline guard), so the timings are pure CPU cost of
+LangChain/LangGraph plumbing, JSON extraction, pydantic validation and our message
+handling. Scenarios (select with --filter):
+
+    json/*              _extract_json_dict on plain, fenced and prose-wrapped output;
+                        ItemsModel validation of a domain agent's items
+    generate/*          FitnessCoach.generate_tasks_direct with 1, 2 and 3 domain agents
+    generator-tool/*    one generator tool call (app/tools/generators.py)
+    history/*           ChatStore.to_lc_messages over 30/300 stored rows
+    turn/prep-*         ainvoke_chat's per-turn message building: unsummarized rows, full and
+                        fast history windows, trajectory + insert payloads
+    turn/transcript-*   the sampled transcript lines of a turn
+    fast/*              one fast-tier model call with 30/300 history messages
+    graph/*             supervisor turn answered directly (30/300 history) and a planning
+                        turn (supervisor -> goals_agent -> 3 generators)
+
+Each scenario is calibrated to ~--min-time seconds per round and run --repeat rounds;
+best and median microseconds per operation are reported. --save writes the results as
+a baseline; --compare prints the change against one and exits with status 1 when any
+scenario got slower than --threshold percent.
+
+Usage (from backend/):
+    python -m benchmarks.bench_orchestration --save bench-orchestration.json
+    python -m benchmarks.bench_orchestration --compare bench-orchestration.json --threshold 10
+    python -m benchmarks.bench_orchestration --filter generate/ --repeat 10
+"""
+import argparse
+import asyncio
+import inspect
+import json
+import platform
+import statistics
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from importlib.metadata import version
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage, ToolMessage
+from langgraph.prebuilt import create_react_agent
+
+from app.agents.client import FitnessCoach, build_supervisor_graph
+from app.agents.graph import _transcript_lines
+from app.agents.prompts import CARDIO_AGENT_PROMPT, DIET_AGENT_PROMPT, FAST_COACH_PROMPT, STRENGTH_AGENT_PROMPT
+from app.agents.schemas import ItemsModel
+from app.agents.summary import summary_message, unsummarized
+from app.agents.tokens import history_budget, with_token_count
+from app.agents.trajectory import trajectory_to_persist
+from app.dependencies.chat_store import ChatStore, _from_lc_message
+from app.observability.log import configure_logging
+from app.tools.generators import _extract_json_dict, make_generators
+from benchmarks.fakes import (
+    ScriptedChatModel,
+    _sample_items,
+    domain_policy,
+    generator_caller_policy,
+    supervisor_policy,
+)
+
+HISTORY_SIZES = (30, 300)
+GOAL_TYPES = {1: "healthy_lifestyle", 2: "fat_loss", 3: "build_muscle"}
+PROFILE = {
+    "id": "user-1", "sex": "female", "dob": "1992-04-01", "height_cm": 168, "weight_kg": 64,
+    "unit_pref": "metric", "activity_level": "moderate", "fitness_level": "intermediate",
+    "injuries": "none", "timezone": "Europe/Berlin", "availability_days": [1, 3, 5],
+}
+REPLY = "Keep most runs easy and conversational, and add one interval session per week. " * 3
+
+
+# --- Fixtures ----------------------------------------------------------------
+
+def _items_json(domain: str, n: int = 6) -> str:
+    return json.dumps(_sample_items(domain, n))
+
+
+def history_rows(n: int) -> List[Dict[str, Any]]:
+    """n stored message rows; every fifth exchange carries a tool call and its result."""
+    base = datetime(2030, 1, 1, tzinfo=timezone.utc)
+    rows: List[Dict[str, Any]] = []
+    i = 0
+    while len(rows) < n:
+        ts = (base + timedelta(minutes=len(rows))).isoformat()
+        if i % 5 == 4:
+            call_id = f"call_{i}"
+            rows.append({"role": "assistant", "content": with_token_count(
+                {"text": "", "tool_calls": [{"id": call_id, "name": "get_goal_tasks", "args": {"goal_id": "goal-1"}}]})})
+            rows.append({"role": "tool", "content": with_token_count(
+                {"text": _items_json("cardio", 4), "tool_call_id": call_id, "name": "get_goal_tasks"})})
+        else:
+            role = "user" if i % 2 == 0 else "assistant"
+            text = "How should I pace my long run this weekend?" if role == "user" else REPLY
+            rows.append({"role": role, "content": with_token_count({"text": text})})
+        rows[-1].update(id=str(uuid.uuid4()), created_at=ts)
+        i += 1
+    return rows[:n]
+
+
+def history_messages(n: int) -> List[BaseMessage]:
+    return ChatStore(user_token="bench").to_lc_messages(history_rows(n))
+
+
+def turn_messages() -> Tuple[List[BaseMessage], AIMessage]:
+    """What the supervisor graph returns after the user's message on a tool-using turn."""
+    call = {"name": "get_goal_tasks", "args": {"goal_id": "goal-1"}, "id": "call_t", "type": "tool_call"}
+    final = AIMessage(content=REPLY, name="supervisor")
+    return [
+        AIMessage(content="", tool_calls=[call], name="supervisor"),
+        ToolMessage(content=_items_json("cardio", 8), tool_call_id="call_t", name="get_goal_tasks"),
+        final,
+    ], final
+
+
+class Harness:
+    """FitnessCoach wired with zero-latency fakes (no MCP, no network)."""
+
+    def __init__(self) -> None:
+        self.coach = FitnessCoach(model_factory=self._model)
+        callbacks = [self.coach.tracer, self.coach.accounting]
+        agents = []
+        for domain, prompt in (("diet", DIET_AGENT_PROMPT), ("strength", STRENGTH_AGENT_PROMPT), ("cardio", CARDIO_AGENT_PROMPT)):
+            model = self.coach.model_factory(f"{domain}_agent", "fake", callbacks=callbacks)
+            agents.append(create_react_agent(model=model, tools=[], name=f"{domain}_agent", prompt=prompt))
+        self.coach.diet_agent, self.coach.strength_agent, self.coach.cardio_agent = agents
+        self.generators = list(make_generators(*agents, self.coach.tracer))
+        self.fast_chat = self.coach.model_factory("fast", "fake", callbacks=callbacks)
+        self.supervisor, _ = build_supervisor_graph(
+            self.coach.model_factory("full", "fake", callbacks=callbacks),
+            self.coach.model_factory("goals_agent", "fake", callbacks=callbacks),
+            [],
+            self.generators,
+        )
+        self.store = ChatStore(user_token="bench")
+
+    @staticmethod
+    def _model(role: str, model: str, **kwargs: Any) -> ScriptedChatModel:
+        if role.endswith("_agent") and role != "goals_agent":
+            policy = domain_policy(role[: -len("_agent")])
+        elif role == "goals_agent":
+            policy = generator_caller_policy("build_muscle")
+        elif role == "full":
+            def policy(messages: List[BaseMessage]) -> AIMessage:
+                last = next((m for m in reversed(messages) if isinstance(m, HumanMessage)), None)
+                if last is not None and "plan" in str(last.content):
+                    return supervisor_policy(messages)
+                return AIMessage(content=REPLY)
+        else:
+            def policy(messages: List[BaseMessage]) -> AIMessage:
+                return AIMessage(content=REPLY)
+        return ScriptedChatModel(policy=policy, label=role, callbacks=kwargs.get("callbacks"))
+
+    def turn_prep(self, rows: List[Dict[str, Any]]) -> Tuple[List[BaseMessage], List[Dict[str, Any]]]:
+        # Mirrors CoachService.ainvoke_chat between loading the rows and persisting the reply
+        pending = unsummarized(rows, rows[len(rows) // 4]["created_at"])
+        history = self.store.to_lc_messages(pending, token_budget=history_budget("full"))
+        self.store.to_lc_messages(pending, token_budget=history_budget("fast"))
+        input_messages = [summary_message("User trains for a 10k."), *history, HumanMessage(content="and tomorrow?")]
+        turn, final = turn_messages()
+        payload = []
+        for m in [*trajectory_to_persist(turn, final), final]:
+            mapped = _from_lc_message(m)
+            payload.append({"role": mapped["role"], "content": with_token_count(mapped["content"])})
+        return input_messages, payload
+
+
+def scenarios(h: Harness) -> Dict[str, Callable[[], Any]]:
+    """name -> zero-arg callable (sync, or returning an awaitable)."""
+    items = _items_json("diet")
+    fenced = f"Here is the plan:\n```json\n{items}\n```\nLet me know!"
+    prose = f"Sure, these tasks fit your goal. {items} Stay consistent."
+    goal = {"id": "goal-1", "type": "build_muscle", "target_value": 5, "target_date": "2030-06-01", "status": "active"}
+    out: Dict[str, Callable[[], Any]] = {
+        "json/extract-plain": lambda: _extract_json_dict(items),
+        "json/extract-fenced": lambda: _extract_json_dict(fenced),
+        "json/extract-prose": lambda: _extract_json_dict(prose),
+        "json/validate-items": lambda: ItemsModel.model_validate(json.loads(items)).model_dump(),
+    }
+    for n, goal_type in GOAL_TYPES.items():
+        out[f"generate/{n}-domain"] = (
+            lambda gt=goal_type: h.coach.generate_tasks_direct(user_profile=PROFILE, goal={**goal, "type": gt})
+        )
+    diet_tool = h.generators[0]
+    out["generator-tool/diet"] = lambda: diet_tool.ainvoke({"user_profile": PROFILE, "goal": goal})
+    for n in HISTORY_SIZES:
+        rows = history_rows(n)
+        msgs = h.store.to_lc_messages(rows)
+        fast_input = [SystemMessage(content=FAST_COACH_PROMPT), *[m for m in msgs if isinstance(m, (HumanMessage, AIMessage))]]
+        out[f"history/to-lc-{n}"] = lambda r=rows: h.store.to_lc_messages(r, token_budget=history_budget("full"))
+        out[f"turn/prep-{n}"] = lambda r=rows: h.turn_prep(r)
+        out[f"turn/transcript-{n}"] = lambda m=msgs: _transcript_lines(m)
+        out[f"fast/reply-{n}"] = lambda m=fast_input: h.fast_chat.ainvoke(
+            [*m, HumanMessage(content="thanks!")], config={"callbacks": [h.coach.tracer, h.coach.deadline_guard]}
+        )
+        out[f"graph/supervisor-reply-{n}"] = lambda m=msgs: h.supervisor.ainvoke(
+            {"messages": [*m, HumanMessage(content="how was my week?")]}
+        )
+    planning = history_messages(30)
+    out["graph/planning-turn"] = lambda: h.supervisor.ainvoke(
+        {"messages": [*planning, HumanMessage(content="please plan my next two weeks")]}
+    )
+    return out
+
+
+# --- Measurement -------------------------------------------------------------
+
+async def _loop(fn: Callable[[], Any], number: int) -> float:
+    t0 = time.perf_counter()
+    for _ in range(number):
+        res = fn()
+        if inspect.isawaitable(res):
+            await res
+    return time.perf_counter() - t0
+
+
+async def measure(fn: Callable[[], Any], *, repeat: int, min_time: float) -> Dict[str, Any]:
+    await _loop(fn, 1)  # warm caches (prompt templates, pydantic validators, regexes)
+    number = 1
+    while True:  # timeit-style autorange: 1, 2, 5, 10, 20, 50, ...
+        for k in (1, 2, 5):
+            if await _loop(fn, number * k) >= min_time:
+                number *= k
+                break
+        else:
+            number *= 10
+            continue
+        break
+    rounds = [await _loop(fn, number) / number * 1e6 for _ in range(repeat)]
+    return {"best_us": round(min(rounds), 2), "median_us": round(statistics.median(rounds), 2), "number": number}
+
+
+async def run(filters: List[str], repeat: int, min_time: float) -> Dict[str, Dict[str, Any]]:
+    h = Harness()
+    results = {}
+    for name, fn in scenarios(h).items():
+        if filters and not any(f in name for f in filters):
+            continue
+        results[name] = await measure(fn, repeat=repeat, min_time=min_time)
+        r = results[name]
+        print(f"{name:<30}{r['best_us']:>14.1f}{r['median_us']:>14.1f}{r['number']:>9}", flush=True)
+    return results
+
+
+def _meta(label: Optional[str]) -> Dict[str, Any]:
+    libs = {}
+    for pkg in ("langchain-core", "langgraph", "langgraph-supervisor", "pydantic"):
+        try:
+            libs[pkg] = version(pkg)
+        except Exception:
+            libs[pkg] = None
+    return {
+        "label": label,
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "libs": libs,
+    }
+
+
+def compare(current: Dict[str, Dict[str, Any]], baseline: Dict[str, Any], threshold_pct: float) -> int:
+    """Print best-of-rounds change per scenario; return how many regressed past the threshold."""
+    base = baseline.get("results", {})
+    meta = baseline.get("meta", {})
+    label = f" {meta['label']}" if meta.get("label") else ""
+    print(f"\nvs baseline{label} ({meta.get('created_at', '?')}, python {meta.get('python', '?')})")
+    print(f"{'scenario':<30}{'baseline us':>14}{'current us':>14}{'change':>10}")
+    regressions = 0
+    for name in sorted(set(base) | set(current)):
+        if name not in base or name not in current:
+            side = "new" if name not in base else "missing"
+            value = (current.get(name) or base.get(name))["best_us"]
+            print(f"{name:<30}{'-' if side == 'new' else value:>14}{value if side == 'new' else '-':>14}{side:>10}")
+            continue
+        old, new = base[name]["best_us"], current[name]["best_us"]
+        change = (new - old) / old * 100 if old else 0.0
+        flag = ""
+        if change > threshold_pct:
+            regressions += 1
+            flag = "  SLOWER"
+        elif change < -threshold_pct:
+            flag = "  faster"
+        print(f"{name:<30}{old:>14.1f}{new:>14.1f}{change:>+9.1f}%{flag}")
+    print(f"{regressions} scenario(s) slower than +{threshold_pct:.0f}%")
+    return regressions
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--filter", action="append", default=[], help="only scenarios containing this substring (repeatable)")
+    ap.add_argument("--repeat", type=int, default=5, help="timed rounds per scenario")
+    ap.add_argument("--min-time", type=float, default=0.2, help="minimum seconds per round (calibrates iterations)")
+    ap.add_argument("--save", help="write results to this JSON file (a baseline)")
+    ap.add_argument("--label", help="label stored with --save (e.g. a commit or branch)")
+    ap.add_argument("--compare", help="baseline JSON written by --save")
+    ap.add_argument("--threshold", type=float, default=10.0, help="percent slowdown that counts as a regression")
+    ap.add_argument("--log-level", default="WARNING", help="app log level during the run")
+    args = ap.parse_args()
+
+    configure_logging(level=args.log_level, levels="", fmt="text", enqueue=True)
+    print(f"{'scenario':<30}{'best us/op':>14}{'median us/op':>14}{'iters':>9}")
+    results = asyncio.run(run(args.filter, args.repeat, args.min_time))
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump({"meta": _meta(args.label), "results": results}, f, indent=2)
+        print(f"saved {len(results)} scenario(s) to {args.save}")
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if args.filter:
+            baseline["results"] = {
+                k: v for k, v in baseline.get("results", {}).items() if any(s in k for s in args.filter)
+            }
+        sys.exit(1 if compare(results, baseline, args.threshold) else 0)
+
+
+if __name__ == "__main__":
+    main()
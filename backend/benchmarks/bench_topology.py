@@ -0,0 +1,90 @@
+# benchmarks/bench_topology.py
+"""Compare LLM calls per turn and wall time: supervisor graph vs flattened graph.
+
+Both topologies are built with the same builders FitnessCoach uses
+(build_supervisor_graph / build_flat_graph) and scripted fake models, so the
+numbers reflect graph shape and orchestration overhead only.
+
+Usage (from backend/):
+    python -m benchmarks.bench_topology --turns 20 --latency 0.05 --goal-type build_muscle
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+from langchain_core.messages import HumanMessage
+from langgraph.prebuilt import create_react_agent
+
+from app.agents.client import build_flat_graph, build_supervisor_graph
+from app.agents.prompts import CARDIO_AGENT_PROMPT, DIET_AGENT_PROMPT, STRENGTH_AGENT_PROMPT
+from app.tools.generators import make_generators
+from benchmarks.fakes import (
+    CallCounter,
+    NullCallbackHandler,
+    ScriptedChatModel,
+    domain_policy,
+    generator_caller_policy,
+    supervisor_policy,
+)
+
+
+def _domain_agents(counter: CallCounter, latency: float):
+    agents = []
+    for domain, prompt in (("diet", DIET_AGENT_PROMPT), ("strength", STRENGTH_AGENT_PROMPT), ("cardio", CARDIO_AGENT_PROMPT)):
+        model = ScriptedChatModel(policy=domain_policy(domain), label=f"{domain}_agent", latency_s=latency, counter=counter)
+        agents.append(create_react_agent(model=model, tools=[], name=f"{domain}_agent", prompt=prompt))
+    return agents
+
+
+def build(topology: str, counter: CallCounter, latency: float, goal_type: str):
+    generators = list(make_generators(*_domain_agents(counter, latency), NullCallbackHandler()))
+    read_tools: list = []
+    if topology == "flat":
+        model = ScriptedChatModel(
+            policy=generator_caller_policy(goal_type, final_text="Created your plan."),
+            label="coach", latency_s=latency, counter=counter,
+        )
+        return build_flat_graph(model, read_tools, generators)
+    sup_model = ScriptedChatModel(policy=supervisor_policy, label="supervisor", latency_s=latency, counter=counter)
+    goals_model = ScriptedChatModel(policy=generator_caller_policy(goal_type), label="goals_agent", latency_s=latency, counter=counter)
+    graph, _ = build_supervisor_graph(sup_model, goals_model, read_tools, generators)
+    return graph
+
+
+async def run(topology: str, turns: int, latency: float, goal_type: str) -> dict:
+    counter = CallCounter()
+    graph = build(topology, counter, latency, goal_type)
+    msg = f"Please create tasks for my new {goal_type} goal."
+    await graph.ainvoke({"messages": [HumanMessage(content=msg)]})  # warm-up
+    counter.reset()
+    times = []
+    for _ in range(turns):
+        t0 = time.perf_counter()
+        await graph.ainvoke({"messages": [HumanMessage(content=msg)]})
+        times.append(time.perf_counter() - t0)
+    return {
+        "topology": topology,
+        "llm_calls_per_turn": counter.total / turns,
+        "calls_by_model": {k: v / turns for k, v in sorted(counter.calls.items())},
+        "p50_ms": statistics.median(times) * 1000,
+        "mean_ms": statistics.fmean(times) * 1000,
+    }
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--turns", type=int, default=20)
+    ap.add_argument("--latency", type=float, default=0.0, help="simulated seconds per LLM call")
+    ap.add_argument("--goal-type", default="fat_loss")
+    args = ap.parse_args()
+
+    rows = [asyncio.run(run(t, args.turns, args.latency, args.goal_type)) for t in ("supervisor", "flat")]
+    print(f"goal_type={args.goal_type} turns={args.turns} latency/call={args.latency * 1000:.0f}ms")
+    print(f"{'topology':<12}{'llm calls/turn':>16}{'p50 ms':>10}{'mean ms':>10}  calls by model")
+    for r in rows:
+        print(f"{r['topology']:<12}{r['llm_calls_per_turn']:>16.1f}{r['p50_ms']:>10.1f}{r['mean_ms']:>10.1f}  {r['calls_by_model']}")
+
+
+if __name__ == "__main__":
+    main()
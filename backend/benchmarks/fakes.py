@@ -0,0 +1,165 @@
+# benchmarks/fakes.py
+"""Scripted LangChain chat models for offline benchmarks (no network, configurable latency)."""
+import asyncio
+import json
+import time
+import uuid
+from typing import Any, Callable, Dict, List, Optional
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.runnables import RunnableLambda
+
+GENERATOR_TOOLS = {
+    "fat_loss": ["diet_generate", "cardio_generate"],
+    "build_muscle": ["strength_generate", "diet_generate", "cardio_generate"],
+    "healthy_lifestyle": ["diet_generate"],
+    "sculpt_flow": ["strength_generate", "cardio_generate", "diet_generate"],
+}
+
+
+class CallCounter:
+    """Counts model calls per label across all fakes sharing the instance."""
+
+    def __init__(self) -> None:
+        self.calls: Dict[str, int] = {}
+
+    def inc(self, label: str) -> None:
+        self.calls[label] = self.calls.get(label, 0) + 1
+
+    @property
+    def total(self) -> int:
+        return sum(self.calls.values())
+
+    def reset(self) -> None:
+        self.calls.clear()
+
+
+class ScriptedChatModel(BaseChatModel):
+    """Chat model whose reply is computed by `policy(messages)` after `latency_s`.
+
+    With `structured` set, with_structured_output(schema) returns a runnable yielding
+    `structured(schema, messages)` after the same latency.
+    """
+
+    policy: Callable[[List[BaseMessage]], AIMessage]
+    label: str = "fake"
+    latency_s: float = 0.0
+    counter: Optional[Any] = None
+    structured: Optional[Callable[[Any, List[BaseMessage]], Any]] = None
+
+    @property
+    def _llm_type(self) -> str:
+        return "scripted-fake"
+
+    def bind_tools(self, tools: Any, **kwargs: Any) -> "ScriptedChatModel":
+        return self
+
+    def _reply(self, messages: List[BaseMessage]) -> ChatResult:
+        if self.counter is not None:
+            self.counter.inc(self.label)
+        msg = self.policy(messages)
+        msg.usage_metadata = {"input_tokens": 0, "output_tokens": 0, "total_tokens": 0}
+        return ChatResult(generations=[ChatGeneration(message=msg)])
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        if self.latency_s:
+            time.sleep(self.latency_s)
+        return self._reply(messages)
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        if self.latency_s:
+            await asyncio.sleep(self.latency_s)
+        return self._reply(messages)
+
+    def with_structured_output(self, schema: Any, **kwargs: Any):
+        if self.structured is None:
+            return super().with_structured_output(schema, **kwargs)
+
+        def _parse(value: Any) -> Any:
+            if self.counter is not None:
+                self.counter.inc(self.label)
+            messages = value.to_messages() if hasattr(value, "to_messages") else value
+            return self.structured(schema, messages if isinstance(messages, list) else [])
+
+        def _invoke(value: Any) -> Any:
+            if self.latency_s:
+                time.sleep(self.latency_s)
+            return _parse(value)
+
+        async def _ainvoke(value: Any) -> Any:
+            if self.latency_s:
+                await asyncio.sleep(self.latency_s)
+            return _parse(value)
+
+        return RunnableLambda(_invoke, afunc=_ainvoke, name=f"{self.label}_structured")
+
+
+class NullCallbackHandler(BaseCallbackHandler):
+    """Stand-in for the tracer so benchmarks measure orchestration, not printing."""
+
+
+# --- Policies -------------------------------------------------------------
+
+def _since_last_human(messages: List[BaseMessage]) -> List[BaseMessage]:
+    idx = max((i for i, m in enumerate(messages) if isinstance(m, HumanMessage)), default=-1)
+    return messages[idx + 1:]
+
+
+def _tool_call(name: str, args: Dict[str, Any]) -> Dict[str, Any]:
+    return {"name": name, "args": args, "id": f"call_{uuid.uuid4().hex[:12]}", "type": "tool_call"}
+
+
+def _sample_items(domain: str, n: int = 2) -> Dict[str, Any]:
+    return {
+        "items": [
+            {
+                "title": f"{domain.title()} task {i + 1}",
+                "description": f"Do the {domain} thing number {i + 1} for 20 minutes.",
+                "due_at": f"2030-01-0{i + 2}T18:00:00Z",
+                "status": "pending",
+            }
+            for i in range(n)
+        ]
+    }
+
+
+def domain_policy(domain: str) -> Callable[[List[BaseMessage]], AIMessage]:
+    payload = json.dumps(_sample_items(domain))
+
+    def _policy(messages: List[BaseMessage]) -> AIMessage:
+        return AIMessage(content=payload)
+
+    return _policy
+
+
+def generator_caller_policy(goal_type: str = "fat_loss", *, final_text: Optional[str] = None):
+    """Call the generators for goal_type in one turn, then answer once their results are in."""
+    tools = GENERATOR_TOOLS.get(goal_type, GENERATOR_TOOLS["build_muscle"])
+    goal = {"id": "goal-1", "type": goal_type, "target_value": 5}
+    profile = {"id": "user-1", "fitness_level": "beginner", "timezone": "UTC"}
+
+    def _policy(messages: List[BaseMessage]) -> AIMessage:
+        recent = _since_last_human(messages)
+        results = [m for m in recent if isinstance(m, ToolMessage) and m.name in tools]
+        if not results:
+            return AIMessage(content="", tool_calls=[_tool_call(t, {"user_profile": profile, "goal": goal}) for t in tools])
+        merged: List[Any] = []
+        for m in results:
+            try:
+                merged.extend(json.loads(m.content).get("items", []))
+            except Exception:
+                pass
+        return AIMessage(content=final_text or json.dumps({"items": merged}))
+
+    return _policy
+
+
+def supervisor_policy(messages: List[BaseMessage]) -> AIMessage:
+    """Hand off to goals_agent once per turn, then reply when it has answered."""
+    recent = _since_last_human(messages)
+    if any(getattr(m, "name", None) == "goals_agent" and isinstance(m, AIMessage) for m in recent):
+        return AIMessage(content="Created your plan: 4 tasks over the next two weeks.")
+    return AIMessage(content="", tool_calls=[_tool_call("transfer_to_goals_agent", {})])
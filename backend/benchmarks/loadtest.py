@@ -0,0 +1,376 @@
+# benchmarks/loadtest.py
+"""Offline HTTP load test: the FastAPI app against a Supabase stand-in and fake chat models.
+
+The backend runs under uvicorn in its own thread, Supabase auth/PostgREST is
+benchmarks.supabase_stub (another thread, --db-latency per request), and every chat
+model is a ScriptedChatModel built through the coach's model factory (--llm-latency
+per call). Virtual users are seeded with a profile, an active goal with tasks and a
+home conversation of --history messages; --concurrency closed-loop clients, each
+owning its own users, then run the scenario over real HTTP for --requests iterations
+(or --duration seconds) after --warmup untimed iterations per client.
+
+Scenarios:
+    chat       POST /coach/chat cycling smalltalk (fast tier), a data question (fastpath),
+               a general question (answer cache), one the router model classifies and a
+               planning turn (supervisor -> goals_agent -> generators)
+    goal       POST /goals (direct domain generation + tasks insert), then DELETE /goals/{id}
+    history    GET /coach/history
+    bootstrap  app launch: GET /profile/me, /goals and /coach/history concurrently, then
+               GET /goals/{id}/tasks for the first goal
+    mixed      chat 50%, bootstrap 25%, history 15%, goal 10%
+
+Reports throughput and p50/p95/p99 latency per operation, mean Server-Timing phases,
+LLM calls per operation, PostgREST requests and event-loop lag. Everything shares one
+process (and GIL), so compare builds and settings on the same machine rather than
+reading the numbers as production capacity.
+
+Usage (from backend/):
+    python -m benchmarks.loadtest --scenario chat --concurrency 16 --requests 400 --llm-latency 0.2
+    python -m benchmarks.loadtest --scenario mixed --duration 30 --users 64 --json loadtest.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import sys
+import tempfile
+import time
+import uuid
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+import httpx
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage
+
+from benchmarks.fakes import CallCounter, ScriptedChatModel, _sample_items, domain_policy, generator_caller_policy, supervisor_policy
+from benchmarks.supabase_stub import SupabaseStub, ThreadedServer
+
+CHAT_MESSAGES = [
+    "hi coach!",
+    "what are my tasks this week?",
+    "what is zone 2 training?",
+    "should I stretch before or after running?",
+    "can you adjust my plan to add one more run?",
+]
+MIX = (("chat", 50), ("bootstrap", 25), ("history", 15), ("goal", 10))
+SCENARIOS = ("chat", "goal", "history", "bootstrap", "mixed")
+COACH_REPLY = (
+    "Good question. Keep most runs at an easy, conversational effort, add one session of "
+    "strides or intervals per week, and leave a rest day after your longest run. "
+) * 2
+_PLANNING_RE = re.compile(r"\b(plan|program|schedule|generate|create|adjust)\b", re.IGNORECASE)
+
+
+# --- Fake models -------------------------------------------------------------
+
+def _full_policy(flat: bool):
+    planner = generator_caller_policy("fat_loss", final_text="Updated your plan.") if flat else supervisor_policy
+
+    def _policy(messages: List[BaseMessage]) -> AIMessage:
+        last = next((m for m in reversed(messages) if isinstance(m, HumanMessage)), None)
+        if last is not None and _PLANNING_RE.search(str(last.content)):
+            return planner(messages)
+        return AIMessage(content=COACH_REPLY)
+
+    return _policy
+
+
+def _structured(schema: Any, messages: List[BaseMessage]) -> Any:
+    if schema.__name__ == "RouteDecision":
+        return schema(tier="fast", reason="scripted")
+    return schema.model_validate(_sample_items("plan"))
+
+
+def fake_model_factory(latency_s: float, counter: CallCounter):
+    """FitnessCoach model factory returning scripted models (same callbacks as ChatOpenAI)."""
+    from app.agents.client import COACH_TOPOLOGY
+
+    policies = {
+        "full": _full_policy(COACH_TOPOLOGY == "flat"),
+        "goals_agent": generator_caller_policy("build_muscle"),
+        "diet_agent": domain_policy("diet"),
+        "strength_agent": domain_policy("strength"),
+        "cardio_agent": domain_policy("cardio"),
+        "fast": lambda messages: AIMessage(content="Hey! Ready when you are. What are we training today?"),
+        "summary": lambda messages: AIMessage(content="User trains for a 10k, runs three times a week, prefers mornings."),
+    }
+
+    def factory(role: str, model: str, **kwargs: Any) -> ScriptedChatModel:
+        return ScriptedChatModel(
+            policy=policies.get(role, lambda messages: AIMessage(content=COACH_REPLY)),
+            label=role,
+            latency_s=latency_s,
+            counter=counter,
+            structured=_structured,
+            callbacks=kwargs.get("callbacks"),
+        )
+
+    return factory
+
+
+# --- Results -----------------------------------------------------------------
+
+def _pct(data: List[float], q: float) -> float:
+    return data[min(len(data) - 1, int(round(q * (len(data) - 1))))]
+
+
+def _server_timing(header: Optional[str]) -> Dict[str, float]:
+    phases: Dict[str, float] = {}
+    for part in (header or "").split(","):
+        name, _, rest = part.strip().partition(";")
+        m = re.search(r"dur=([0-9.]+)", rest)
+        if name and m:
+            phases[name] = phases.get(name, 0.0) + float(m.group(1))
+    return phases
+
+
+class Recorder:
+    """Latencies, statuses and summed Server-Timing phases per operation."""
+
+    def __init__(self) -> None:
+        self.latencies: Dict[str, List[float]] = {}
+        self.statuses: Dict[str, Counter] = {}
+        self.phases: Dict[str, Counter] = {}
+        self.enabled = False
+
+    def record(self, op: str, seconds: float, status: int, timing: Optional[Dict[str, float]] = None) -> None:
+        if not self.enabled:
+            return
+        self.latencies.setdefault(op, []).append(seconds)
+        self.statuses.setdefault(op, Counter())[status] += 1
+        if timing:
+            self.phases.setdefault(op, Counter()).update(timing)
+
+    def summary(self, wall_s: float) -> Dict[str, Any]:
+        ops = {}
+        for op, lat in sorted(self.latencies.items()):
+            data = sorted(lat)
+            statuses = self.statuses[op]
+            ops[op] = {
+                "count": len(data),
+                "errors": sum(n for s, n in statuses.items() if s >= 400),
+                "statuses": {str(s): n for s, n in sorted(statuses.items())},
+                "rps": round(len(data) / wall_s, 2),
+                "p50_ms": round(_pct(data, 0.50) * 1000, 1),
+                "p95_ms": round(_pct(data, 0.95) * 1000, 1),
+                "p99_ms": round(_pct(data, 0.99) * 1000, 1),
+                "max_ms": round(data[-1] * 1000, 1),
+                "server_timing_ms": {k: round(v / len(data), 2) for k, v in self.phases.get(op, Counter()).most_common()},
+            }
+        return ops
+
+
+# --- Scenarios ---------------------------------------------------------------
+
+class VirtualUser:
+    def __init__(self, user_id: str, seeded: Dict[str, Any], turn: int = 0) -> None:
+        self.user_id = user_id
+        self.headers = {"Authorization": f"Bearer {SupabaseStub.token_for(user_id)}"}
+        self.goal_ids = [g["id"] for g in seeded["goals"]]
+        # Staggered so the chat message mix holds even when each user only sends a few turns
+        self.turn = turn
+
+
+async def _request(client: httpx.AsyncClient, rec: Recorder, op: str, method: str, url: str, user: VirtualUser, **kw) -> httpx.Response:
+    t0 = time.perf_counter()
+    try:
+        resp = await client.request(method, url, headers=user.headers, **kw)
+    except httpx.HTTPError:
+        rec.record(op, time.perf_counter() - t0, 599)
+        raise
+    rec.record(op, time.perf_counter() - t0, resp.status_code, _server_timing(resp.headers.get("server-timing")))
+    return resp
+
+
+async def chat(client: httpx.AsyncClient, rec: Recorder, user: VirtualUser) -> None:
+    message = CHAT_MESSAGES[user.turn % len(CHAT_MESSAGES)]
+    user.turn += 1
+    await _request(client, rec, "chat", "POST", "/coach/chat", user, json={"message": message})
+
+
+async def goal(client: httpx.AsyncClient, rec: Recorder, user: VirtualUser) -> None:
+    resp = await _request(client, rec, "goal-create", "POST", "/goals", user, json={"type": "build_muscle", "target_value": 3})
+    if resp.status_code == 200:
+        await _request(client, rec, "goal-delete", "DELETE", f"/goals/{resp.json()['goal']['id']}", user)
+
+
+async def history(client: httpx.AsyncClient, rec: Recorder, user: VirtualUser) -> None:
+    await _request(client, rec, "history", "GET", "/coach/history", user)
+
+
+async def bootstrap(client: httpx.AsyncClient, rec: Recorder, user: VirtualUser) -> None:
+    t0 = time.perf_counter()
+    scratch = Recorder()
+    scratch.enabled = True
+    profile, goals, _ = await asyncio.gather(
+        _request(client, scratch, "profile", "GET", "/profile/me", user),
+        _request(client, scratch, "goals", "GET", "/goals", user),
+        _request(client, scratch, "history", "GET", "/coach/history", user),
+    )
+    rows = goals.json() if goals.status_code == 200 else []
+    if rows:
+        await _request(client, scratch, "tasks", "GET", f"/goals/{rows[0]['id']}/tasks", user)
+    status = max(s for c in scratch.statuses.values() for s in c)
+    rec.record("bootstrap", time.perf_counter() - t0, status)
+
+
+OPERATIONS = {"chat": chat, "goal": goal, "history": history, "bootstrap": bootstrap}
+
+
+async def drive(
+    base_url: str, users: List[VirtualUser], scenario: str, *, concurrency: int, requests: int,
+    duration_s: Optional[float], warmup: int, seed: int,
+) -> Dict[str, Any]:
+    rec = Recorder()
+    rng = random.Random(seed)
+    names, weights = zip(*MIX)
+
+    def pick() -> str:
+        return scenario if scenario != "mixed" else rng.choices(names, weights)[0]
+
+    plan = iter([pick() for _ in range(requests)])
+    started = asyncio.Event()
+    clock = {"ready": 0, "t0": 0.0, "end": 0.0}
+    limits = httpx.Limits(max_connections=concurrency * 3, max_keepalive_connections=concurrency * 3)
+    async with httpx.AsyncClient(base_url=base_url, timeout=120.0, limits=limits) as client:
+
+        async def worker(k: int) -> None:
+            mine = users[k::concurrency]
+            for i in range(warmup):
+                await OPERATIONS[pick()](client, rec, mine[i % len(mine)])
+            # Every client finishes its untimed warm-up before the clock starts
+            clock["ready"] += 1
+            if clock["ready"] == concurrency:
+                rec.enabled = True
+                clock["t0"] = time.perf_counter()
+                clock["end"] = clock["t0"] + (duration_s or 0.0)
+                started.set()
+            await started.wait()
+            i = 0
+            while True:
+                if duration_s is not None:
+                    op = pick() if time.perf_counter() < clock["end"] else None
+                else:
+                    op = next(plan, None)
+                if op is None:
+                    return
+                try:
+                    await OPERATIONS[op](client, rec, mine[i % len(mine)])
+                except httpx.HTTPError:
+                    pass
+                i += 1
+
+        await asyncio.gather(*(worker(k) for k in range(concurrency)))
+    wall = time.perf_counter() - clock["t0"]
+    return {"wall_s": round(wall, 3), "ops": rec.summary(wall)}
+
+
+def _configure_env(stub_url: str, args: argparse.Namespace) -> None:
+    # Read at import time by the app modules, so this must run before importing app.main
+    os.environ["SUPABASE_URL"] = stub_url
+    os.environ["SUPABASE_ANON_KEY"] = "loadtest-anon-key"
+    os.environ.setdefault("OPENAI_API_KEY", "sk-loadtest")
+    os.environ.setdefault("TAVILY_API_KEY", "tvly-loadtest")
+    os.environ.setdefault("LOG_LEVEL", args.log_level)
+    os.environ.setdefault("TRACE_EXPORT", "none")
+    os.environ.setdefault("COACH_MEMORY_EMBEDDER", "hashing")
+    os.environ.setdefault("COACH_ANSWER_CACHE_EMBEDDER", "hashing")
+    os.environ.setdefault("COACH_MEMORY_DIR", tempfile.mkdtemp(prefix="loadtest-memory-"))
+    # The event-loop report below reads an admin-only diagnostics endpoint
+    os.environ.setdefault("DIAGNOSTICS_ADMIN_TOKEN", uuid.uuid4().hex)
+
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    stub = SupabaseStub(latency_s=args.db_latency)
+    stub_server = ThreadedServer(stub.app).start()
+    _configure_env(stub_server.url, args)
+
+    from app.agents.graph import set_model_factory
+
+    counter = CallCounter()
+    set_model_factory(fake_model_factory(args.llm_latency, counter))
+    from app.main import app
+
+    rng = random.Random(args.seed)
+    n_users = max(args.users, args.concurrency)
+    users = []
+    for i in range(n_users):
+        uid = str(uuid.UUID(int=rng.getrandbits(128), version=4))
+        users.append(VirtualUser(uid, stub.seed_user(uid, history=args.history), turn=i))
+
+    app_server = ThreadedServer(app, log_level="warning").start(timeout_s=120)
+    try:
+        counter.reset()
+        result = asyncio.run(drive(
+            app_server.url, users, args.scenario, concurrency=args.concurrency, requests=args.requests,
+            duration_s=args.duration, warmup=args.warmup, seed=args.seed,
+        ))
+        loop = httpx.get(
+            f"{app_server.url}/diagnostics/event-loop",
+            headers={"X-Admin-Token": os.environ["DIAGNOSTICS_ADMIN_TOKEN"]},
+            timeout=10,
+        ).json()
+    finally:
+        app_server.stop()
+        stub_server.stop()
+    total_ops = sum(o["count"] for name, o in result["ops"].items() if name != "goal-delete") or 1
+    return {
+        "config": {k: v for k, v in vars(args).items() if k != "json"},
+        **result,
+        "llm_calls_per_op": round(counter.total / total_ops, 2),
+        "llm_calls_by_role": dict(sorted(counter.calls.items())),
+        "postgrest_requests": dict(sorted(stub.requests.items())),
+        "event_loop": {k: loop.get(k) for k in ("lag_s", "stalls", "max_lag_s") if k in loop},
+    }
+
+
+def report(out: Dict[str, Any]) -> None:
+    cfg = out["config"]
+    print(
+        f"scenario={cfg['scenario']} concurrency={cfg['concurrency']} users={max(cfg['users'], cfg['concurrency'])} "
+        f"llm={cfg['llm_latency'] * 1000:.0f}ms/call db={cfg['db_latency'] * 1000:.0f}ms/req wall={out['wall_s']:.1f}s"
+    )
+    print(f"{'operation':<14}{'count':>7}{'errors':>8}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'max ms':>9}")
+    for name, o in out["ops"].items():
+        print(
+            f"{name:<14}{o['count']:>7}{o['errors']:>8}{o['rps']:>9.1f}"
+            f"{o['p50_ms']:>9.1f}{o['p95_ms']:>9.1f}{o['p99_ms']:>9.1f}{o['max_ms']:>9.1f}"
+        )
+    for name, o in out["ops"].items():
+        if o["server_timing_ms"]:
+            phases = " ".join(f"{k}={v}" for k, v in list(o["server_timing_ms"].items())[:10])
+            print(f"  {name} mean phases (ms): {phases}")
+        if o["errors"]:
+            print(f"  {name} statuses: {o['statuses']}")
+    print(f"llm calls/op={out['llm_calls_per_op']} by role: {out['llm_calls_by_role']}")
+    print(f"postgrest requests: {out['postgrest_requests']}")
+    print(f"event loop: {out['event_loop']}")
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--scenario", choices=SCENARIOS, default="mixed")
+    ap.add_argument("--concurrency", type=int, default=8, help="closed-loop clients")
+    ap.add_argument("--requests", type=int, default=200, help="timed scenario iterations (ignored with --duration)")
+    ap.add_argument("--duration", type=float, default=None, help="run for this many seconds instead of --requests")
+    ap.add_argument("--warmup", type=int, default=1, help="untimed iterations per client")
+    ap.add_argument("--users", type=int, default=32, help="seeded virtual users (at least --concurrency)")
+    ap.add_argument("--history", type=int, default=40, help="seeded messages in each user's home conversation")
+    ap.add_argument("--llm-latency", type=float, default=0.2, help="simulated seconds per LLM call")
+    ap.add_argument("--db-latency", type=float, default=0.005, help="simulated seconds per Supabase request")
+    ap.add_argument("--seed", type=int, default=7)
+    ap.add_argument("--log-level", default="ERROR", help="LOG_LEVEL for the app (unless already set)")
+    ap.add_argument("--json", help="also write the full results to this file")
+    args = ap.parse_args()
+    out = run(args)
+    report(out)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(out, f, indent=2)
+    sys.stdout.flush()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,305 @@
+# benchmarks/supabase_stub.py
+"""In-memory stand-in for Supabase auth + PostgREST, for offline load tests.
+
+Implements the subset the backend uses against profiles, goals, tasks, conversations
+and messages (infra/supabase/schema.sql):
+
+- GET /auth/v1/user for tokens issued by `SupabaseStub.token_for(user_id)` (others: 401)
+- select/insert/update/delete on /rest/v1/<table> with eq/neq/gt/gte/lt/lte/is/in filters,
+  select=<columns>, order=<col>.<asc|desc>[,...], limit/offset, Prefer: return=representation
+- row ownership like the RLS policies (profiles.id / user_id / the message's conversation)
+- the conversations.version triggers (message insert, summary update) and the goal delete cascade
+
+It runs as a real HTTP server (ThreadedServer) so the backend's sync and async httpx clients
+and the MCP goals server subprocess reach it exactly as they would reach Supabase.
+"""
+import asyncio
+import json
+import re
+import socket
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Route
+
+TOKEN_PREFIX = "lt."
+
+# Column defaults applied on insert (schema.sql); id/created_at are generated
+TABLE_DEFAULTS: Dict[str, Dict[str, Any]] = {
+    "profiles": {},
+    "goals": {"user_id": None, "type": None, "target_value": None, "target_date": None, "status": "active"},
+    "tasks": {
+        "user_id": None, "goal_id": None, "title": None, "description": None,
+        "due_at": None, "status": "pending", "calendar_event_id": None,
+    },
+    "conversations": {
+        "user_id": None, "goal_id": None, "summary": None, "summary_through": None,
+        "summary_updated_at": None, "version": 0,
+    },
+    "messages": {"conversation_id": None, "role": None, "content": None},
+}
+_OWNER_COLUMN = {"profiles": "id", "goals": "user_id", "tasks": "user_id", "conversations": "user_id"}
+
+
+def _coerce(value: Any) -> Any:
+    """Comparable form of a row value or filter literal (timestamps, numbers, text)."""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value)
+    if not isinstance(value, str):
+        return value
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    if len(value) >= 10 and value[4:5] == "-" and value[7:8] == "-":
+        try:
+            dt = datetime.fromisoformat(value.replace("Z", "+00:00"))
+            return dt if dt.tzinfo else dt.replace(tzinfo=timezone.utc)
+        except ValueError:
+            pass
+    return value
+
+
+def _column_value(row: Dict[str, Any], column: str) -> Any:
+    """Row value for a filter column, following JSON paths (content->tool_calls, content->>text)."""
+    if "->" not in column:
+        return row.get(column)
+    first, *keys = re.split(r"->>?", column)
+    value = row.get(first)
+    for key in keys:
+        value = value.get(key) if isinstance(value, dict) else None
+    return value
+
+
+def _matches(row: Dict[str, Any], column: str, op: str, literal: str) -> bool:
+    value = _column_value(row, column)
+    if op == "is":
+        return {"null": value is None, "true": value is True, "false": value is False}.get(literal, False)
+    if op == "in":
+        options = [o.strip().strip('"') for o in literal.strip("()").split(",")]
+        return value is not None and str(value) in options
+    if value is None:
+        return False
+    if op in ("eq", "neq"):
+        equal = str(value) == literal or _coerce(value) == _coerce(literal)
+        return equal if op == "eq" else not equal
+    left, right = _coerce(value), _coerce(literal)
+    try:
+        return {"gt": left > right, "gte": left >= right, "lt": left < right, "lte": left <= right}[op]
+    except (TypeError, KeyError):
+        return False
+
+
+def _sort_key(value: Any) -> Tuple[int, Any]:
+    coerced = _coerce(value)
+    if isinstance(coerced, datetime):
+        coerced = coerced.timestamp()
+    return (value is None, coerced if isinstance(coerced, float) else str(coerced))
+
+
+class SupabaseStub:
+    def __init__(self, latency_s: float = 0.0) -> None:
+        # Simulated PostgREST round trip added to every request
+        self.latency_s = latency_s
+        # table -> owner id -> rows (every query is scoped to the caller's rows, as with RLS)
+        self._rows: Dict[str, Dict[str, List[Dict[str, Any]]]] = {t: {} for t in TABLE_DEFAULTS}
+        self._conversation_owner: Dict[str, str] = {}
+        self._last_ts = datetime.now(timezone.utc)
+        self.requests: Dict[str, int] = {}
+        self.app = Starlette(routes=[
+            Route("/auth/v1/user", self._auth_user, methods=["GET"]),
+            Route("/rest/v1/{table}", self._rest, methods=["GET", "POST", "PATCH", "DELETE"]),
+        ])
+
+    # --- Seeding --------------------------------------------------------------
+
+    @staticmethod
+    def token_for(user_id: str) -> str:
+        return f"{TOKEN_PREFIX}{user_id}"
+
+    def _now(self) -> str:
+        # Strictly increasing created_at so ordering is deterministic, as with now() per statement
+        ts = max(datetime.now(timezone.utc), self._last_ts + timedelta(microseconds=1))
+        self._last_ts = ts
+        return ts.isoformat()
+
+    def insert(self, table: str, row: Dict[str, Any], *, owner: str) -> Dict[str, Any]:
+        full = {"id": str(uuid.uuid4()), **TABLE_DEFAULTS[table], "created_at": self._now(), **row}
+        self._rows[table].setdefault(owner, []).append(full)
+        if table == "conversations":
+            self._conversation_owner[full["id"]] = owner
+        elif table == "messages":
+            for conv in self._rows["conversations"].get(owner, []):
+                if conv["id"] == full["conversation_id"]:
+                    conv["version"] = (conv.get("version") or 0) + 1
+        return full
+
+    def seed_user(
+        self, user_id: str, *, goal_types: Tuple[str, ...] = ("fat_loss",), tasks_per_goal: int = 10, history: int = 40
+    ) -> Dict[str, Any]:
+        """Profile, active goals with tasks and a home conversation with `history` messages."""
+        self.insert("profiles", {
+            "id": user_id, "sex": "female", "height_cm": 168, "weight_kg": 64, "unit_pref": "metric",
+            "activity_level": "moderate", "fitness_level": "intermediate", "timezone": "UTC",
+            "availability_days": [1, 3, 5],
+        }, owner=user_id)
+        goals = []
+        start = datetime.now(timezone.utc).replace(hour=18, minute=0, second=0, microsecond=0)
+        for goal_type in goal_types:
+            goal = self.insert("goals", {"user_id": user_id, "type": goal_type, "target_value": 5}, owner=user_id)
+            goals.append(goal)
+            for i in range(tasks_per_goal):
+                self.insert("tasks", {
+                    "user_id": user_id, "goal_id": goal["id"], "title": f"Session {i + 1}",
+                    "description": "30 minutes, moderate effort.",
+                    "due_at": (start + timedelta(days=i)).strftime("%Y-%m-%dT%H:%M:%SZ"),
+                }, owner=user_id)
+        conv = self.insert("conversations", {"user_id": user_id, "goal_id": None}, owner=user_id)
+        for i in range(history):
+            role = "user" if i % 2 == 0 else "assistant"
+            text = f"Earlier message {i}: " + ("how should I pace my runs?" if role == "user" else "Keep it conversational. " * 8)
+            self.insert("messages", {
+                "conversation_id": conv["id"], "role": role, "content": {"text": text, "tokens": len(text) // 4},
+            }, owner=user_id)
+        return {"goals": goals, "conversation_id": conv["id"]}
+
+    def row_counts(self) -> Dict[str, int]:
+        return {t: sum(len(rows) for rows in owners.values()) for t, owners in self._rows.items()}
+
+    # --- HTTP -----------------------------------------------------------------
+
+    def _user(self, request: Request) -> Optional[str]:
+        auth = request.headers.get("authorization", "")
+        token = auth.split(" ", 1)[1] if " " in auth else ""
+        return token[len(TOKEN_PREFIX):] if token.startswith(TOKEN_PREFIX) else None
+
+    async def _auth_user(self, request: Request) -> Response:
+        if self.latency_s:
+            await asyncio.sleep(self.latency_s)
+        self.requests["auth"] = self.requests.get("auth", 0) + 1
+        uid = self._user(request)
+        if uid is None:
+            return JSONResponse({"msg": "invalid JWT"}, status_code=401)
+        return JSONResponse({"id": uid, "email": f"{uid[:8]}@loadtest.local", "role": "authenticated"})
+
+    async def _rest(self, request: Request) -> Response:
+        if self.latency_s:
+            await asyncio.sleep(self.latency_s)
+        table = request.path_params["table"]
+        key = f"{request.method} {table}"
+        self.requests[key] = self.requests.get(key, 0) + 1
+        if table not in TABLE_DEFAULTS:
+            return JSONResponse({"message": f"relation \"public.{table}\" does not exist"}, status_code=404)
+        uid = self._user(request)
+        if uid is None:
+            return JSONResponse({"message": "JWT expired"}, status_code=401)
+
+        select, order, limit, offset, filters = "*", None, None, 0, []
+        for name, value in request.query_params.multi_items():
+            if name == "select":
+                select = value
+            elif name == "order":
+                order = value
+            elif name == "limit":
+                limit = int(value)
+            elif name == "offset":
+                offset = int(value)
+            elif name != "on_conflict":
+                op, _, literal = value.partition(".")
+                filters.append((name, op, literal))
+        representation = "return=representation" in request.headers.get("prefer", "")
+
+        if request.method == "POST":
+            return self._post(table, uid, json.loads(await request.body() or b"null"), representation)
+        rows = [r for r in self._rows[table].get(uid, []) if all(_matches(r, c, op, lit) for c, op, lit in filters)]
+        if request.method == "GET":
+            if order:
+                for part in reversed(order.split(",")):
+                    column, _, direction = part.partition(".")
+                    rows.sort(key=lambda r: _sort_key(r.get(column)), reverse=direction.startswith("desc"))
+            rows = rows[offset:offset + limit if limit is not None else None]
+            out = self._project(rows, select)
+            content_range = f"{offset}-{offset + len(out) - 1}/*" if out else "*/*"
+            return JSONResponse(out, headers={"Content-Range": content_range})
+        if request.method == "PATCH":
+            changes = json.loads(await request.body() or b"{}")
+            for row in rows:
+                if table == "conversations" and ({"summary", "summary_through"} & changes.keys()):
+                    row["version"] = (row.get("version") or 0) + 1
+                row.update(changes)
+            return JSONResponse(rows) if representation else Response(status_code=204)
+        # DELETE
+        doomed = {id(r) for r in rows}
+        self._rows[table][uid] = [r for r in self._rows[table].get(uid, []) if id(r) not in doomed]
+        if table == "goals":
+            self._cascade_goal_delete(uid, {r["id"] for r in rows})
+        return JSONResponse(rows) if representation else Response(status_code=204)
+
+    def _post(self, table: str, uid: str, body: Any, representation: bool) -> Response:
+        items = body if isinstance(body, list) else [body]
+        if not all(isinstance(i, dict) for i in items):
+            return JSONResponse({"message": "invalid body"}, status_code=400)
+        for item in items:
+            if table == "messages":
+                if self._conversation_owner.get(item.get("conversation_id")) != uid:
+                    return JSONResponse({"message": "new row violates row-level security policy"}, status_code=403)
+            elif item.get(_OWNER_COLUMN[table]) != uid:
+                return JSONResponse({"message": "new row violates row-level security policy"}, status_code=403)
+            if table == "profiles" and self._rows["profiles"].get(uid):
+                return JSONResponse({"message": "duplicate key value violates unique constraint"}, status_code=409)
+        created = [self.insert(table, item, owner=uid) for item in items]
+        return JSONResponse(created, status_code=201) if representation else Response(status_code=201)
+
+    def _cascade_goal_delete(self, uid: str, goal_ids: set) -> None:
+        for task in self._rows["tasks"].get(uid, []):
+            if task.get("goal_id") in goal_ids:
+                task["goal_id"] = None
+        convs = self._rows["conversations"].get(uid, [])
+        dropped = {c["id"] for c in convs if c.get("goal_id") in goal_ids}
+        if dropped:
+            self._rows["conversations"][uid] = [c for c in convs if c["id"] not in dropped]
+            self._rows["messages"][uid] = [m for m in self._rows["messages"].get(uid, []) if m["conversation_id"] not in dropped]
+
+    @staticmethod
+    def _project(rows: List[Dict[str, Any]], select: str) -> List[Dict[str, Any]]:
+        if select.strip() in ("", "*"):
+            return [dict(r) for r in rows]
+        columns = [c.strip() for c in select.split(",") if c.strip()]
+        return [{c: r.get(c) for c in columns} for r in rows]
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class ThreadedServer:
+    """uvicorn serving an ASGI app from a daemon thread (own event loop)."""
+
+    def __init__(self, app: Any, port: Optional[int] = None, *, log_level: str = "warning") -> None:
+        self.port = port or free_port()
+        self.url = f"http://127.0.0.1:{self.port}"
+        config = uvicorn.Config(app, host="127.0.0.1", port=self.port, log_level=log_level, access_log=False, lifespan="auto")
+        self._server = uvicorn.Server(config)
+        self._thread = threading.Thread(target=self._server.run, name=f"uvicorn-{self.port}", daemon=True)
+
+    def start(self, timeout_s: float = 60.0) -> "ThreadedServer":
+        self._thread.start()
+        deadline = time.monotonic() + timeout_s
+        while not self._server.started:
+            if not self._thread.is_alive() or time.monotonic() > deadline:
+                raise RuntimeError(f"server on port {self.port} failed to start")
+            time.sleep(0.05)
+        return self
+
+    def stop(self) -> None:
+        self._server.should_exit = True
+        self._thread.join(timeout=10)
@@ -0,0 +1,44 @@
+# tests/test_answer_cache.py
+"""Which chat messages may be answered from (and stored in) the shared answer cache."""
+import pytest
+
+from app.agents.answer_cache import ineligible_reason
+
+FOLLOW_UPS = [
+    "Why?",
+    "Is it safe?",
+    "How long?",
+    "Can you explain more?",
+    "And for cardio?",
+    "So what is the best rep range?",
+    "But is that bad for recovery?",
+    "What about swimming instead?",
+    "Is it safe to run with knee pain?",
+]
+
+SELF_CONTAINED = [
+    "What is zone 2 training?",
+    "How much protein per day?",
+    "Is running with knee pain safe?",
+    "How many sets per exercise for hypertrophy?",
+    "Which is better, HIIT or steady state cardio?",
+]
+
+
+@pytest.mark.parametrize("message", FOLLOW_UPS)
+def test_questions_that_need_the_previous_turn_are_not_shareable(message):
+    assert ineligible_reason(message) is not None
+
+
+@pytest.mark.parametrize("message", SELF_CONTAINED)
+def test_self_contained_general_questions_are_shareable(message):
+    assert ineligible_reason(message) is None
+
+
+@pytest.mark.parametrize("message", [
+    "Should I stretch before or after my runs?",
+    "What are my tasks this week?",
+    "Can you add one more run to the plan?",
+])
+def test_personal_questions_are_not_shareable(message):
+    assert ineligible_reason(message) is not None
@@ -0,0 +1,39 @@
+# tests/test_checkpoint.py
+"""The memory checkpointer keeps only the most recently used threads."""
+import asyncio
+from typing import TypedDict
+
+from langgraph.graph import END, START, StateGraph
+
+from app.agents.checkpoint import BoundedInMemorySaver, CoachCheckpointer
+
+
+class _State(TypedDict):
+    n: int
+
+
+def _graph(saver):
+    builder = StateGraph(_State)
+    builder.add_node("bump", lambda state: {"n": state["n"] + 1})
+    builder.add_edge(START, "bump")
+    builder.add_edge("bump", END)
+    return builder.compile(checkpointer=saver)
+
+
+def test_least_recently_used_thread_is_evicted():
+    async def scenario():
+        saver = BoundedInMemorySaver(max_threads=2)
+        graph = _graph(saver)
+        for thread in ("a", "b"):
+            await graph.ainvoke({"n": 0}, CoachCheckpointer.thread_config(thread))
+        # Reading "a" makes "b" the least recently used one
+        assert (await graph.aget_state(CoachCheckpointer.thread_config("a"))).values == {"n": 1}
+        await graph.ainvoke({"n": 0}, CoachCheckpointer.thread_config("c"))
+
+        assert (await graph.aget_state(CoachCheckpointer.thread_config("b"))).values == {}
+        assert (await graph.aget_state(CoachCheckpointer.thread_config("a"))).values == {"n": 1}
+        assert set(saver.storage) == {"a", "c"}
+        assert not [key for key in saver.blobs if key[0] == "b"]
+        assert saver.snapshot() == {"threads": 2, "max_threads": 2, "evicted": 1}
+
+    asyncio.run(scenario())
@@ -0,0 +1,49 @@
+# tests/test_fastpath.py
+"""Which chat messages the data fast path answers with a task or goal list."""
+from zoneinfo import ZoneInfo
+
+import pytest
+
+from app.agents.fastpath import format_tasks, match_intent
+
+
+@pytest.mark.parametrize("message, intent", [
+    ("What are my tasks this week?", {"intent": "tasks", "period": "this_week"}),
+    ("Any workouts tomorrow?", {"intent": "tasks", "period": "tomorrow"}),
+    ("What's my next workout?", {"intent": "next_task", "period": "upcoming"}),
+    ("What are my goals?", {"intent": "goals", "period": "all"}),
+    ("Show me my goals", {"intent": "goals", "period": "all"}),
+    ("What goals do I have?", {"intent": "goals", "period": "all"}),
+])
+def test_data_questions_match(message, intent):
+    assert match_intent(message) == intent
+
+
+@pytest.mark.parametrize("message", [
+    "Any tips for my workout today?",
+    "What is the best workout for today?",
+    "What is a realistic goal weight for me?",
+    "What is my goal weight?",
+    "How much protein should I eat today?",
+    "Can you recommend a good session for tomorrow?",
+    "Explain my workouts this week",
+    "Add a run to my schedule tomorrow",
+])
+def test_advice_and_change_requests_go_to_the_agents(message):
+    assert match_intent(message) is None
+
+
+def _tasks(n):
+    return [{"title": f"Run {i}", "due_at": f"2030-01-02T{i % 24:02d}:00:00Z", "status": "pending"} for i in range(n)]
+
+
+def test_task_count_is_exact_when_the_read_was_complete():
+    text = format_tasks(_tasks(12), "this_week", ZoneInfo("UTC"))
+    assert text.startswith("You have 12 tasks this week:")
+    assert text.endswith("…and 2 more.")
+
+
+def test_task_count_is_a_lower_bound_when_the_read_was_truncated():
+    text = format_tasks(_tasks(50), "this_week", ZoneInfo("UTC"), truncated=True)
+    assert text.startswith("You have at least 50 tasks this week:")
+    assert text.endswith("…and at least 40 more.")
@@ -0,0 +1,52 @@
+# tests/test_generators.py
+"""Regression tests for generator tool output normalization."""
+import asyncio
+import json
+
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+
+from app.tools.generators import _normalize_output, make_generators
+
+ITEMS = {
+    "items": [
+        {
+            "title": "Walk 30 minutes",
+            "description": "Brisk walk after dinner.",
+            "due_at": "2030-01-02T18:00:00Z",
+            "status": "pending",
+        }
+    ]
+}
+
+
+class _FakeAgent:
+    """Stands in for a compiled ReAct agent: returns the full message state."""
+
+    def __init__(self, reply: str):
+        self.reply = reply
+
+    async def ainvoke(self, inputs, config=None):
+        return {"messages": [*inputs["messages"], AIMessage(content=self.reply)]}
+
+
+def test_normalize_output_reads_last_ai_reply():
+    res = {
+        "messages": [
+            HumanMessage(content="CONTEXT:\n{}"),
+            AIMessage(content="", tool_calls=[{"name": "lookup", "args": {}, "id": "c1"}]),
+            ToolMessage(content="{}", tool_call_id="c1"),
+            AIMessage(content=f"Here you go:\n```json\n{json.dumps(ITEMS)}\n```"),
+        ]
+    }
+    assert _normalize_output(res) == ITEMS
+
+
+def test_normalize_output_passes_plain_dicts_through():
+    assert _normalize_output(ITEMS) == ITEMS
+
+
+def test_generator_tool_returns_agent_items():
+    agent = _FakeAgent(json.dumps(ITEMS))
+    diet, _, _ = make_generators(agent, agent, agent, None)
+    out = asyncio.run(diet.ainvoke({"user_profile": {}, "goal": {"title": "Lose 5kg"}}))
+    assert out == ITEMS
@@ -0,0 +1,41 @@
+# tests/test_long_term_memory.py
+"""Purging a user's long-term memory index."""
+import asyncio
+import os
+
+from app.agents.long_term_memory import HashingEmbedder, LongTermMemory, _safe_dirname
+
+USER = "11111111-1111-4111-8111-111111111111"
+ROW = {"id": "m1", "role": "user", "conversation_id": "c1", "created_at": "2030-01-01T00:00:00Z",
+       "content": {"text": "I tore my ACL last year and my knee still aches on long runs"}}
+
+
+class _SlowEmbedder(HashingEmbedder):
+    async def embed(self, texts):
+        await asyncio.sleep(0.2)
+        return await super().embed(texts)
+
+
+def test_reset_user_removes_the_index(tmp_path):
+    async def scenario():
+        memory = LongTermMemory(embedder=HashingEmbedder(), root=str(tmp_path), enabled=True)
+        assert await memory.add_rows(USER, [ROW]) == 1
+        assert os.path.isdir(tmp_path / _safe_dirname(USER))
+        await memory.reset_user(USER)
+        assert not os.path.exists(tmp_path / _safe_dirname(USER))
+        assert memory.stats.purged == 1
+
+    asyncio.run(scenario())
+
+
+def test_reset_user_cancels_indexing_in_flight(tmp_path):
+    async def scenario():
+        memory = LongTermMemory(embedder=_SlowEmbedder(), root=str(tmp_path), enabled=True)
+        memory.index_in_background(USER, [ROW])
+        await asyncio.sleep(0.05)
+        await memory.reset_user(USER)
+        await asyncio.sleep(0.3)
+        assert not os.path.exists(tmp_path / _safe_dirname(USER))
+        assert memory.stats.indexed == 0
+
+    asyncio.run(scenario())
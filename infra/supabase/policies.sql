@@ -1,16 +1,20 @@
 -- =========================================
--- RLS: profiles, goals, tasks  (safe to rerun)
+-- RLS: profiles, goals, tasks, conversations, messages  (safe to rerun)
 -- =========================================
 
 -- 1) Enable and force RLS
 alter table public.profiles enable row level security;
 alter table public.goals    enable row level security;
 alter table public.tasks    enable row level security;
+alter table public.conversations enable row level security;
+alter table public.messages      enable row level security;
 
 -- (Optional but recommended) Force RLS even for table owners
 alter table public.profiles force row level security;
 alter table public.goals    force row level security;
 alter table public.tasks    force row level security;
+alter table public.conversations force row level security;
+alter table public.messages      force row level security;
 
 -- =========================================
 -- PROFILES POLICIES
@@ -122,3 +126,77 @@ create policy "tasks_delete_own"
   for delete
   to authenticated
   using (user_id = auth.uid());
+
+-- =========================================
+-- CONVERSATIONS POLICIES
+-- =========================================
+drop policy if exists "conversations_insert_own" on public.conversations;
+drop policy if exists "conversations_select_own" on public.conversations;
+drop policy if exists "conversations_update_own" on public.conversations;
+drop policy if exists "conversations_delete_own" on public.conversations;
+
+-- Insert own conversations
+create policy "conversations_insert_own"
+  on public.conversations
+  for insert
+  to authenticated
+  with check (user_id = auth.uid());
+
+-- Select own conversations
+create policy "conversations_select_own"
+  on public.conversations
+  for select
+  to authenticated
+  using (user_id = auth.uid());
+
+-- Update own conversations (running summary)
+create policy "conversations_update_own"
+  on public.conversations
+  for update
+  to authenticated
+  using (user_id = auth.uid())
+  with check (user_id = auth.uid());
+
+-- Delete own conversations
+create policy "conversations_delete_own"
+  on public.conversations
+  for delete
+  to authenticated
+  using (user_id = auth.uid());
+
+-- =========================================
+-- MESSAGES POLICIES (owned through conversations.user_id)
+-- =========================================
+drop policy if exists "messages_insert_own" on public.messages;
+drop policy if exists "messages_select_own" on public.messages;
+drop policy if exists "messages_update_own" on public.messages;
+drop policy if exists "messages_delete_own" on public.messages;
+
+-- Insert messages into own conversations
+create policy "messages_insert_own"
+  on public.messages
+  for insert
+  to authenticated
+  with check (exists (select 1 from public.conversations c where c.id = messages.conversation_id and c.user_id = auth.uid()));
+
+-- Select messages of own conversations
+create policy "messages_select_own"
+  on public.messages
+  for select
+  to authenticated
+  using (exists (select 1 from public.conversations c where c.id = messages.conversation_id and c.user_id = auth.uid()));
+
+-- Update messages of own conversations
+create policy "messages_update_own"
+  on public.messages
+  for update
+  to authenticated
+  using (exists (select 1 from public.conversations c where c.id = messages.conversation_id and c.user_id = auth.uid()))
+  with check (exists (select 1 from public.conversations c where c.id = messages.conversation_id and c.user_id = auth.uid()));
+
+-- Delete messages of own conversations
+create policy "messages_delete_own"
+  on public.messages
+  for delete
+  to authenticated
+  using (exists (select 1 from public.conversations c where c.id = messages.conversation_id and c.user_id = auth.uid()));
@@ -54,3 +54,58 @@ create table if not exists public.tasks (
 alter table public.profiles enable row level security;
 alter table public.goals enable row level security;
 alter table public.tasks enable row level security;
+
+-- Chat transcript (backend/app/dependencies/chat_store.py)
+create table if not exists public.conversations (
+  id uuid primary key default gen_random_uuid(),
+  user_id uuid references auth.users(id) on delete cascade,
+  goal_id uuid references public.goals(id) on delete cascade,
+  created_at timestamp with time zone default now()
+);
+
+create table if not exists public.messages (
+  id uuid primary key default gen_random_uuid(),
+  conversation_id uuid references public.conversations(id) on delete cascade,
+  role text not null,
+  content jsonb,
+  created_at timestamp with time zone default now()
+);
+
+-- Owner-only access through the user's JWT (policies.sql)
+alter table public.conversations enable row level security;
+alter table public.messages enable row level security;
+
+-- Rolling summary of turns older than the recent window (backend/app/agents/summary.py)
+alter table public.conversations add column if not exists summary text;
+alter table public.conversations add column if not exists summary_through timestamp with time zone;
+alter table public.conversations add column if not exists summary_updated_at timestamp with time zone;
+
+-- Conversation version for the backend's hot history cache (backend/app/agents/history_cache.py):
+-- bumped once per message insert and once per summary update
+alter table public.conversations add column if not exists version bigint not null default 0;
+
+create or replace function public.bump_conversation_version() returns trigger
+language plpgsql security definer set search_path = public as $$
+begin
+  update public.conversations set version = version + 1 where id = new.conversation_id;
+  return new;
+end;
+$$;
+
+drop trigger if exists messages_bump_conversation_version on public.messages;
+create trigger messages_bump_conversation_version
+  after insert on public.messages
+  for each row execute function public.bump_conversation_version();
+
+create or replace function public.bump_version_on_summary() returns trigger
+language plpgsql as $$
+begin
+  new.version := old.version + 1;
+  return new;
+end;
+$$;
+
+drop trigger if exists conversations_bump_version_on_summary on public.conversations;
+create trigger conversations_bump_version_on_summary
+  before update of summary, summary_through on public.conversations
+  for each row execute function public.bump_version_on_summary();